@@ -2,6 +2,7 @@ import time
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from dashboard_state import bump_version
 
 # Nome do arquivo JSON da chave
 SERVICE_ACCOUNT_FILE = 'chave.json'
@@ -18,7 +19,11 @@ RANGE_NAME = 'Página1!B2:L2'  # Altere o intervalo para a linha com os valores
 
 class AcessoPlanilha:
 
-    def __init__(self):
+    def __init__(self, linha=2):
+        # Linha da planilha com a configuração desta instância do robô
+        self.linha = linha
+        self.range_name = f'Página1!B{linha}:L{linha}'
+
         # Definindo as variáveis de instância
         self.on_off = None
         self.estrategia = None
@@ -32,6 +37,23 @@ class AcessoPlanilha:
         self.lucro_venda = None
         self.modo_teste = None
 
+    # Converte uma linha da planilha (colunas B a L) no dicionário de configuração
+    @staticmethod
+    def _parse_config_row(linha):
+        return {
+            "on_off": linha[0] == "Ligado" if len(linha) > 0 else None,
+            "estrategia": linha[1] if len(linha) > 1 else None,
+            "saldo_a_usar": linha[2] if len(linha) > 2 else None,
+            "volume_minimo": linha[3] if len(linha) > 3 else None,
+            "intervalo_analise": linha[4] if len(linha) > 4 else None,
+            "limite_criptos": linha[5] if len(linha) > 5 else None,
+            "dias_volatilidade": int(float(linha[6].replace(",", "."))) if len(linha) > 6 and linha[6] else None,
+            "horas_volatilidade": float(linha[10].replace(",", ".")) if len(linha) > 10 and linha[10] else None,
+            "limite_posicao": float(linha[7].replace(",", ".")) if len(linha) > 7 and linha[7] else None,
+            "lucro_venda": linha[8] if len(linha) > 8 else None,
+            "modo_teste": linha[9] == "Ligado" if len(linha) > 9 else None,
+        }
+
     # Função para obter as variáveis da planilha
     def get_config_from_spreadsheet(self):
         try:
@@ -40,36 +62,15 @@ class AcessoPlanilha:
 
             # Lê os dados da planilha
             sheet = service.spreadsheets()
-            result = sheet.values().get(spreadsheetId=SPREADSHEET_ID, range=RANGE_NAME).execute()
+            result = sheet.values().get(spreadsheetId=SPREADSHEET_ID, range=self.range_name).execute()
             rows = result.get('values', [])
 
             # Verificar se há dados e atribuí-los às variáveis
             if rows:
-                linha = rows[0]
-                self.on_off = linha[0] == "Ligado" if len(linha) > 0 else None
-                self.estrategia = linha[1] if len(linha) > 1 else None
-                self.saldo_a_usar = linha[2] if len(linha) > 2 else None
-                self.volume_minimo = linha[3] if len(linha) > 3 else None
-                self.intervalo_analise = linha[4] if len(linha) > 4 else None
-                self.limite_criptos = linha[5] if len(linha) > 5 else None
-                self.dias_volatilidade = int(float(linha[6].replace(",", "."))) if len(linha) > 6 and linha[6] else None
-                self.horas_volatilidade = float(linha[10].replace(",", ".")) if len(linha) > 10 and linha[10] else None
-                self.limite_posicao = float(linha[7].replace(",", ".")) if len(linha) > 7 and linha[7] else None
-                self.lucro_venda = linha[8] if len(linha) > 8 else None
-                self.modo_teste = linha[9] == "Ligado" if len(linha) > 9 else None
-                return {
-                    "on_off": self.on_off,
-                    "estrategia": self.estrategia,
-                    "saldo_a_usar": self.saldo_a_usar,
-                    "volume_minimo": self.volume_minimo,
-                    "intervalo_analise": self.intervalo_analise,
-                    "limite_criptos": self.limite_criptos,
-                    "dias_volatilidade": self.dias_volatilidade,
-                    "horas_volatilidade": self.horas_volatilidade,
-                    "limite_posicao": self.limite_posicao,
-                    "lucro_venda": self.lucro_venda,
-                    "modo_teste": self.modo_teste,
-                }
+                config = self._parse_config_row(rows[0])
+                for key, value in config.items():
+                    setattr(self, key, value)
+                return config
             else:
                 print("Nenhum dado encontrado no intervalo especificado.")
                 return None
@@ -79,6 +80,30 @@ class AcessoPlanilha:
             self.append_message("Erro ao acessar a planilha: operação ignorada.")
             return None
 
+    # Função para obter as configurações de todas as linhas preenchidas (uma por instância do robô)
+    def get_configs_from_spreadsheet(self):
+        """
+        Lê as linhas de configuração a partir da linha 2 da guia 'Página1'.
+        Retorna uma lista de pares (linha, config), ignorando linhas sem estratégia.
+        """
+        try:
+            credentials = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+            service = build('sheets', 'v4', credentials=credentials)
+
+            sheet = service.spreadsheets()
+            result = sheet.values().get(spreadsheetId=SPREADSHEET_ID, range='Página1!B2:L').execute()
+            rows = result.get('values', [])
+
+            configs = []
+            for offset, linha in enumerate(rows):
+                if len(linha) > 1 and linha[1]:
+                    configs.append((offset + 2, self._parse_config_row(linha)))
+            return configs
+
+        except HttpError as e:
+            print(f"Erro ao acessar a planilha: {e}")
+            return []
+
     # Função para atualizar uma célula na planilha
     def update_error_message(self, message):
         try:
@@ -86,7 +111,7 @@ class AcessoPlanilha:
             service = build('sheets', 'v4', credentials=credentials)
             sheet = service.spreadsheets()
 
-            range_ = 'Página1!M2'
+            range_ = f'Página1!M{self.linha}'
             values = [[message]]
 
             body = {'values': values}
@@ -96,6 +121,7 @@ class AcessoPlanilha:
                 valueInputOption="RAW",
                 body=body
             ).execute()
+            bump_version()
             #print("Mensagem de erro atualizada com sucesso.")
 
         except HttpError as e:
@@ -150,6 +176,7 @@ class AcessoPlanilha:
                     valueInputOption="RAW",
                     body=body
                 ).execute()
+                bump_version()
                 #print("Mensagem de log adicionada com sucesso.")
                 break
 
@@ -169,18 +196,61 @@ class AcessoPlanilha:
 
             range_ = 'Página2!A:A'
             sheet.values().clear(spreadsheetId=SPREADSHEET_ID, range=range_).execute()
+            bump_version()
            # print("Coluna A limpa com sucesso.")
 
         except HttpError as e:
             pass# print(f"Erro ao limpar a coluna A: {e}")
 
 
-# Criando uma instância da classe
-acesso = AcessoPlanilha()
+    # Serviço do Sheets reaproveitado pelas operações em lote abaixo
+    def _get_sheet(self):
+        if getattr(self, '_sheet', None) is None:
+            credentials = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+            self._sheet = build('sheets', 'v4', credentials=credentials).spreadsheets()
+        return self._sheet
+
+    # Operações em lote usadas pelo replicador do armazenamento local (local_store.py).
+    # Diferente dos métodos acima, estas propagam HttpError para que a sincronização seja refeita.
+
+    def read_page1(self):
+        """
+        Lê em uma única requisição todas as linhas de configuração e a blacklist da 'Página1'.
+        :return: (lista de pares (linha, config), blacklist)
+        """
+        result = self._get_sheet().values().batchGet(
+            spreadsheetId=SPREADSHEET_ID, ranges=['Página1!B2:L', 'Página1!N2:N']
+        ).execute()
+        config_rows, blacklist_rows = [r.get('values', []) for r in result.get('valueRanges', [{}, {}])]
+
+        configs = []
+        for offset, linha in enumerate(config_rows):
+            if len(linha) > 1 and linha[1]:
+                configs.append((offset + 2, self._parse_config_row(linha)))
+        blacklist = [row[0] for row in blacklist_rows if row]
+        return configs, blacklist
+
+    # Acrescenta várias mensagens de log na 'Página2' em uma única requisição
+    def append_messages(self, messages):
+        self._get_sheet().values().append(
+            spreadsheetId=SPREADSHEET_ID,
+            range='Página2!A:A',
+            valueInputOption="RAW",
+            insertDataOption="INSERT_ROWS",
+            body={'values': [[message] for message in messages]}
+        ).execute()
+        bump_version()
 
-# Chamando o método para obter os dados
-config = acesso.get_config_from_spreadsheet()
+    # Atualiza a coluna M (status) de várias linhas em uma única requisição
+    def update_status_cells(self, statuses):
+        data = [{'range': f'Página1!M{linha}', 'values': [[message]]} for linha, message in statuses.items()]
+        self._get_sheet().values().batchUpdate(
+            spreadsheetId=SPREADSHEET_ID,
+            body={'valueInputOption': 'RAW', 'data': data}
+        ).execute()
+        bump_version()
 
-# Imprimindo os dados obtidos
-if config:
-    print("Parâmetros atualizados:") #, config)
+    # Apaga o log da 'Página2'
+    def clear_log(self):
+        self._get_sheet().values().clear(spreadsheetId=SPREADSHEET_ID, range='Página2!A:A').execute()
+        bump_version()
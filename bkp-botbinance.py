@@ -7,16 +7,17 @@ from dotenv import load_dotenv
 import os
 from send_email import send_email
 from acesso_planilha import AcessoPlanilha
+from transport import LazyClient
 
 acesso = AcessoPlanilha()
-config = acesso.get_config_from_spreadsheet()
+config = None  # Lida da planilha no início de cada ciclo de main()
 
 # Carregar variáveis de ambiente do .env
 load_dotenv()
 
 API_KEY = os.getenv("API_KEY")
 API_SECRET = os.getenv("API_SECRET")
-client = Client(API_KEY, API_SECRET)
+client = LazyClient(API_KEY, API_SECRET)  # Conecta à Binance só no primeiro uso
 
 # Função para obter o saldo
 def get_balance(asset):
@@ -158,7 +159,11 @@ def get_moving_averages(symbol, interval='1h', hours=20):
     return closes[-1] > sma  # Retorna True se preço atual > média
 
 # Obter as criptos mais voláteis
-def get_top_volatile_cryptos(limit=int(config['limite_criptos']), hours=int(config['horas_volatilidade']), min_volume=float(config['volume_minimo'].replace(',', '.'))):
+def get_top_volatile_cryptos(limit=None, hours=None, min_volume=None):
+    # Os padrões vêm da configuração lida no ciclo atual (e não no import do módulo)
+    limit = int(config['limite_criptos']) if limit is None else limit
+    hours = int(config['horas_volatilidade']) if hours is None else hours
+    min_volume = float(config['volume_minimo'].replace(',', '.')) if min_volume is None else min_volume
     try:
         #print("Obtendo todos os tickers da Binance...")
         # Obter todos os tickers da Binance
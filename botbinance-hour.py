@@ -7,18 +7,19 @@ from dotenv import load_dotenv
 import os
 from send_email import send_email
 from acesso_planilha import AcessoPlanilha
+from transport import LazyClient
 from datetime import datetime
 import concurrent.futures
 
 acesso = AcessoPlanilha()
-config = acesso.get_config_from_spreadsheet()
+config = None  # Lida da planilha no início de cada ciclo de main()
 
 # Carregar variáveis de ambiente do .env
 load_dotenv()
 
 API_KEY = os.getenv("API_KEY")
 API_SECRET = os.getenv("API_SECRET")
-client = Client(API_KEY, API_SECRET)
+client = LazyClient(API_KEY, API_SECRET)  # Conecta à Binance só no primeiro uso
 
 # Função para obter o saldo
 def get_balance(asset):
@@ -215,9 +216,11 @@ def process_ticker(ticker, min_volume, wallet_assets, hours):
 
 
 # Obter as criptos mais voláteis
-def get_top_volatile_cryptos(limit=int(config['limite_criptos']), 
-                             hours=int(config['horas_volatilidade']), 
-                             min_volume=float(config['volume_minimo'].replace(',', '.'))):
+def get_top_volatile_cryptos(limit=None, hours=None, min_volume=None):
+    # Os padrões vêm da configuração lida no ciclo atual (e não no import do módulo)
+    limit = int(config['limite_criptos']) if limit is None else limit
+    hours = int(config['horas_volatilidade']) if hours is None else hours
+    min_volume = float(config['volume_minimo'].replace(',', '.')) if min_volume is None else min_volume
     try:
         # Obter a blacklist como um conjunto (para buscas mais rápidas)
         blacklist_criptos = set(acesso.get_blacklist_from_spreadsheet())
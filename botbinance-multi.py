@@ -0,0 +1,212 @@
+import logging
+import concurrent.futures
+from dotenv import load_dotenv
+import os
+from send_email import send_email
+from acesso_planilha import AcessoPlanilha
+from event_log import setup_event_log, shutdown_event_log, log_event
+from exchanges import BinanceExchange
+from local_store import LocalStore, AcessoLocal, SheetsReplicator
+from market_data import MarketData
+from circuit_breaker import CircuitBreakers
+from clock_sync import ClockSync
+from rate_limiter import RateLimiter
+from scheduler import Scheduler, next_candle_close
+from strategies import get_strategy, screen
+from trader import Trader
+from transport import DEFAULT_POOL_SIZE, create_client, transport_stats
+from user_stream import AccountState, UserDataStream
+
+# Executa várias instâncias do robô (uma por linha da 'Página1') no mesmo processo.
+# Todas compartilham o mesmo núcleo de dados de mercado e o mesmo limitador de peso,
+# então o custo em API cresce com o número de símbolos e não com o número de estratégias.
+
+# Componentes criados por setup(): importar este módulo não acessa a rede, o banco nem a planilha
+store = None
+replicator = None
+acesso = None
+rate_limiter = None
+clock_sync = None
+circuit_breakers = None
+client = None
+market_data = None
+
+traders = {}  # linha da planilha -> Trader
+active = []  # Instâncias ativadas na última leitura da configuração
+
+CONFIG_INTERVAL = 60.0  # Segundos entre leituras da configuração
+SCREEN_DELAY = 10.0  # Segundos após o fechamento da vela para a triagem
+
+
+def setup():
+    global store, replicator, acesso, rate_limiter, clock_sync, circuit_breakers, client, market_data
+    global CONFIG_INTERVAL, SCREEN_DELAY
+
+    # Carregar variáveis de ambiente do .env
+    load_dotenv()
+    CONFIG_INTERVAL = float(os.getenv("CONFIG_INTERVAL", CONFIG_INTERVAL))
+    SCREEN_DELAY = float(os.getenv("SCREEN_DELAY", SCREEN_DELAY))
+
+    # O ciclo de trading lê e grava apenas no banco local; a planilha é espelhada em segundo plano
+    store = LocalStore()
+    replicator = SheetsReplicator(store, AcessoPlanilha())
+    replicator.sync_once()
+    acesso = AcessoLocal(store)
+
+    # Eventos em JSON (logs/eventos.jsonl) gravados em segundo plano, com cópia no console e no log da planilha
+    setup_event_log(acesso)
+
+    # O limite de peso da Binance é por IP: um único limitador para todos os clientes
+    rate_limiter = RateLimiter()
+    # O relógio é da máquina: um único deslocamento e recvWindow para todos os clientes
+    clock_sync = ClockSync()
+    # Um disjuntor por endpoint, compartilhado: a degradação é da Binance e não da conta
+    circuit_breakers = CircuitBreakers()
+
+    # Cliente da conta principal, usado para os dados de mercado
+    # Uma conexão HTTP reaproveitada (keep-alive) por thread de busca de velas
+    pool_size = int(os.getenv("HTTP_POOL_SIZE", DEFAULT_POOL_SIZE))
+    client = create_client(os.getenv("API_KEY"), os.getenv("API_SECRET"), pool_size)
+    rate_limiter.install(client)
+    clock_sync.install(client)
+    circuit_breakers.install(client)
+    # O núcleo do robô fala com a corretora pela interface Exchange (os limitadores ficam no cliente)
+    market_data = MarketData(BinanceExchange(client), max_workers=pool_size,
+                             price_max_age=float(os.getenv("PRICE_MAX_AGE", "5")))
+
+
+# Cria (ou reaproveita) a instância do robô de uma linha da planilha
+def get_trader(linha, config):
+    """
+    Cada linha usa as chaves API_KEY_<linha>/API_SECRET_<linha> do .env, se existirem
+    (subcontas), ou as chaves da conta principal.
+    """
+    trader = traders.get(linha)
+    if trader is None:
+        api_key = os.getenv(f"API_KEY_{linha}")
+        api_secret = os.getenv(f"API_SECRET_{linha}")
+        if api_key and api_secret:
+            trader_client = create_client(api_key, api_secret)
+            rate_limiter.install(trader_client)
+            clock_sync.install(trader_client)
+            circuit_breakers.install(trader_client)
+        else:
+            trader_client = client
+        trader = Trader(BinanceExchange(trader_client), AcessoLocal(store, linha), market_data, config,
+                         name=f"linha {linha}", store=store)
+        # Saldos e execuções pelo user data stream da conta desta instância, se habilitado no .env
+        if os.getenv("USER_STREAM") == "1":
+            trader.account_state = AccountState()
+            UserDataStream(trader_client, trader.account_state).start()
+        traders[linha] = trader
+    trader.config = config
+    return trader
+
+
+# Tarefa de configuração: relê as linhas da planilha (do banco local) e atualiza as instâncias ativas
+def refresh_configs():
+    global active
+    configs = [(linha, config) for linha, config in acesso.get_configs_from_spreadsheet() if config['on_off']]
+    if not configs and active:
+        log_event("Nenhuma instância ativada. Nenhuma ação será realizada.", fase='config')
+    active = [get_trader(linha, config) for linha, config in configs]
+
+
+# Executa uma função para cada instância ativa, em paralelo (cada uma na sua própria conta)
+def for_each_trader(traders_list, func):
+    if not traders_list:
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(traders_list)) as executor:
+        futures = {executor.submit(func, t): t for t in traders_list}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                log_event(f"Erro na instância {futures[future].name}: {e}", instancia=futures[future].name)
+
+
+# Tarefa rápida: análise de vendas de todas as instâncias
+def monitor_job():
+    for_each_trader(list(active), lambda t: t.run_monitor())
+
+
+# Tarefa lenta: triagem única para todas as estratégias e compras de cada instância
+def screening_job():
+    current = list(active)
+    if not current:
+        log_event("Nenhuma instância ativada. Nenhuma ação será realizada.", fase='config')
+        return
+
+    acesso.clear_column_a()
+
+    # As velas de cada símbolo são buscadas uma vez para todas as estratégias
+    strategy_configs = [(get_strategy(t.config['estrategia']), t.config) for t in current]
+    min_volume = min(float(t.config['volume_minimo'].replace(',', '.')) for t in current)
+    # Os ativos de cada conta só são descartados depois, em select_candidates: o pré-ranking guarda vagas
+    # para eles, senão a conta que já possui os líderes ficaria com menos candidatos que uma carteira vazia
+    held_reserve = max(len(t.get_held_assets()) for t in current)
+    rankings = dict(zip(current, screen(strategy_configs, market_data.get_tickers(), market_data, min_volume, {},
+                                        blacklist=acesso.get_blacklist_from_spreadsheet(),
+                                        top_k=0,  # Ranking completo: cada conta ainda filtra o que já possui
+                                        held_reserve=held_reserve)))
+
+    for_each_trader(current, lambda t: t.run_screening(rankings[t]))
+
+    stats = transport_stats(client)
+    log_event(f"Pool HTTP: {stats.get('saturadas', 0)} requisição(ões) esperaram conexão livre.",
+              fase='triagem', console=False, **stats)
+
+
+def monitor_interval():
+    return min((int(t.config['intervalo_analise']) for t in active), default=60)
+
+
+# Próxima triagem: o fechamento de vela mais próximo entre as estratégias ativas (velas recalculadas)
+# ou, antes disso, o próximo intervalo de análise (ranking refeito só com os preços ao vivo)
+def next_screening(now):
+    intervals = {get_strategy(t.config['estrategia']).interval for t in active} or {'1h'}
+    closes = [next_candle_close(interval, now, SCREEN_DELAY) for interval in intervals]
+    return min(closes + [now + monitor_interval()])
+
+
+def main():
+
+    replicator.start()
+    acesso.update_error_message("Running...")
+
+    # Preços pelo websocket em vez de REST, se habilitado no .env
+    if os.getenv("PRICE_STREAM") == "1":
+        market_data.price_snapshot.start_stream()
+
+    refresh_configs()
+
+    # Cada tarefa roda na sua própria thread: uma triagem lenta nunca atrasa os stops
+    scheduler = Scheduler()
+    scheduler.add_job('config', refresh_configs, interval=CONFIG_INTERVAL, run_immediately=False)
+    scheduler.add_job('vendas', monitor_job, interval=monitor_interval)
+    scheduler.add_job('triagem', screening_job, align=next_screening)
+
+    log_event(f"Análise de vendas e ranking a cada {monitor_interval()} segundo(s); velas recalculadas no "
+              f"fechamento de cada vela.", fase='config')
+    scheduler.run_forever()
+
+
+# Iniciar o bot com o tratamento de exceções
+if __name__ == "__main__":
+    try:
+        setup()
+        main()
+    except Exception as e:
+        error_message = f"Ocorreu um erro fatal no robô: {str(e)}"
+        additional_message = "O robô foi encerrado."
+        send_email("Erro fatal no Robô de Trading", f"{error_message}\n\n{additional_message}")
+
+        log_event(error_message, nivel=logging.ERROR)
+        shutdown_event_log()  # Grava os eventos ainda na fila
+        if acesso is not None:
+            acesso.update_error_message("Encerrado")
+        if replicator is not None:
+            replicator.stop()  # Envia o status e o log pendentes antes de sair
+
+        print("Erro fatal capturado. O robô foi encerrado.")
+        exit(1)  # Encerra o robô após enviar o e-mail
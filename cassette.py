@@ -0,0 +1,207 @@
+import os
+import gzip
+import json
+import threading
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Parâmetros que mudam a cada requisição assinada (ou a cada ciclo, como os clientOrderIds) e não identificam a resposta
+VOLATILE_PARAMS = ('timestamp', 'signature', 'recvWindow', 'newClientOrderId', 'origClientOrderId')
+
+# Cabeçalhos que não valem para o corpo gravado (o corpo é guardado já descompactado)
+DROPPED_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length', 'connection')
+
+
+class CassetteMiss(KeyError):
+    """
+    A reprodução pediu algo que não foi gravado no cassete.
+    """
+
+
+# Normaliza parâmetros "a=1&b=2" removendo os voláteis e ordenando
+def _normalize_params(raw):
+    if not raw:
+        return ''
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8')
+    if isinstance(raw, dict):
+        pairs = list(raw.items())
+    else:
+        pairs = parse_qsl(str(raw), keep_blank_values=True)
+    return urlencode(sorted((k, v) for k, v in pairs if k not in VOLATILE_PARAMS))
+
+
+# Chave de uma requisição: método, caminho, query e corpo normalizados (sem host, para servir qualquer URL base)
+def request_key(method, url, body=None):
+    parts = urlsplit(url)
+    return f"{method.upper()} {parts.path}?{_normalize_params(parts.query)} {_normalize_params(body)}"
+
+
+class Cassette:
+    """
+    Arquivo compactado (JSON + gzip) com as respostas REST da Binance e as chamadas à
+    planilha e ao e-mail de uma execução do robô.
+
+    - mode='record': repassa tudo aos serviços reais e grava as respostas;
+    - mode='replay': responde a partir do arquivo, sem rede, na velocidade máxima.
+
+    Respostas iguais são servidas na ordem em que foram gravadas; quando acabam,
+    a última se repete.
+    """
+
+    def __init__(self, path, mode='replay'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Modo de cassete inválido: {mode}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._positions = {}  # Próxima resposta de cada chave na reprodução
+        self.http = {}  # chave -> [respostas]
+        self.calls = {}  # nome -> [resultados]
+        if mode == 'replay':
+            self.load()
+
+    @property
+    def recording(self):
+        return self.mode == 'record'
+
+    def load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        self.http = data.get('http', {})
+        self.calls = data.get('calls', {})
+
+    def save(self):
+        if not self.recording:
+            return
+        with self._lock:
+            data = {'http': self.http, 'calls': self.calls}
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def _append(self, table, key, entry):
+        with self._lock:
+            table.setdefault(key, []).append(entry)
+
+    def _next(self, table, key):
+        with self._lock:
+            entries = table.get(key)
+            if not entries:
+                raise CassetteMiss(f"Nada gravado no cassete para: {key}")
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            return entries[min(position, len(entries) - 1)]
+
+    # --- REST (adaptador da sessão requests) ---
+
+    def install_client(self, client):
+        """
+        Faz a sessão HTTP de um cliente python-binance gravar ou responder pelo cassete.
+        Na gravação, o adaptador já montado (e.g., o do módulo transport) continua sendo usado.
+        """
+        session = client.session
+        if self.recording:
+            adapter = RecordingAdapter(self, session.get_adapter('https://'))
+        else:
+            adapter = ReplayAdapter(self)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return client
+
+    # --- Chamadas de métodos (planilha, e-mail) ---
+
+    def wrap(self, name, func):
+        """
+        Envolve uma função: na gravação guarda o retorno (ou o erro); na reprodução
+        devolve o que foi gravado sem chamar a função.
+        """
+        def recorded(*args, **kwargs):
+            if not self.recording:
+                entry = self._next(self.calls, name)
+                if 'erro' in entry:
+                    raise RuntimeError(entry['erro'])
+                return entry.get('resultado')
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._append(self.calls, name, {'erro': str(e)})
+                raise
+            self._append(self.calls, name, {'resultado': result})
+            return result
+        return recorded
+
+    def patch(self, obj, attr, name=None):
+        setattr(obj, attr, self.wrap(name or attr, getattr(obj, attr)))
+
+    # Métodos de AcessoPlanilha usados pelo SheetsReplicator
+    def patch_sheets(self, acesso_planilha):
+        for attr in ('read_page1', 'append_messages', 'update_status_cells', 'clear_log'):
+            self.patch(acesso_planilha, attr, f"planilha.{attr}")
+
+    # A função send_email importada em cada módulo informado
+    def patch_email(self, *modules):
+        for module in modules:
+            self.patch(module, 'send_email', 'smtp.send_email')
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    Adaptador que repassa as requisições ao adaptador real e grava as respostas.
+    """
+
+    def __init__(self, cassette, inner=None):
+        super().__init__()
+        self.cassette = cassette
+        self.inner = inner or HTTPAdapter()
+
+    def send(self, request, **kwargs):
+        response = self.inner.send(request, **kwargs)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS}
+        self.cassette._append(self.cassette.http, request_key(request.method, request.url, request.body), {
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': headers,
+            'body': response.content.decode('utf-8', errors='replace'),
+        })
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Adaptador que responde a partir do cassete, sem abrir conexões.
+    """
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        entry = self.cassette._next(self.cassette.http, request_key(request.method, request.url, request.body))
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = entry.get('reason')
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        response._content = entry['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def cassette_from_env():
+    """
+    Cassete configurado no .env (CASSETTE=arquivo.json.gz e CASSETTE_MODE=record|replay),
+    ou None se não houver.
+    """
+    path = os.getenv("CASSETTE")
+    if not path:
+        return None
+    return Cassette(path, os.getenv("CASSETTE_MODE", "replay"))
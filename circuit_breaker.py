@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+import requests
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+from event_log import log_event
+
+CLOSED = 'fechado'
+OPEN = 'aberto'
+HALF_OPEN = 'meio-aberto'
+
+
+# Código de erro dos circuitos abertos (o mesmo do excesso de requisições da Binance)
+CIRCUIT_OPEN_CODE = -1003
+
+
+class CircuitOpenError(BinanceAPIException):
+    """
+    A requisição nem foi enviada: o circuito do endpoint está aberto.
+
+    Sai como um erro da Binance (429/-1003), para que quem já trata `BinanceAPIException`
+    (compras, vendas, proteção) registre a falha daquele ativo e siga com os demais.
+    """
+
+    def __init__(self, endpoint, retry_in):
+        message = f"Circuito de '{endpoint}' aberto; nova tentativa em {retry_in:.1f} s."
+        super().__init__(None, 429, json.dumps({'code': CIRCUIT_OPEN_CODE, 'msg': message}))
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+# Endpoint de uma URL da API, e.g., '.../api/v3/ticker/24hr' -> 'ticker/24hr'
+def endpoint_key(uri):
+    path = uri.split('?')[0].rstrip('/')
+    for marker in ('/v3/', '/v1/'):
+        if marker in path:
+            return path.split(marker, 1)[1]
+    return path.rsplit('/', 1)[-1]
+
+
+# Erros que indicam a Binance (ou a rede) degradada; erros de negócio (saldo, ordem inexistente) não contam
+def is_failure(error):
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (requests.exceptions.RequestException, BinanceRequestException)):
+        return True
+    if isinstance(error, BinanceAPIException):
+        return error.status_code >= 500 or error.status_code in (418, 429) or error.code in (-1000, -1001, -1003,
+                                                                                              -1006, -1007)
+    return False
+
+
+class CircuitBreaker:
+    """
+    Disjuntor de um endpoint.
+
+    - fechado: as requisições passam e os resultados recentes ficam numa janela; com ao
+      menos `min_calls` chamadas e a fração de falhas (erros ou respostas mais lentas que
+      `slow_call`) acima de `failure_rate`, o circuito abre;
+    - aberto: as requisições falham na hora com `CircuitOpenError` durante o recuo, que
+      dobra a cada abertura seguida (com jitter) até `max_backoff`;
+    - meio-aberto: passado o recuo, uma única requisição de teste passa; se der certo o
+      circuito fecha, senão abre de novo com recuo maior.
+    """
+
+    def __init__(self, name, failure_rate=0.5, slow_call=5.0, min_calls=10, window=60.0,
+                 base_backoff=2.0, max_backoff=120.0):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.min_calls = min_calls
+        self.window = window
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.opened_count = 0  # Aberturas seguidas, para o recuo exponencial
+        self.open_until = 0.0
+        self._results = deque()  # (instante, falhou)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    # Libera ou barra uma requisição; no meio-aberto só uma requisição de teste passa por vez
+    def before_call(self):
+        with self._lock:
+            now = time.time()
+            if self.state == OPEN:
+                if now < self.open_until:
+                    raise CircuitOpenError(self.name, self.open_until - now)
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probing = True
+
+    def record(self, failed):
+        with self._lock:
+            now = time.time()
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self.opened_count = 0
+                    self._results.clear()
+                    log_event(f"Circuito de '{self.name}' fechado: a Binance voltou a responder.", fase='circuito',
+                              endpoint=self.name)
+                return
+            if self.state == OPEN:
+                return
+
+            self._results.append((now, failed))
+            while self._results and now - self._results[0][0] >= self.window:
+                self._results.popleft()
+            failures = sum(1 for _, f in self._results if f)
+            if len(self._results) >= self.min_calls and failures / len(self._results) >= self.failure_rate:
+                self._open(now)
+
+    # Abre o circuito com recuo exponencial e jitter (chamado com o lock)
+    def _open(self, now):
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** self.opened_count)
+        backoff = random.uniform(backoff / 2, backoff)
+        self.opened_count += 1
+        self.state = OPEN
+        self.open_until = now + backoff
+        self._results.clear()
+        log_event(f"Circuito de '{self.name}' aberto por {backoff:.1f} s após falhas ou lentidão.", fase='circuito',
+                  nivel=logging.WARNING, endpoint=self.name, recuo=backoff, aberturas=self.opened_count)
+
+    def is_open(self):
+        with self._lock:
+            return self.state == OPEN and time.time() < self.open_until
+
+
+class CircuitBreakers:
+    """
+    Um disjuntor por endpoint da Binance: velas falhando não bloqueiam ordens nem a conta.
+
+    Como a degradação é da Binance (ou da rede) e não da conta, uma única instância deve ser
+    compartilhada por todos os clientes do processo.
+    """
+
+    def __init__(self, **settings):
+        """
+        :param settings: Parâmetros de cada `CircuitBreaker`. Os não informados vêm do .env
+                         (CIRCUIT_FAILURE_RATE, CIRCUIT_SLOW_CALL, CIRCUIT_MIN_CALLS,
+                         CIRCUIT_MAX_BACKOFF) ou dos padrões.
+        """
+        defaults = {
+            'failure_rate': float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5")),
+            'slow_call': float(os.getenv("CIRCUIT_SLOW_CALL", "5")),
+            'min_calls': int(os.getenv("CIRCUIT_MIN_CALLS", "10")),
+            'max_backoff': float(os.getenv("CIRCUIT_MAX_BACKOFF", "120")),
+        }
+        self.settings = dict(defaults, **settings)
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint):
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = self._breakers[endpoint] = CircuitBreaker(endpoint, **self.settings)
+            return breaker
+
+    def install(self, client):
+        """
+        Faz as requisições REST do cliente python-binance passarem pelo disjuntor do seu endpoint.
+        """
+        original_request = client._request
+
+        def _request(method, uri, signed, force_params=False, **kwargs):
+            breaker = self.get(endpoint_key(uri))
+            breaker.before_call()
+            start = time.time()
+            try:
+                result = original_request(method, uri, signed, force_params, **kwargs)
+            except Exception as e:
+                breaker.record(is_failure(e))
+                raise
+            breaker.record(time.time() - start > breaker.slow_call)
+            return result
+
+        client._request = _request
+        return client
+
+    # Estado de cada endpoint já usado, para o log
+    def states(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.state for breaker in breakers}
@@ -0,0 +1,147 @@
+import os
+import math
+import time
+import threading
+from binance.exceptions import BinanceAPIException
+from event_log import log_event
+
+# Código da Binance para timestamp fora da janela (adiantado ou atrasado demais em relação ao servidor)
+TIMESTAMP_ERROR_CODE = -1021
+
+# Limites do recvWindow aceitos pela Binance (em ms)
+MIN_RECV_WINDOW = 5000
+MAX_RECV_WINDOW = 60000
+
+
+class ClockSync:
+    """
+    Sincroniza o relógio local com o da Binance para as requisições assinadas.
+
+    Amostras de `/api/v3/time` dão o deslocamento (hora do servidor - hora local no meio da
+    ida e volta) e o tempo de ida e volta (RTT); ambos são suavizados por média móvel
+    exponencial. Cada cliente instalado recebe:
+
+    - `timestamp_offset`: o deslocamento suavizado, um pouco atrasado pela variação do RTT
+      (a Binance rejeita timestamps mais de 1 s à frente do servidor);
+    - `REQUEST_RECVWINDOW`: uma janela proporcional à latência medida, entre 5 s e 60 s.
+
+    O limite de peso é por IP e o relógio é da máquina: uma única instância deve ser
+    compartilhada por todos os clientes do processo.
+    """
+
+    def __init__(self, interval=None, alpha=0.2, min_recv_window=MIN_RECV_WINDOW, max_recv_window=MAX_RECV_WINDOW):
+        """
+        :param interval: Segundos entre amostras (None = CLOCK_SYNC_INTERVAL do .env ou 300).
+        :param alpha: Peso de cada nova amostra nas médias móveis.
+        """
+        self.interval = interval if interval is not None else float(os.getenv("CLOCK_SYNC_INTERVAL", "300"))
+        self.alpha = alpha
+        self.min_recv_window = min_recv_window
+        self.max_recv_window = max_recv_window
+        self.offset = None  # ms (servidor - local)
+        self.rtt = None  # ms
+        self.rtt_deviation = 0.0  # ms
+        self.samples = 0
+        self.resyncs = 0  # Amostras forçadas por um erro -1021
+        self.last_sample = 0.0
+        self._clients = []
+        self._lock = threading.Lock()
+
+    # Uma amostra de /api/v3/time feita pelo cliente informado
+    def sample(self, client):
+        start = time.time()
+        server_time = client.get_server_time()['serverTime']
+        end = time.time()
+
+        rtt = (end - start) * 1000
+        offset = server_time - (start + end) * 500
+        with self._lock:
+            if self.offset is None:
+                self.offset, self.rtt = offset, rtt
+            else:
+                self.rtt_deviation += self.alpha * (abs(rtt - self.rtt) - self.rtt_deviation)
+                self.offset += self.alpha * (offset - self.offset)
+                self.rtt += self.alpha * (rtt - self.rtt)
+            self.samples += 1
+            self.last_sample = end
+        self.apply()
+        return offset, rtt
+
+    # recvWindow em ms: folga para a ida ao servidor e a variação do RTT, arredondada para cima em segundos
+    def recv_window(self):
+        with self._lock:
+            if self.rtt is None:
+                return self.min_recv_window
+            window = 4 * (self.rtt + 4 * self.rtt_deviation)
+        window = math.ceil(window / 1000) * 1000
+        return int(max(self.min_recv_window, min(self.max_recv_window, window)))
+
+    # Deslocamento aplicado aos timestamps: atrasado pela variação do RTT para nunca ficar à frente do servidor
+    def timestamp_offset(self):
+        with self._lock:
+            if self.offset is None:
+                return 0
+            return int(self.offset - self.rtt_deviation)
+
+    # Repassa o deslocamento e o recvWindow atuais a todos os clientes instalados
+    def apply(self):
+        offset = self.timestamp_offset()
+        recv_window = self.recv_window()
+        for client in list(self._clients):
+            client.timestamp_offset = offset
+            client.REQUEST_RECVWINDOW = recv_window
+
+    def due(self):
+        return self.offset is None or time.time() - self.last_sample >= self.interval
+
+    # Nova amostra se o intervalo venceu (ou se forçada); erros de rede só adiam a sincronização
+    def _resync(self, client, force=False):
+        if not force and not self.due():
+            return
+        try:
+            offset, rtt = self.sample(client)
+        except Exception as e:
+            log_event(f"Erro ao sincronizar o relógio com a Binance: {e}", fase='relogio', console=False)
+            self.last_sample = time.time()  # Tenta de novo no próximo intervalo
+            return
+        log_event(f"Relógio sincronizado: deslocamento {self.timestamp_offset()} ms, RTT {rtt:.0f} ms, "
+                  f"recvWindow {self.recv_window()} ms.", fase='relogio', console=False,
+                  deslocamento=offset, rtt=rtt, recv_window=self.recv_window())
+
+    def install(self, client):
+        """
+        Aplica a sincronização às requisições assinadas do cliente python-binance: o relógio
+        é amostrado ao instalar e depois a cada `interval`, e uma requisição rejeitada por
+        timestamp (-1021) é repetida uma única vez após uma nova amostra.
+        """
+        with self._lock:
+            self._clients.append(client)
+        self._resync(client, force=self.offset is None)
+        self.apply()
+
+        original_request = client._request
+
+        def _request(method, uri, signed, force_params=False, **kwargs):
+            if not signed:
+                return original_request(method, uri, signed, force_params, **kwargs)
+            self._resync(client)
+            # A assinatura é recalculada a cada tentativa; os parâmetros originais são preservados
+            data = dict(kwargs['data']) if isinstance(kwargs.get('data'), dict) else None
+            try:
+                return original_request(method, uri, signed, force_params, **kwargs)
+            except BinanceAPIException as e:
+                if e.code != TIMESTAMP_ERROR_CODE:
+                    raise
+                self.resyncs += 1
+                self._resync(client, force=True)
+                if data is not None:
+                    kwargs['data'] = data
+                return original_request(method, uri, signed, force_params, **kwargs)
+
+        client._request = _request
+        return client
+
+    def stats(self):
+        with self._lock:
+            return {'deslocamento_ms': self.offset, 'rtt_ms': self.rtt, 'variacao_rtt_ms': self.rtt_deviation,
+                    'amostras': self.samples, 'ressincronizacoes': self.resyncs}
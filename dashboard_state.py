@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import threading
+
+# Arquivos locais compartilhados entre o robô e o painel (main.py)
+VERSION_FILE = '.dashboard_version'  # Alterado a cada escrita do robô na planilha
+POSITIONS_FILE = 'posicoes.json'  # Última foto das posições monitoradas
+
+
+# Grava um arquivo de forma atômica (o painel nunca lê um arquivo pela metade)
+def _write_atomic(path, content):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+# Sinaliza ao painel que o robô escreveu na planilha (as posições têm versão própria)
+def bump_version():
+    try:
+        _write_atomic(VERSION_FILE, str(time.time()))
+    except OSError as e:
+        print(f"Erro ao atualizar a versão do painel: {e}")
+
+
+# Versão atual dos dados do robô (0 se o robô ainda não escreveu nada)
+def current_version():
+    try:
+        with open(VERSION_FILE, encoding='utf-8') as f:
+            return float(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0.0
+
+
+_positions_lock = threading.Lock()
+
+
+def _read_positions_file():
+    try:
+        with open(POSITIONS_FILE, encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+# Publica as posições avaliadas no último monitoramento de uma instância do robô. Não mexe na
+# versão da planilha: o painel percebe a mudança pelo próprio arquivo (positions_version) e relê
+# só as posições, sem gastar cota do Google Sheets a cada monitoramento.
+def publish_positions(positions, instance='principal'):
+    with _positions_lock:
+        data = _read_positions_file()
+        if data.get(instance) == positions:
+            return
+        data[instance] = positions
+        try:
+            _write_atomic(POSITIONS_FILE, json.dumps(data, ensure_ascii=False))
+        except OSError as e:
+            print(f"Erro ao publicar as posições: {e}")
+
+
+# Versão atual das posições publicadas (0 se ainda não há posições)
+def positions_version():
+    try:
+        return os.stat(POSITIONS_FILE).st_mtime_ns
+    except OSError:
+        return 0
+
+
+# Lista única com as posições de todas as instâncias
+def load_positions():
+    positions = []
+    for instance, items in _read_positions_file().items():
+        positions.extend(dict(item, instancia=instance) for item in items)
+    return positions
+
+
+class DashboardCache:
+    """
+    Foto em cache dos dados exibidos no painel (configuração, posições e log recente).
+
+    A parte da planilha só é recarregada quando o robô sinaliza uma escrita (bump_version)
+    ou quando alguém a invalida; a parte local (posições) só quando o seu arquivo muda
+    (positions_version). Nenhuma das duas é relida mais de uma vez a cada `min_interval`
+    segundos, de modo que vários painéis abertos não multiplicam o uso de cota do Google Sheets.
+    """
+
+    def __init__(self, loader, min_interval=5.0, local_loader=None):
+        """
+        :param loader: Função sem argumentos que retorna o dicionário da foto (dados da planilha).
+        :param local_loader: Função sem argumentos que retorna os dados locais (posições),
+                             mesclados à foto.
+        """
+        self.loader = loader
+        self.local_loader = local_loader
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._loaded_version = None
+        self._loaded_positions = None
+        self._loaded_at = 0.0
+        self._invalid = True
+        self.version = 0  # Incrementa a cada nova foto; usado pelo stream do painel
+
+    def invalidate(self):
+        with self._lock:
+            self._invalid = True
+
+    def _stale(self):
+        if self._snapshot is None:
+            return True
+        if time.time() - self._loaded_at < self.min_interval:
+            return False
+        return self._invalid or current_version() != self._loaded_version
+
+    # Só as posições mudaram: relê o arquivo local e mantém os dados da planilha da foto atual
+    def _refresh_local(self):
+        if self._snapshot is None or self.local_loader is None:
+            return
+        if time.time() - self._loaded_at < self.min_interval:
+            return
+        version = positions_version()
+        if version == self._loaded_positions:
+            return
+        try:
+            local = self.local_loader()
+        except Exception as e:
+            print(f"Erro ao recarregar as posições do painel: {e}")
+            return
+        self._snapshot = dict(self._snapshot, **local)
+        self._loaded_positions = version
+        self._loaded_at = time.time()
+        self.version += 1
+
+    def get(self):
+        with self._lock:
+            if not self._stale():
+                self._refresh_local()
+                return self._snapshot
+            version = current_version()
+            positions = positions_version()
+            try:
+                snapshot = self.loader()
+                if self.local_loader is not None:
+                    snapshot = dict(snapshot, **self.local_loader())
+            except Exception as e:
+                print(f"Erro ao recarregar os dados do painel: {e}")
+                if self._snapshot is None:
+                    raise
+                # Mantém a foto anterior e só tenta de novo após min_interval
+                self._loaded_at = time.time()
+                return self._snapshot
+            self._snapshot = snapshot
+            self._loaded_version = version
+            self._loaded_positions = positions
+            self._loaded_at = time.time()
+            self._invalid = False
+            self.version += 1
+            return self._snapshot
@@ -0,0 +1,136 @@
+import os
+import json
+import uuid
+import queue
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+# Arquivo de eventos (um JSON por linha), rotacionado por tamanho
+LOG_FILE = os.path.join('logs', 'eventos.jsonl')
+
+_logger = logging.getLogger('botbinance.eventos')
+_logger.propagate = False
+_listener = None
+
+
+# Identificador curto de um ciclo do robô, gravado em todos os eventos do ciclo
+def new_cycle_id():
+    return uuid.uuid4().hex[:8]
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formata cada evento como uma linha JSON com ciclo, instância, fase, símbolo e valores.
+    """
+
+    def format(self, record):
+        event = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'nivel': record.levelname,
+            'mensagem': record.getMessage(),
+        }
+        for key in ('ciclo', 'instancia', 'fase', 'simbolo'):
+            value = getattr(record, key, None)
+            if value is not None:
+                event[key] = value
+        values = getattr(record, 'valores', None)
+        if values:
+            event['valores'] = values
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class ConsoleForwarder(logging.Handler):
+    """
+    Repassa para o console os eventos marcados com console=True (o antigo print).
+    """
+
+    def emit(self, record):
+        if getattr(record, 'console', True):
+            print(record.getMessage())
+
+
+class SheetsForwarder(logging.Handler):
+    """
+    Repassa para o log da planilha (ou para o LocalStore, via AcessoLocal) os eventos
+    marcados com planilha=True (o antigo acesso.append_message). Usa o acesso informado
+    no próprio evento, se houver, ou o acesso padrão.
+    """
+
+    def __init__(self, acesso=None):
+        super().__init__()
+        self.acesso = acesso
+
+    def emit(self, record):
+        acesso = getattr(record, 'acesso', None) or self.acesso
+        if getattr(record, 'planilha', False) and acesso is not None:
+            try:
+                acesso.append_message(record.getMessage())
+            except Exception:
+                self.handleError(record)
+
+
+def setup_event_log(acesso=None, path=LOG_FILE, max_bytes=5 * 1024 * 1024, backup_count=5, forwarders=None):
+    """
+    Configura o log de eventos: o robô só enfileira cada evento e uma thread de fundo
+    grava o arquivo rotativo e repassa para o console e para a planilha.
+
+    :param acesso: AcessoPlanilha/AcessoLocal usado pelo encaminhador da planilha (opcional).
+    :param forwarders: Handlers adicionais (ou substitutos) para os encaminhadores padrão.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+
+    if forwarders is None:
+        forwarders = [ConsoleForwarder(), SheetsForwarder(acesso)]
+
+    log_queue = queue.SimpleQueue()
+    _logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _logger.setLevel(logging.INFO)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, *forwarders)
+    _listener.start()
+    return _listener
+
+
+# Esvazia a fila e para a thread de fundo (chamar antes de encerrar o robô)
+def shutdown_event_log():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_event(message, fase=None, simbolo=None, ciclo=None, instancia=None, planilha=False, console=True,
+              acesso=None, nivel=logging.INFO, **valores):
+    """
+    Registra um evento do robô.
+
+    :param message: Texto legível (o mesmo que antes ia para print/append_message).
+    :param fase: Etapa do ciclo, e.g., 'config', 'vendas', 'triagem', 'compras'.
+    :param simbolo: Símbolo relacionado ao evento, se houver.
+    :param planilha: Se True, o texto também vai para o log da planilha.
+    :param acesso: Acesso usado para a planilha no lugar do padrão (e.g., o da instância).
+    :param console: Se False, o texto não é exibido no console.
+    :param valores: Valores numéricos ou extras gravados no JSON.
+    """
+    if _listener is None:
+        # Sem setup_event_log (scripts avulsos e testes): mantém o comportamento síncrono antigo
+        if console:
+            print(message)
+        if planilha and acesso is not None:
+            acesso.append_message(str(message))
+        return
+    _logger.log(nivel, message, extra={
+        'fase': fase, 'simbolo': simbolo, 'ciclo': ciclo, 'instancia': instancia,
+        'planilha': planilha, 'console': console, 'acesso': acesso, 'valores': valores or None,
+    })
@@ -0,0 +1,469 @@
+import os
+import json
+import abc
+import time
+import threading
+import concurrent.futures
+import requests
+from binance.exceptions import BinanceAPIException
+from event_log import log_event
+from rate_limiter import RateLimiter
+from scheduler import INTERVAL_SECONDS
+from strategies import screen
+from transport import DEFAULT_POOL_SIZE, PooledAdapter
+
+# API v4 da Mercado Bitcoin
+MB_BASE_URL = "https://api.mercadobitcoin.net/api/v4"
+
+# Segundos antes da expiração em que o token de acesso é renovado
+TOKEN_REFRESH_MARGIN = 60
+
+# Resoluções de velas da Mercado Bitcoin, em segundos (os demais intervalos são agregados a partir delas)
+MB_RESOLUTIONS = {'1m': 60, '15m': 900, '1h': 3600, '3h': 10800, '1d': 86400, '1w': 604800}
+
+# Pares consultados por requisição de tickers na Mercado Bitcoin
+MB_TICKERS_PER_REQUEST = 50
+
+# Status das ordens da Mercado Bitcoin no formato da Binance
+MB_ORDER_STATUS = {'created': 'NEW', 'working': 'NEW', 'filled': 'FILLED', 'cancelled': 'CANCELED'}
+
+# Status em que uma ordem da Mercado Bitcoin não muda mais
+MB_FINAL_STATUSES = ('FILLED', 'CANCELED')
+
+# Segundos entre as consultas de uma ordem a mercado recém-criada, até ela chegar a um status final
+MB_ORDER_POLL_INTERVAL = 0.5
+
+
+class ExchangeAPIError(BinanceAPIException):
+    """
+    Erro de uma corretora no formato da Binance (code/message/status_code), para que o
+    núcleo do robô trate as falhas de qualquer corretora do mesmo jeito.
+    """
+
+    def __init__(self, response, status_code, code, message):
+        super().__init__(response, status_code, json.dumps({'code': code, 'msg': message}))
+
+
+class Exchange(abc.ABC):
+    """
+    Interface das corretoras usada pelo núcleo do robô (MarketData, triagem e Trader).
+
+    Os modelos seguem o formato da Binance, já usado em todo o robô:
+    - tickers de 24h com 'symbol', 'lastPrice', 'highPrice', 'lowPrice', 'volume' e 'quoteVolume';
+    - velas como listas [abertura (ms), abertura, máxima, mínima, fechamento, volume, fechamento (ms), ...];
+    - ordens com 'symbol', 'orderId', 'clientOrderId', 'side', 'status', 'executedQty' e 'cummulativeQuoteQty';
+    - símbolos sem separador (e.g., 'BTCBRL').
+    """
+
+    name = None
+    quote = None  # Moeda de cotação dos pares analisados nesta corretora
+
+    @abc.abstractmethod
+    def get_ticker(self, symbol=None):
+        pass
+
+    @abc.abstractmethod
+    def get_all_tickers(self):
+        pass
+
+    @abc.abstractmethod
+    def get_exchange_info(self):
+        pass
+
+    @abc.abstractmethod
+    def get_klines(self, symbol, interval, limit=500):
+        pass
+
+    @abc.abstractmethod
+    def get_account(self):
+        pass
+
+    def get_asset_balance(self, asset):
+        balances = self.get_account()['balances']
+        return next((balance for balance in balances if balance['asset'] == asset), None)
+
+    @abc.abstractmethod
+    def get_all_orders(self, symbol, limit=500, fromId=None):
+        pass
+
+    @abc.abstractmethod
+    def get_open_orders(self, symbol=None):
+        pass
+
+    @abc.abstractmethod
+    def get_order(self, symbol, orderId=None, origClientOrderId=None):
+        pass
+
+    @abc.abstractmethod
+    def create_order(self, symbol, side, type, quantity=None, **params):
+        pass
+
+
+class BinanceExchange(Exchange):
+    """
+    Binance pelo cliente python-binance (criado com `transport.create_client`, que já tem
+    sessão com pool de conexões e os limitadores instalados).
+    """
+
+    name = 'binance'
+    quote = 'USDT'
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_ticker(self, symbol=None):
+        return self.client.get_ticker(symbol=symbol) if symbol else self.client.get_ticker()
+
+    def get_all_tickers(self):
+        return self.client.get_all_tickers()
+
+    def get_exchange_info(self):
+        return self.client.get_exchange_info()
+
+    def get_klines(self, symbol, interval, limit=500):
+        return self.client.get_klines(symbol=symbol, interval=interval, limit=limit)
+
+    def get_account(self):
+        return self.client.get_account()
+
+    def get_asset_balance(self, asset):
+        return self.client.get_asset_balance(asset=asset)
+
+    def get_all_orders(self, symbol, limit=500, fromId=None):
+        params = {'symbol': symbol, 'limit': limit}
+        if fromId:
+            params['fromId'] = fromId
+        return self.client.get_all_orders(**params)
+
+    def get_open_orders(self, symbol=None):
+        return self.client.get_open_orders(symbol=symbol) if symbol else self.client.get_open_orders()
+
+    def get_order(self, symbol, orderId=None, origClientOrderId=None):
+        params = {'orderId': orderId} if orderId is not None else {'origClientOrderId': origClientOrderId}
+        return self.client.get_order(symbol=symbol, **params)
+
+    def create_order(self, symbol, side, type, quantity=None, **params):
+        return self.client.create_order(symbol=symbol, side=side, type=type, quantity=quantity, **params)
+
+    # Demais métodos do python-binance (e.g., ordens OCO) seguem direto para o cliente
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+
+class MercadoBitcoinExchange(Exchange):
+    """
+    Mercado Bitcoin (API v4) no formato da Binance.
+
+    Uma única sessão HTTP com pool de conexões (keep-alive) serve todas as threads; o
+    token de acesso é guardado e renovado antes de expirar (ou ao receber 401), e as
+    requisições passam por um limitador próprio (MB_REQUESTS_PER_MINUTE).
+    """
+
+    name = 'mercadobitcoin'
+    quote = 'BRL'
+
+    def __init__(self, login, password, base_url=None, pool_size=None, requests_per_minute=None, timeout=10):
+        """
+        :param login: Id da chave de API (token id).
+        :param password: Segredo da chave de API.
+        :param base_url: URL base alternativa (None = MB_BASE_URL do .env ou a API oficial).
+        """
+        self.login = login
+        self.password = password
+        self.base_url = (base_url or os.getenv("MB_BASE_URL") or MB_BASE_URL).rstrip('/')
+        self.timeout = timeout
+
+        pool_size = pool_size or int(os.getenv("HTTP_POOL_SIZE", DEFAULT_POOL_SIZE))
+        self.transport = PooledAdapter(pool_size)
+        self.session = requests.Session()
+        self.session.mount('https://', self.transport)
+        self.session.mount('http://', self.transport)
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+        self.limiter = RateLimiter(requests_per_minute or int(os.getenv("MB_REQUESTS_PER_MINUTE", "300")))
+
+        self._token = None
+        self._token_expires = 0.0
+        self._token_lock = threading.Lock()
+        self._account_id = None
+        self._pairs = {}  # 'BTCBRL' -> 'BTC-BRL'
+
+    # --- Autenticação ---
+
+    def authorize(self):
+        """
+        Obtém um token de acesso novo (POST /authorize) e o guarda até perto da expiração.
+        """
+        response = self.session.post(f"{self.base_url}/authorize", json={'login': self.login, 'password': self.password},
+                                     timeout=self.timeout)
+        if response.status_code != 200:
+            raise self._error(response)
+        data = response.json()
+        with self._token_lock:
+            self._token = data['access_token']
+            self._token_expires = float(data.get('expiration') or time.time() + 3600)
+        return self._token
+
+    # Token válido, renovado se faltar menos de TOKEN_REFRESH_MARGIN segundos para expirar
+    def _access_token(self):
+        with self._token_lock:
+            if self._token is not None and time.time() < self._token_expires - TOKEN_REFRESH_MARGIN:
+                return self._token
+        return self.authorize()
+
+    # --- HTTP ---
+
+    def _request(self, method, path, signed=False, params=None, body=None, timeout=None, retry=True):
+        self.limiter.acquire(1)
+        headers = {'Authorization': f"Bearer {self._access_token()}"} if signed else None
+        response = self.session.request(method, f"{self.base_url}{path}", params=params, json=body, headers=headers,
+                                        timeout=timeout or self.timeout)
+        # Token revogado ou expirado antes do previsto: renova uma vez e repete
+        if response.status_code == 401 and signed and retry:
+            with self._token_lock:
+                self._token = None
+            return self._request(method, path, signed, params, body, timeout, retry=False)
+        if response.status_code >= 400:
+            raise self._error(response)
+        return response.json() if response.content else {}
+
+    # Converte um erro da Mercado Bitcoin para os códigos da Binance usados pelo robô
+    @staticmethod
+    def _error(response):
+        try:
+            data = response.json()
+            message = f"{data.get('code', '')}: {data.get('message', response.text)}".strip(': ')
+        except ValueError:
+            message = response.text
+        code = {404: -2013, 429: -1003}.get(response.status_code, -1000)
+        return ExchangeAPIError(response, response.status_code, code, message)
+
+    # --- Símbolos ---
+
+    # Par da Mercado Bitcoin de um símbolo no formato da Binance ('BTCBRL' -> 'BTC-BRL')
+    def pair(self, symbol):
+        if not self._pairs:
+            self.get_exchange_info()
+        if symbol in self._pairs:
+            return self._pairs[symbol]
+        if symbol.endswith(self.quote):
+            return f"{symbol[:-len(self.quote)]}-{self.quote}"
+        return symbol
+
+    def get_exchange_info(self):
+        # Resposta em colunas: {'symbol': [...], 'base-currency': [...], 'currency': [...], ...}
+        data = self._request('GET', '/symbols')
+        pairs = data.get('symbol', [])
+
+        def column(key, i, default=None):
+            values = data.get(key)
+            return values[i] if values and i < len(values) and values[i] is not None else default
+
+        symbols = []
+        for i, pair in enumerate(pairs):
+            base = column('base-currency', i, pair.split('-')[0])
+            quote = column('currency', i, pair.split('-')[-1])
+            scale = float(column('pricescale', i, 0) or 0)
+            tick = float(column('minmovement', i, 1) or 1) / scale if scale else 0.00000001
+            symbols.append({
+                'symbol': f"{base}{quote}",
+                'pair': pair,
+                'status': 'TRADING' if column('exchange-traded', i, True) else 'BREAK',
+                'baseAsset': base,
+                'quoteAsset': quote,
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'tickSize': f"{tick:.8f}"},
+                    {'filterType': 'LOT_SIZE', 'minQty': '0.00000001', 'stepSize': '0.00000001'},
+                ],
+            })
+        self._pairs = {s['symbol']: s['pair'] for s in symbols}
+        return {'timezone': 'UTC', 'serverTime': int(time.time() * 1000), 'symbols': symbols}
+
+    # --- Dados de mercado ---
+
+    @staticmethod
+    def _ticker(raw):
+        last = float(raw['last'])
+        open_price = float(raw.get('open') or last)
+        volume = float(raw.get('vol') or 0)
+        return {
+            'symbol': raw['pair'].replace('-', ''),
+            'lastPrice': raw['last'],
+            'openPrice': f"{open_price:.8f}",
+            'highPrice': raw.get('high'),
+            'lowPrice': raw.get('low'),
+            'priceChange': f"{last - open_price:.8f}",
+            'priceChangePercent': f"{(last / open_price - 1) * 100 if open_price else 0:.3f}",
+            'volume': raw.get('vol'),
+            'quoteVolume': f"{volume * last:.8f}",  # A API informa o volume só na moeda base
+            'closeTime': int(float(raw.get('date') or time.time()) * 1000),
+        }
+
+    def get_ticker(self, symbol=None):
+        if symbol:
+            [raw] = self._request('GET', '/tickers', params={'symbols': self.pair(symbol)})
+            return self._ticker(raw)
+        if not self._pairs:
+            self.get_exchange_info()
+        pairs = list(self._pairs.values())
+        chunks = [pairs[i:i + MB_TICKERS_PER_REQUEST] for i in range(0, len(pairs), MB_TICKERS_PER_REQUEST)]
+        tickers = []
+        for chunk in chunks:
+            tickers.extend(self._ticker(raw) for raw in self._request('GET', '/tickers', params={'symbols': ','.join(chunk)}))
+        return tickers
+
+    def get_all_tickers(self):
+        return [{'symbol': ticker['symbol'], 'price': ticker['lastPrice']} for ticker in self.get_ticker()]
+
+    # Maior resolução da API que divide o intervalo pedido e quantas velas dela formam uma vela do intervalo
+    @staticmethod
+    def _resolution(interval):
+        seconds = INTERVAL_SECONDS.get(interval) or MB_RESOLUTIONS.get(interval)
+        if seconds is None:
+            raise ValueError(f"Intervalo não suportado pela Mercado Bitcoin: {interval}")
+        for resolution, resolution_seconds in sorted(MB_RESOLUTIONS.items(), key=lambda item: -item[1]):
+            if resolution_seconds <= seconds and seconds % resolution_seconds == 0:
+                return resolution, seconds // resolution_seconds, seconds
+        raise ValueError(f"Intervalo não suportado pela Mercado Bitcoin: {interval}")
+
+    def get_klines(self, symbol, interval, limit=500):
+        resolution, factor, seconds = self._resolution(interval)
+        data = self._request('GET', '/candles', params={'symbol': self.pair(symbol), 'resolution': resolution,
+                                                        'to': int(time.time()), 'countback': (limit + 1) * factor})
+
+        # Agrupa as velas da resolução da API nas velas do intervalo pedido (alinhadas como na Binance)
+        klines = []
+        for t, o, h, l, c, v in zip(data.get('t', []), data.get('o', []), data.get('h', []), data.get('l', []),
+                                    data.get('c', []), data.get('v', [])):
+            open_time = int(t) // seconds * seconds
+            o, h, l, c, v = float(o), float(h), float(l), float(c), float(v)
+            if klines and klines[-1][0] == open_time * 1000:
+                last = klines[-1]
+                last[2], last[3], last[4], last[5] = max(last[2], h), min(last[3], l), c, last[5] + v
+            else:
+                klines.append([open_time * 1000, o, h, l, c, v, (open_time + seconds) * 1000 - 1])
+
+        return [[open_ms, f"{o:.8f}", f"{h:.8f}", f"{l:.8f}", f"{c:.8f}", f"{v:.8f}", close_ms, f"{v * c:.8f}",
+                 0, "0", "0", "0"] for open_ms, o, h, l, c, v, close_ms in klines[-limit:]]
+
+    # --- Conta e ordens ---
+
+    def _account(self):
+        if self._account_id is None:
+            accounts = self._request('GET', '/accounts', signed=True)
+            self._account_id = accounts[0]['id']
+        return self._account_id
+
+    def get_account(self):
+        balances = self._request('GET', f"/accounts/{self._account()}/balances", signed=True)
+        return {
+            'canTrade': True,
+            'balances': [{'asset': b['symbol'], 'free': b.get('available', '0'), 'locked': b.get('on_hold', '0')}
+                         for b in balances],
+        }
+
+    def _order(self, raw, symbol=None):
+        symbol = symbol or str(raw.get('instrument', '')).replace('-', '')
+        executed = float(raw.get('filledQty') or 0)
+        average = float(raw.get('avgPrice') or 0)
+        status = MB_ORDER_STATUS.get(raw.get('status'), str(raw.get('status', '')).upper())
+        if status == 'NEW' and executed > 0:
+            status = 'PARTIALLY_FILLED'
+        created = raw.get('created_at') or 0
+        return {
+            'symbol': symbol,
+            'orderId': raw['id'],
+            'clientOrderId': raw.get('externalId'),
+            'side': str(raw.get('side', '')).upper(),
+            'type': str(raw.get('type', '')).upper(),
+            'status': status,
+            'origQty': raw.get('qty'),
+            'executedQty': f"{executed:.8f}",
+            'cummulativeQuoteQty': f"{executed * average:.8f}",
+            'time': int(float(created) * 1000) if str(created).replace('.', '').isdigit() else 0,
+            'fills': [{'price': e.get('price'), 'qty': e.get('qty'), 'commission': '0', 'commissionAsset': self.quote}
+                      for e in raw.get('executions', [])],
+        }
+
+    def get_all_orders(self, symbol, limit=500, fromId=None):
+        raw = self._request('GET', f"/accounts/{self._account()}/{self.pair(symbol)}/orders", signed=True)
+        orders = sorted((self._order(order, symbol) for order in raw), key=lambda order: order['orderId'])
+        if fromId:
+            orders = [order for order in orders if order['orderId'] >= fromId]
+        return orders[:limit]
+
+    def get_open_orders(self, symbol=None):
+        if symbol:
+            path = f"/accounts/{self._account()}/{self.pair(symbol)}/orders"
+        else:
+            path = f"/accounts/{self._account()}/orders"
+        raw = self._request('GET', path, signed=True, params={'status': 'working'})
+        return [self._order(order, symbol) for order in raw]
+
+    def get_order(self, symbol, orderId=None, origClientOrderId=None):
+        path = f"/accounts/{self._account()}/{self.pair(symbol)}/orders"
+        if orderId is not None:
+            return self._order(self._request('GET', f"{path}/{orderId}", signed=True), symbol)
+        for raw in self._request('GET', path, signed=True):
+            if raw.get('externalId') == origClientOrderId:
+                return self._order(raw, symbol)
+        raise ExchangeAPIError(None, 404, -2013, "Order does not exist.")
+
+    def create_order(self, symbol, side, type, quantity=None, quoteOrderQty=None, price=None, newClientOrderId=None,
+                     requests_params=None, **params):
+        """
+        Cria uma ordem (POST /accounts/{conta}/{par}/orders) e devolve a ordem consultada,
+        no formato da Binance. Parâmetros só da Binance (e.g., newOrderRespType) são ignorados.
+
+        A Mercado Bitcoin só confirma o recebimento: uma ordem a mercado é consultada até chegar
+        a um status final (FILLED ou CANCELED) ou até esgotar o timeout, e sai no último estado
+        lido (NEW ou PARTIALLY_FILLED, com o executedQty de então). Ordens limitadas saem como criadas.
+        """
+        body = {'side': side.lower(), 'type': type.lower()}
+        if quantity is not None:
+            body['qty'] = str(quantity)
+        if quoteOrderQty is not None:
+            body['cost'] = float(quoteOrderQty)
+        if price is not None:
+            body['limitPrice'] = float(price)
+        if newClientOrderId:
+            body['externalId'] = newClientOrderId
+        timeout = (requests_params or {}).get('timeout')
+        created = self._request('POST', f"/accounts/{self._account()}/{self.pair(symbol)}/orders", signed=True,
+                                body=body, timeout=timeout)
+
+        deadline = time.time() + (timeout or self.timeout)
+        order = self.get_order(symbol, orderId=created['orderId'])
+        while type.upper() == 'MARKET' and order['status'] not in MB_FINAL_STATUSES and time.time() < deadline:
+            time.sleep(MB_ORDER_POLL_INTERVAL)
+            order = self.get_order(symbol, orderId=created['orderId'])
+        return order
+
+
+def screen_markets(markets, strategy_configs, min_volume, blacklist=(), top_k=None):
+    """
+    Triagem de vários mercados lado a lado no mesmo processo (e.g., BRL na Mercado Bitcoin
+    e USDT na Binance), todos pelo mesmo motor `screen`, cada um com seu MarketData.
+
+    :param markets: Lista de MarketData cujos clientes são `Exchange`.
+    :param min_volume: Volume mínimo, um número ou {moeda de cotação: volume} (e.g., {'BRL': 5e5, 'USDT': 1e5}).
+    :return: {nome da corretora: lista de resultados por estratégia}.
+    """
+    def run(market):
+        exchange = market.client
+        volume = min_volume.get(exchange.quote, 0) if isinstance(min_volume, dict) else min_volume
+        return screen(strategy_configs, market.get_tickers(), market, volume, {}, quote=exchange.quote,
+                      blacklist=blacklist, top_k=top_k)
+
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(markets), 1)) as executor:
+        futures = {executor.submit(run, market): market.client.name for market in markets}
+        for future in concurrent.futures.as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                log_event(f"Erro na triagem de {name}: {e}", fase='triagem', corretora=name)
+                results[name] = [[] for _ in strategy_configs]
+    return results
@@ -0,0 +1,286 @@
+import json
+import time
+import sqlite3
+import threading
+from dashboard_state import bump_version
+
+# Arquivo do banco local com o estado operacional do robô
+DB_FILE = 'botbinance.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS config (
+    linha INTEGER PRIMARY KEY,
+    dados TEXT NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS status (
+    linha INTEGER PRIMARY KEY,
+    mensagem TEXT NOT NULL,
+    pendente INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS blacklist (
+    simbolo TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    criado_em REAL NOT NULL,
+    mensagem TEXT NOT NULL,
+    enviado INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE TABLE IF NOT EXISTS positions (
+    instancia TEXT NOT NULL,
+    ativo TEXT NOT NULL,
+    dados TEXT NOT NULL,
+    atualizado_em REAL NOT NULL,
+    PRIMARY KEY (instancia, ativo)
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    criado_em REAL NOT NULL,
+    instancia TEXT,
+    simbolo TEXT NOT NULL,
+    lado TEXT NOT NULL,
+    quantidade REAL NOT NULL,
+    preco REAL,
+    valor REAL,
+    order_id TEXT
+);
+"""
+
+
+class LocalStore:
+    """
+    Banco SQLite local com configuração, blacklist, logs, posições e histórico de trades.
+
+    É a única fonte consultada pelo robô durante o ciclo; o Google Sheets passa a ser
+    um espelho mantido pelo SheetsReplicator em segundo plano.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    # --- Configuração (espelho da 'Página1', colunas B a L) ---
+
+    def save_configs(self, configs):
+        """
+        Substitui as configurações pelas lidas da planilha.
+        :param configs: Lista de pares (linha, config).
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM config")
+            self._conn.executemany(
+                "INSERT INTO config (linha, dados, atualizado_em) VALUES (?, ?, ?)",
+                [(linha, json.dumps(config), now) for linha, config in configs]
+            )
+
+    def get_config(self, linha=2):
+        rows = self._execute("SELECT dados FROM config WHERE linha = ?", (linha,))
+        return json.loads(rows[0]['dados']) if rows else None
+
+    def get_configs(self):
+        rows = self._execute("SELECT linha, dados FROM config ORDER BY linha")
+        return [(row['linha'], json.loads(row['dados'])) for row in rows]
+
+    # --- Status (coluna M da 'Página1') ---
+
+    def set_status(self, linha, message):
+        self._execute(
+            "INSERT INTO status (linha, mensagem, pendente) VALUES (?, ?, 1) "
+            "ON CONFLICT(linha) DO UPDATE SET mensagem = excluded.mensagem, pendente = 1",
+            (linha, message)
+        )
+        bump_version()
+
+    def pending_statuses(self):
+        rows = self._execute("SELECT linha, mensagem FROM status WHERE pendente = 1")
+        return {row['linha']: row['mensagem'] for row in rows}
+
+    def mark_statuses_sent(self, statuses):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE status SET pendente = 0 WHERE linha = ? AND mensagem = ?",
+                list(statuses.items())
+            )
+
+    # --- Blacklist (coluna N da 'Página1') ---
+
+    def save_blacklist(self, symbols):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM blacklist")
+            self._conn.executemany("INSERT OR IGNORE INTO blacklist (simbolo) VALUES (?)", [(s,) for s in symbols])
+
+    def get_blacklist(self):
+        return [row['simbolo'] for row in self._execute("SELECT simbolo FROM blacklist")]
+
+    # --- Log (coluna A da 'Página2') ---
+
+    def append_log(self, message):
+        self._execute("INSERT INTO logs (criado_em, mensagem) VALUES (?, ?)", (time.time(), message))
+
+    # Marca todo o log atual como descartado e pede a limpeza da 'Página2' na próxima sincronização
+    def clear_log(self):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE logs SET enviado = 1 WHERE enviado = 0")
+            self._conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('limpar_log', '1')")
+
+    def pending_log_clear(self):
+        rows = self._execute("SELECT valor FROM meta WHERE chave = 'limpar_log'")
+        return bool(rows) and rows[0]['valor'] == '1'
+
+    def mark_log_cleared(self):
+        self._execute("UPDATE meta SET valor = '0' WHERE chave = 'limpar_log'")
+
+    def pending_logs(self, limit=500):
+        rows = self._execute("SELECT id, mensagem FROM logs WHERE enviado = 0 ORDER BY id LIMIT ?", (limit,))
+        return [(row['id'], row['mensagem']) for row in rows]
+
+    def mark_logs_sent(self, last_id):
+        self._execute("UPDATE logs SET enviado = 1 WHERE enviado = 0 AND id <= ?", (last_id,))
+
+    def recent_logs(self, limit=50):
+        rows = self._execute("SELECT mensagem FROM logs ORDER BY id DESC LIMIT ?", (limit,))
+        return [row['mensagem'] for row in reversed(rows)]
+
+    # --- Posições e trades (somente locais) ---
+
+    def save_positions(self, instance, positions):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM positions WHERE instancia = ?", (instance,))
+            self._conn.executemany(
+                "INSERT INTO positions (instancia, ativo, dados, atualizado_em) VALUES (?, ?, ?, ?)",
+                [(instance, p['ativo'], json.dumps(p), now) for p in positions]
+            )
+
+    def get_positions(self, instance=None):
+        if instance is None:
+            rows = self._execute("SELECT dados FROM positions ORDER BY instancia, ativo")
+        else:
+            rows = self._execute("SELECT dados FROM positions WHERE instancia = ? ORDER BY ativo", (instance,))
+        return [json.loads(row['dados']) for row in rows]
+
+    def record_trade(self, instance, symbol, side, quantity, price=None, value=None, order_id=None):
+        self._execute(
+            "INSERT INTO trades (criado_em, instancia, simbolo, lado, quantidade, preco, valor, order_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (time.time(), instance, symbol, side, quantity, price, value, order_id)
+        )
+
+    def get_trades(self, symbol=None, limit=100):
+        if symbol is None:
+            rows = self._execute("SELECT * FROM trades ORDER BY id DESC LIMIT ?", (limit,))
+        else:
+            rows = self._execute("SELECT * FROM trades WHERE simbolo = ? ORDER BY id DESC LIMIT ?", (symbol, limit))
+        return [dict(row) for row in rows]
+
+
+class AcessoLocal:
+    """
+    Mesma interface de AcessoPlanilha, mas lendo e gravando apenas no LocalStore.
+    Os scripts do robô usam esta classe no lugar de AcessoPlanilha no ciclo de trading.
+    """
+
+    def __init__(self, store, linha=2):
+        self.store = store
+        self.linha = linha
+
+    def get_config_from_spreadsheet(self):
+        config = self.store.get_config(self.linha)
+        if config is None:
+            print("Nenhum dado encontrado no intervalo especificado.")
+        return config
+
+    def get_configs_from_spreadsheet(self):
+        return self.store.get_configs()
+
+    def update_error_message(self, message):
+        self.store.set_status(self.linha, message)
+
+    def get_blacklist_from_spreadsheet(self):
+        return self.store.get_blacklist()
+
+    def append_message(self, message):
+        self.store.append_log(message)
+
+    def clear_column_a(self):
+        self.store.clear_log()
+
+
+class SheetsReplicator:
+    """
+    Sincroniza o LocalStore com a planilha em segundo plano e em lotes:
+
+    - planilha -> local: configurações (Página1!B:L) e blacklist (Página1!N);
+    - local -> planilha: status (Página1!M), limpeza e novas linhas do log (Página2!A).
+
+    Se o Google estiver lento ou fora do ar, o ciclo de trading segue com os dados locais
+    e as escritas pendentes são enviadas na próxima sincronização bem-sucedida.
+    """
+
+    def __init__(self, store, acesso_planilha, interval=30):
+        self.store = store
+        self.acesso = acesso_planilha
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def pull(self):
+        configs, blacklist = self.acesso.read_page1()
+        if configs:
+            self.store.save_configs(configs)
+        self.store.save_blacklist(blacklist)
+
+    def push(self):
+        statuses = self.store.pending_statuses()
+        if statuses:
+            self.acesso.update_status_cells(statuses)
+            self.store.mark_statuses_sent(statuses)
+
+        if self.store.pending_log_clear():
+            self.acesso.clear_log()
+            self.store.mark_log_cleared()
+
+        logs = self.store.pending_logs()
+        while logs:
+            self.acesso.append_messages([message for _, message in logs])
+            self.store.mark_logs_sent(logs[-1][0])
+            logs = self.store.pending_logs()
+
+    # Uma rodada completa; retorna False se a planilha não respondeu
+    def sync_once(self):
+        try:
+            self.push()
+            self.pull()
+            return True
+        except Exception as e:
+            print(f"Erro ao sincronizar com a planilha: {e}. Seguindo com os dados locais.")
+            return False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sync_once()  # Envia o que ficou pendente
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sync_once()
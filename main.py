@@ -1,28 +1,87 @@
-from fastapi import FastAPI, HTTPException
+import os
+import json
+import asyncio
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import List, Dict, Any
+
+from acesso_planilha import SPREADSHEET_ID
+from dashboard_state import DashboardCache, bump_version, load_positions
+from sheets_utils import get_sheet_data, get_column_values, update_sheet_data
 
 app = FastAPI()
 
-app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
+CONFIG_WORKSHEET = 'Página1'
+LOG_WORKSHEET = 'Página2'
+LOG_LINES = 50  # Quantidade de linhas recentes do log exibidas no painel
+
+
+# Monta a foto exibida no painel: uma leitura de cada guia, servida a todos os navegadores
+def load_dashboard_snapshot():
+    return {
+        "config": get_sheet_data(SPREADSHEET_ID, CONFIG_WORKSHEET),
+        "log": get_column_values(SPREADSHEET_ID, LOG_WORKSHEET, limit=LOG_LINES),
+    }
+
+
+# As posições vêm do arquivo local do robô e são relidas à parte, sem recarregar a planilha
+cache = DashboardCache(load_dashboard_snapshot, local_loader=lambda: {"positions": load_positions()})
 
-# Suponha que você tem essas funções para manipular a planilha
-from sheets_utils import get_sheet_data, update_sheet_cell
 
 class UpdateCellRequest(BaseModel):
-    row: int
-    col: int
+    row: int      # índice da linha de dados (0 = primeira linha após o cabeçalho)
+    column: str   # nome da coluna (cabeçalho)
     value: str
 
 @app.get("/api/sheet")
 async def read_sheet():
-    data = get_sheet_data()  # Retorna lista de dicionários (linhas)
-    return data
+    snapshot = await asyncio.to_thread(cache.get)
+    return snapshot["config"]
+
+@app.get("/api/snapshot")
+async def read_snapshot():
+    return await asyncio.to_thread(cache.get)
+
+@app.get("/api/stream")
+async def stream(request: Request):
+    """
+    Server-Sent Events: envia a foto atual ao conectar e de novo sempre que ela mudar.
+
+    Se ainda não há foto (e.g., a planilha fora do ar no primeiro carregamento), envia um
+    evento 'erro' e segue tentando, em vez de encerrar o stream.
+    """
+    async def events():
+        sent_version = None
+        while not await request.is_disconnected():
+            try:
+                snapshot = await asyncio.to_thread(cache.get)
+            except Exception as e:
+                yield f"event: erro\ndata: {json.dumps({'detail': str(e)}, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(5)
+                continue
+            if cache.version != sent_version:
+                sent_version = cache.version
+                yield f"data: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            await asyncio.sleep(1)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 @app.post("/api/sheet/update")
 async def update_sheet(cell: UpdateCellRequest):
-    success = update_sheet_cell(cell.row, cell.col, cell.value)
-    if not success:
-        raise HTTPException(status_code=500, detail="Erro ao atualizar a célula")
+    try:
+        await asyncio.to_thread(
+            update_sheet_data,
+            SPREADSHEET_ID,
+            [{'row': cell.row + 2, 'values': {cell.column: cell.value}}],
+            CONFIG_WORKSHEET,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao atualizar a célula: {e}")
+    cache.invalidate()
+    bump_version()
     return {"message": "Atualizado com sucesso"}
+
+# Os arquivos estáticos são montados por último para não encobrir as rotas da API
+app.mount("/", StaticFiles(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend"), html=True),
+          name="frontend")
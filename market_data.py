@@ -0,0 +1,186 @@
+import time
+import threading
+import concurrent.futures
+from circuit_breaker import CircuitOpenError
+from event_log import log_event
+from price_snapshot import PriceSnapshot
+from scheduler import INTERVAL_SECONDS, next_candle_close
+
+
+# Atualiza a vela ainda aberta (a última) com o preço ao vivo, sem nova busca de velas
+def with_live_price(klines, price, now=None):
+    if not klines or price is None:
+        return klines
+    now_ms = (time.time() if now is None else now) * 1000
+    last = klines[-1]
+    if int(last[6]) < now_ms:  # A última vela já fechou: nada a atualizar
+        return klines
+    updated = list(last)
+    updated[2] = str(max(float(last[2]), price))
+    updated[3] = str(min(float(last[3]), price))
+    updated[4] = str(price)
+    return klines[:-1] + [updated]
+
+
+class MarketData:
+    """
+    Núcleo de dados de mercado compartilhado pelas estratégias.
+
+    Guarda em cache os tickers de 24h, o exchangeInfo e as velas já baixadas,
+    de forma que cada (símbolo, intervalo) seja buscado uma única vez por ciclo,
+    mesmo quando várias estratégias precisam dele.
+
+    As velas em cache valem até o fechamento da vela seguinte do intervalo: a primeira
+    triagem depois do fechamento recalcula tudo e as triagens seguintes só atualizam a
+    vela aberta com o preço ao vivo, sem tráfego de velas.
+    """
+
+    def __init__(self, client, max_workers=None, ticker_ttl=30, exchange_info_ttl=3600, kline_ttl=None, price_max_age=5.0):
+        self.client = client
+        self.price_snapshot = PriceSnapshot(client, max_age=price_max_age)
+        self.max_workers = max_workers
+        self.ticker_ttl = ticker_ttl
+        self.exchange_info_ttl = exchange_info_ttl
+        self.kline_ttl = kline_ttl  # Validade máxima das velas em cache (None = até o fechamento da vela)
+
+        self._lock = threading.Lock()
+        self._tickers = None
+        self._tickers_time = 0.0
+        self._exchange_info = None
+        self._exchange_info_time = 0.0
+        self._symbols = {}
+        self._trading_symbols = set()
+        self._klines = {}  # (symbol, interval) -> (instante da busca, quantidade, velas)
+        self.kline_hits = 0  # Buscas de velas atendidas pelo cache
+        self.kline_misses = 0  # Buscas de velas que foram à API
+
+    # Tickers de 24h de todos os pares (uma única chamada para todos)
+    def get_tickers(self):
+        with self._lock:
+            if self._tickers is not None and time.time() - self._tickers_time < self.ticker_ttl:
+                return self._tickers
+        tickers = self.client.get_ticker()
+        with self._lock:
+            self._tickers = tickers
+            self._tickers_time = time.time()
+        return tickers
+
+    # Preços atuais de todos os pares {símbolo: preço}, de um único snapshot
+    def get_prices(self):
+        return self.price_snapshot.prices()
+
+    # Preço atual de um símbolo, lido do snapshot
+    def get_price(self, symbol):
+        return self.price_snapshot.get_price(symbol)
+
+    # Informações de negociação de todos os pares
+    def get_exchange_info(self):
+        with self._lock:
+            if self._exchange_info is not None and time.time() - self._exchange_info_time < self.exchange_info_ttl:
+                return self._exchange_info
+        info = self.client.get_exchange_info()
+        with self._lock:
+            self._exchange_info = info
+            self._exchange_info_time = time.time()
+            self._symbols = {s['symbol']: s for s in info.get('symbols', [])}
+            self._trading_symbols = {symbol for symbol, s in self._symbols.items() if s.get('status') == 'TRADING'}
+        return info
+
+    # Símbolos com status TRADING, a partir do exchangeInfo em cache
+    def trading_symbols(self):
+        self.get_exchange_info()
+        return self._trading_symbols
+
+    # Informações de um símbolo servidas a partir do exchangeInfo em cache
+    def get_symbol_info(self, symbol):
+        self.get_exchange_info()
+        return self._symbols.get(symbol)
+
+    # Velas de um símbolo, reaproveitando uma busca maior ainda válida
+    def get_klines(self, symbol, interval, limit):
+        key = (symbol, interval)
+        with self._lock:
+            cached = self._klines.get(key)
+        if cached:
+            fetched_at, cached_limit, klines = cached
+            if cached_limit >= limit and self._kline_cache_valid(interval, fetched_at):
+                with self._lock:
+                    self.kline_hits += 1
+                return klines[-limit:]
+
+        klines = self.client.get_klines(symbol=symbol, interval=interval, limit=limit)
+        with self._lock:
+            self._klines[key] = (time.time(), limit, klines)
+            self.kline_misses += 1
+        return klines
+
+    # As velas fechadas não mudam: o cache só expira quando fecha uma nova vela do intervalo
+    def _kline_cache_valid(self, interval, fetched_at, now=None):
+        now = time.time() if now is None else now
+        if self.kline_ttl is not None and now - fetched_at >= self.kline_ttl:
+            return False
+        if interval not in INTERVAL_SECONDS:
+            return False
+        return now < next_candle_close(interval, fetched_at, delay=0)
+
+    def fetch_klines(self, symbols, requirements):
+        """
+        Busca em paralelo as velas exigidas para uma lista de símbolos.
+
+        :param symbols: Lista de símbolos, e.g., ['BTCUSDT', 'ETHUSDT'].
+        :param requirements: Dicionário {intervalo: quantidade de velas}, já unificado entre as estratégias.
+        :return: Dicionário {símbolo: {intervalo: velas}}, com a vela aberta atualizada pelo preço
+                 ao vivo. Símbolos com erro ficam de fora.
+        """
+        return dict(self.iter_klines(symbols, requirements))
+
+    def iter_klines(self, symbols, requirements, deadline=None):
+        """
+        Versão em fluxo de `fetch_klines`: entrega (símbolo, {intervalo: velas}) assim que
+        todas as velas de um símbolo chegam, sem esperar pelos demais.
+
+        :param symbols: Símbolos em ordem de prioridade (os primeiros são enviados antes).
+        :param deadline: Instante (time.time()) limite. Ao atingi-lo, as buscas ainda na fila
+                         são canceladas e os símbolos restantes ficam de fora.
+        """
+        try:
+            prices = self.get_prices() if symbols else {}
+        except Exception as e:
+            log_event(f"Erro ao obter os preços ao vivo: {e}. Usando as velas como estão.", fase='triagem')
+            prices = {}
+
+        hits, misses = self.kline_hits, self.kline_misses
+        remaining = {symbol: len(requirements) for symbol in symbols}
+        partial = {}
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {executor.submit(self.get_klines, symbol, interval, limit): (symbol, interval)
+                   for symbol in symbols for interval, limit in requirements.items()}
+        try:
+            timeout = None if deadline is None else max(deadline - time.time(), 0.0)
+            for future in concurrent.futures.as_completed(futures, timeout=timeout):
+                symbol, interval = futures[future]
+                try:
+                    partial.setdefault(symbol, {})[interval] = future.result()
+                except CircuitOpenError as e:
+                    # Endpoint de velas em pane: encerra a etapa em vez de falhar símbolo a símbolo
+                    cancelled = sum(future.cancel() for future in futures)
+                    log_event(f"Triagem interrompida: {e.message} {cancelled} busca(s) canceladas.", fase='triagem',
+                              canceladas=cancelled)
+                    return
+                except Exception as e:
+                    log_event(f"Erro ao obter velas {interval} de {symbol}: {e}", fase='triagem', simbolo=symbol)
+                remaining[symbol] -= 1
+                if remaining[symbol] == 0 and symbol in partial:
+                    now = time.time()
+                    yield symbol, {interval: with_live_price(klines, prices.get(symbol), now)
+                                   for interval, klines in partial.pop(symbol).items()}
+        except concurrent.futures.TimeoutError:
+            cancelled = sum(future.cancel() for future in futures)
+            unfinished = sum(1 for count in remaining.values() if count > 0)
+            log_event(f"Prazo da triagem atingido: {unfinished} símbolo(s) sem todas as velas, "
+                      f"{cancelled} busca(s) canceladas.", fase='triagem', incompletos=unfinished, canceladas=cancelled)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            cached, fetched = self.kline_hits - hits, self.kline_misses - misses
+            log_event(f"Velas: {fetched} buscada(s) na API, {cached} do cache.", fase='triagem', console=False,
+                      buscadas=fetched, cache=cached)
@@ -0,0 +1,455 @@
+import os
+import time
+import math
+import random
+import asyncio
+import threading
+from collections import deque
+from urllib.parse import parse_qsl
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from rate_limiter import endpoint_weight
+
+# Servidor local que imita o subconjunto da API REST spot da Binance usado pelos robôs.
+# Uso: python mock_binance_server.py e BINANCE_BASE_URL=http://127.0.0.1:8001 no .env do robô.
+#
+# Configuração por variáveis de ambiente:
+#   MOCK_SYMBOLS        quantidade de pares sintéticos (padrão 500)
+#   MOCK_LATENCY_MS     latência média de cada resposta em ms (padrão 0)
+#   MOCK_WEIGHT_LIMIT   peso máximo por minuto antes do HTTP 429 (padrão 6000)
+#   MOCK_ORDER_LIMIT    ordens por 10 segundos antes do HTTP 429 (padrão 100)
+#   MOCK_BAN_SECONDS    duração do bloqueio (HTTP 418) após insistir no 429 (padrão 120)
+#   MOCK_ORDER_DELAY_MS atraso extra das respostas de novas ordens, para provocar timeouts (padrão 0)
+#   MOCK_UNKNOWN_RATE   fração das ordens executadas respondidas com 503/-1007, status desconhecido (padrão 0)
+#   MOCK_USDT           saldo inicial em USDT da conta simulada (padrão 10000)
+#   MOCK_SEED           semente dos dados sintéticos (padrão 42)
+#   MOCK_HOST/MOCK_PORT endereço do servidor (padrão 127.0.0.1:8001)
+
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000, '8h': 28_800_000,
+    '12h': 43_200_000, '1d': 86_400_000,
+}
+
+STEP_SIZE = 0.001
+MIN_NOTIONAL = 5.0
+
+
+class BinanceError(Exception):
+    """
+    Erro no formato da Binance: {"code": ..., "msg": ...} com o status HTTP informado.
+    """
+
+    def __init__(self, code, msg, status=400, headers=None):
+        super().__init__(msg)
+        self.code = code
+        self.msg = msg
+        self.status = status
+        self.headers = headers or {}
+
+
+class SyntheticMarket:
+    """
+    Preços sintéticos determinísticos: o logaritmo do preço de cada par é uma soma de
+    ondas (ciclo diário e horário) mais um ruído por minuto, calculado sob demanda para
+    qualquer instante. Assim velas, tickers e preços são coerentes entre si sem histórico.
+    """
+
+    def __init__(self, count=500, seed=42):
+        rng = np.random.default_rng(seed)
+        self.symbols = [f"SYN{i}USDT" for i in range(count)]
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.base = np.exp(rng.uniform(np.log(0.01), np.log(50_000), count))
+        self.vol = rng.uniform(0.002, 0.03, count)
+        self.phase_day = rng.uniform(0, 2 * np.pi, count)
+        self.phase_hour = rng.uniform(0, 2 * np.pi, count)
+        self.volume = np.exp(rng.uniform(np.log(1e4), np.log(5e7), count))
+        # Alguns pares fora de negociação, para exercitar o filtro de status
+        self.status = ['BREAK' if i % 50 == 49 else 'TRADING' for i in range(count)]
+
+    # Ruído pseudoaleatório determinístico por (par, minuto), entre -1 e 1
+    @staticmethod
+    def _noise(i, minute):
+        x = np.sin(np.asarray(i) * 12.9898 + np.asarray(minute) * 78.233) * 43758.5453
+        return 2 * (x - np.floor(x)) - 1
+
+    def log_price(self, i, t):
+        """
+        :param i: Índice (ou array de índices) do par.
+        :param t: Instante em segundos (ou array de instantes).
+        """
+        t = np.asarray(t, dtype=float)
+        wave = (3.0 * np.sin(2 * np.pi * t / 86_400 + self.phase_day[i])
+                + 1.5 * np.sin(2 * np.pi * t / 3_600 + self.phase_hour[i])
+                + 0.5 * self._noise(i, np.floor(t / 60)))
+        return np.log(self.base[i]) + self.vol[i] * wave
+
+    def price(self, i, t):
+        return np.exp(self.log_price(i, t))
+
+    def prices(self, t):
+        return self.price(np.arange(len(self.symbols)), t)
+
+    def klines(self, symbol, interval, limit, now):
+        i = self.index[symbol]
+        duration = INTERVAL_MS[interval] / 1000
+        last_open = math.floor(now / duration) * duration
+        opens = last_open - duration * np.arange(limit - 1, -1, -1)
+        closes = np.minimum(opens + duration, now)
+        samples = opens[:, None] + (closes - opens)[:, None] * np.linspace(0, 1, 9)[None, :]
+        path = self.price(i, samples)
+        volume = self.volume[i] * duration / 86_400
+        rows = []
+        for j, open_time in enumerate(opens):
+            o, c = path[j, 0], path[j, -1]
+            h, l = path[j].max(), path[j].min()
+            quote_volume = volume * (1 + 0.5 * self._noise(i, open_time))
+            rows.append([
+                int(open_time * 1000), f"{o:.8f}", f"{h:.8f}", f"{l:.8f}", f"{c:.8f}",
+                f"{quote_volume / c:.8f}", int((open_time + duration) * 1000) - 1, f"{quote_volume:.8f}",
+                100, "0", "0", "0",
+            ])
+        return rows
+
+    def ticker_24h(self, now):
+        n = len(self.symbols)
+        samples = now - 86_400 + np.linspace(0, 86_400, 25)
+        path = self.price(np.arange(n)[:, None], samples[None, :])
+        tickers = []
+        for i, symbol in enumerate(self.symbols):
+            first, last = path[i, 0], path[i, -1]
+            tickers.append({
+                'symbol': symbol,
+                'priceChange': f"{last - first:.8f}",
+                'priceChangePercent': f"{(last / first - 1) * 100:.3f}",
+                'weightedAvgPrice': f"{path[i].mean():.8f}",
+                'openPrice': f"{first:.8f}",
+                'highPrice': f"{path[i].max():.8f}",
+                'lowPrice': f"{path[i].min():.8f}",
+                'lastPrice': f"{last:.8f}",
+                'volume': f"{self.volume[i] / last:.8f}",
+                'quoteVolume': f"{self.volume[i]:.8f}",
+                'openTime': int((now - 86_400) * 1000),
+                'closeTime': int(now * 1000),
+                'count': 1000,
+            })
+        return tickers
+
+    def exchange_info(self):
+        return {
+            'timezone': 'UTC',
+            'serverTime': int(time.time() * 1000),
+            'rateLimits': [],
+            'symbols': [{
+                'symbol': symbol,
+                'status': self.status[i],
+                'baseAsset': symbol[:-4],
+                'quoteAsset': 'USDT',
+                'orderTypes': ['MARKET', 'LIMIT'],
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'minPrice': '0.00000001', 'maxPrice': '1000000.00000000',
+                     'tickSize': '0.00000001'},
+                    {'filterType': 'LOT_SIZE', 'minQty': f"{STEP_SIZE:.8f}", 'maxQty': '90000000.00000000',
+                     'stepSize': f"{STEP_SIZE:.8f}"},
+                    {'filterType': 'MIN_NOTIONAL', 'minNotional': f"{MIN_NOTIONAL:.8f}"},
+                ],
+            } for i, symbol in enumerate(self.symbols)],
+        }
+
+
+class SlidingCounter:
+    """
+    Soma de pesos numa janela deslizante (peso por minuto, ordens por 10 segundos).
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.entries = deque()
+        self.total = 0
+
+    def add(self, now, amount):
+        while self.entries and now - self.entries[0][0] >= self.window:
+            self.total -= self.entries.popleft()[1]
+        self.entries.append((now, amount))
+        self.total += amount
+        return self.total
+
+
+class MockAccount:
+    """
+    Conta simulada: saldos, ordens a mercado executadas na hora e histórico por par.
+    """
+
+    def __init__(self, market, usdt=10_000.0):
+        self.market = market
+        self.lock = threading.Lock()
+        self.balances = {'USDT': usdt}
+        self.orders = {}  # símbolo -> lista de ordens
+        self.next_order_id = 1
+
+    def account(self):
+        with self.lock:
+            return {
+                'makerCommission': 10, 'takerCommission': 10, 'canTrade': True, 'canWithdraw': True,
+                'canDeposit': True, 'updateTime': int(time.time() * 1000), 'accountType': 'SPOT',
+                'balances': [{'asset': asset, 'free': f"{amount:.8f}", 'locked': '0.00000000'}
+                             for asset, amount in self.balances.items()],
+                'permissions': ['SPOT'],
+            }
+
+    def find_order(self, symbol, order_id=None, client_order_id=None):
+        with self.lock:
+            for order in self.orders.get(symbol, []):
+                if (order_id is not None and order['orderId'] == int(order_id)) or \
+                        (client_order_id is not None and order['clientOrderId'] == client_order_id):
+                    return dict(order)
+        raise BinanceError(-2013, "Order does not exist.")
+
+    def all_orders(self, symbol, from_id=None, limit=500):
+        with self.lock:
+            orders = self.orders.get(symbol, [])
+            if from_id is not None:
+                orders = [order for order in orders if order['orderId'] >= int(from_id)]
+            return [dict(order) for order in orders[:int(limit)]]
+
+    def place_market_order(self, params, now):
+        symbol = params.get('symbol')
+        if symbol not in self.market.index:
+            raise BinanceError(-1121, "Invalid symbol.")
+        side = params.get('side')
+        if side not in ('BUY', 'SELL'):
+            raise BinanceError(-1102, "Mandatory parameter 'side' was not sent, was empty/null, or malformed.")
+        if params.get('type', 'MARKET') != 'MARKET':
+            raise BinanceError(-1116, "Invalid orderType.")
+
+        i = self.market.index[symbol]
+        if self.market.status[i] != 'TRADING':
+            raise BinanceError(-1013, "Market is closed.")
+        price = float(self.market.price(i, now))
+
+        if params.get('quantity'):
+            quantity = float(params['quantity'])
+        elif params.get('quoteOrderQty'):
+            quantity = float(params['quoteOrderQty']) / price
+        else:
+            raise BinanceError(-1102, "Mandatory parameter 'quantity' was not sent, was empty/null, or malformed.")
+        quantity = math.floor(quantity / STEP_SIZE + 1e-9) * STEP_SIZE
+        if quantity <= 0:
+            raise BinanceError(-1013, "Filter failure: LOT_SIZE")
+        quote = quantity * price
+        if quote < MIN_NOTIONAL:
+            raise BinanceError(-1013, "Filter failure: MIN_NOTIONAL")
+
+        base = symbol[:-4]
+        client_order_id = params.get('newClientOrderId') or f"mock{random.getrandbits(48):012x}"
+        with self.lock:
+            for order in self.orders.get(symbol, []):
+                if order['clientOrderId'] == client_order_id:
+                    raise BinanceError(-2010, "Duplicate order sent.")
+            if side == 'BUY' and self.balances.get('USDT', 0.0) + 1e-9 < quote:
+                raise BinanceError(-2010, "Account has insufficient balance for requested action.")
+            if side == 'SELL' and self.balances.get(base, 0.0) + 1e-9 < quantity:
+                raise BinanceError(-2010, "Account has insufficient balance for requested action.")
+
+            if side == 'BUY':
+                self.balances['USDT'] -= quote
+                self.balances[base] = self.balances.get(base, 0.0) + quantity
+            else:
+                self.balances[base] -= quantity
+                self.balances['USDT'] = self.balances.get('USDT', 0.0) + quote
+
+            order_id = self.next_order_id
+            self.next_order_id += 1
+            order = {
+                'symbol': symbol, 'orderId': order_id, 'orderListId': -1, 'clientOrderId': client_order_id,
+                'price': '0.00000000', 'origQty': f"{quantity:.8f}", 'executedQty': f"{quantity:.8f}",
+                'cummulativeQuoteQty': f"{quote:.8f}", 'status': 'FILLED', 'timeInForce': 'GTC',
+                'type': 'MARKET', 'side': side, 'time': int(now * 1000), 'updateTime': int(now * 1000),
+                'isWorking': True, 'origQuoteOrderQty': '0.00000000',
+            }
+            self.orders.setdefault(symbol, []).append(order)
+
+        response = dict(order, transactTime=int(now * 1000), fills=[{
+            'price': f"{price:.8f}", 'qty': f"{quantity:.8f}", 'commission': '0.00000000',
+            'commissionAsset': base if side == 'BUY' else 'USDT', 'tradeId': order_id,
+        }])
+        return response
+
+
+market = SyntheticMarket(int(os.getenv("MOCK_SYMBOLS", "500")), int(os.getenv("MOCK_SEED", "42")))
+account = MockAccount(market, float(os.getenv("MOCK_USDT", "10000")))
+
+LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "0"))
+WEIGHT_LIMIT = int(os.getenv("MOCK_WEIGHT_LIMIT", "6000"))
+ORDER_LIMIT = int(os.getenv("MOCK_ORDER_LIMIT", "100"))
+BAN_SECONDS = float(os.getenv("MOCK_BAN_SECONDS", "120"))
+ORDER_DELAY_MS = float(os.getenv("MOCK_ORDER_DELAY_MS", "0"))
+UNKNOWN_RATE = float(os.getenv("MOCK_UNKNOWN_RATE", "0"))
+
+_limits_lock = threading.Lock()
+_weight = SlidingCounter(60.0)
+_orders = SlidingCounter(10.0)
+_rejections = SlidingCounter(60.0)
+_banned_until = 0.0
+
+app = FastAPI()
+
+
+@app.exception_handler(BinanceError)
+async def binance_error_handler(request: Request, exc: BinanceError):
+    return JSONResponse({'code': exc.code, 'msg': exc.msg}, status_code=exc.status, headers=exc.headers)
+
+
+# Parâmetros da query e do corpo (form-urlencoded), como a Binance aceita
+async def read_params(request: Request):
+    params = dict(request.query_params)
+    body = await request.body()
+    if body:
+        params.update(parse_qsl(body.decode('utf-8'), keep_blank_values=True))
+    return params
+
+
+@app.middleware("http")
+async def limits_and_latency(request: Request, call_next):
+    """
+    Aplica a latência simulada e os limites de peso e de ordens da Binance, e devolve
+    os cabeçalhos X-MBX-USED-WEIGHT-1M e X-MBX-ORDER-COUNT-10S.
+    """
+    global _banned_until
+    if LATENCY_MS:
+        await asyncio.sleep(random.uniform(0.5, 1.5) * LATENCY_MS / 1000)
+
+    params = await read_params(request)
+    now = time.time()
+    is_order = request.method == 'POST' and request.url.path.rstrip('/').endswith('/order')
+    with _limits_lock:
+        if now < _banned_until:
+            retry = int(_banned_until - now) + 1
+            return JSONResponse({'code': -1003, 'msg': f"Way too much request weight used; IP banned until "
+                                                       f"{int(_banned_until * 1000)}."},
+                                status_code=418, headers={'Retry-After': str(retry)})
+        used = _weight.add(now, endpoint_weight(request.method, request.url.path, params))
+        order_count = _orders.add(now, 1 if is_order else 0)
+        if used > WEIGHT_LIMIT or order_count > ORDER_LIMIT:
+            # Insistir depois do 429 leva ao bloqueio do IP (418), como na Binance
+            if _rejections.add(now, 1) > 10:
+                _banned_until = now + BAN_SECONDS
+            message = ("Too much request weight used; please use the websocket for live updates to avoid "
+                       "polling the API." if used > WEIGHT_LIMIT else "Too many new orders.")
+            return JSONResponse({'code': -1003 if used > WEIGHT_LIMIT else -1015, 'msg': message},
+                                status_code=429,
+                                headers={'Retry-After': '60' if used > WEIGHT_LIMIT else '10',
+                                         'X-MBX-USED-WEIGHT-1M': str(used)})
+
+    request.state.params = params
+    response = await call_next(request)
+    response.headers['X-MBX-USED-WEIGHT-1M'] = str(used)
+    if is_order:
+        response.headers['X-MBX-ORDER-COUNT-10S'] = str(order_count)
+    return response
+
+
+def _symbol_or_error(symbol):
+    if symbol not in market.index:
+        raise BinanceError(-1121, "Invalid symbol.")
+    return symbol
+
+
+@app.get("/api/v3/ping")
+async def ping():
+    return {}
+
+
+@app.get("/api/v3/time")
+async def server_time():
+    return {'serverTime': int(time.time() * 1000)}
+
+
+@app.get("/api/v3/exchangeInfo")
+async def exchange_info():
+    return market.exchange_info()
+
+
+@app.get("/api/v3/ticker/24hr")
+async def ticker_24h(request: Request):
+    tickers = market.ticker_24h(time.time())
+    symbol = request.state.params.get('symbol')
+    if symbol:
+        return tickers[market.index[_symbol_or_error(symbol)]]
+    return tickers
+
+
+@app.get("/api/v3/ticker/price")
+async def ticker_price(request: Request):
+    prices = market.prices(time.time())
+    symbol = request.state.params.get('symbol')
+    if symbol:
+        return {'symbol': symbol, 'price': f"{prices[market.index[_symbol_or_error(symbol)]]:.8f}"}
+    return [{'symbol': s, 'price': f"{p:.8f}"} for s, p in zip(market.symbols, prices)]
+
+
+@app.get("/api/v3/klines")
+async def klines(request: Request):
+    params = request.state.params
+    interval = params.get('interval')
+    if interval not in INTERVAL_MS:
+        raise BinanceError(-1120, "Invalid interval.")
+    limit = min(int(params.get('limit', 500)), 1000)
+    return market.klines(_symbol_or_error(params.get('symbol')), interval, limit, time.time())
+
+
+@app.get("/api/v3/account")
+async def get_account():
+    return account.account()
+
+
+@app.get("/api/v3/allOrders")
+async def all_orders(request: Request):
+    params = request.state.params
+    return account.all_orders(_symbol_or_error(params.get('symbol')), params.get('fromId'),
+                              params.get('limit', 500))
+
+
+@app.get("/api/v3/openOrders")
+async def open_orders():
+    return []  # Ordens a mercado são executadas na hora
+
+
+@app.get("/api/v3/order")
+async def get_order(request: Request):
+    params = request.state.params
+    return account.find_order(_symbol_or_error(params.get('symbol')), params.get('orderId'),
+                              params.get('origClientOrderId'))
+
+
+@app.post("/api/v3/order")
+async def new_order(request: Request):
+    order = account.place_market_order(request.state.params, time.time())
+    # A ordem fica executada mesmo quando a resposta atrasa ou se perde, como na Binance
+    if ORDER_DELAY_MS:
+        await asyncio.sleep(ORDER_DELAY_MS / 1000)
+    if UNKNOWN_RATE and random.random() < UNKNOWN_RATE:
+        raise BinanceError(-1007, "Timeout waiting for response from backend server. Send status unknown; "
+                                  "execution status unknown.", status=503)
+    return order
+
+
+@app.post("/api/v3/userDataStream")
+async def create_listen_key():
+    return {'listenKey': f"mock{random.getrandbits(64):016x}"}
+
+
+@app.put("/api/v3/userDataStream")
+async def keepalive_listen_key():
+    return {}
+
+
+@app.delete("/api/v3/userDataStream")
+async def close_listen_key():
+    return {}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("MOCK_HOST", "127.0.0.1"), port=int(os.getenv("MOCK_PORT", "8001")))
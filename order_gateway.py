@@ -0,0 +1,158 @@
+import os
+import time
+import hashlib
+import threading
+import concurrent.futures
+import requests
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+from event_log import log_event
+
+# Códigos da Binance em que a ordem pode ou não ter sido executada (status desconhecido)
+UNKNOWN_STATUS_CODES = (-1006, -1007)
+
+# Ordem inexistente: a consulta pelo clientOrderId confirma que ela não foi executada
+ORDER_NOT_FOUND_CODE = -2013
+
+# Prefixo dos clientOrderIds gerados pelo gateway (até 36 caracteres no total)
+CLIENT_ORDER_PREFIX = 'bot-'
+
+
+def client_order_id(*parts):
+    """
+    newClientOrderId determinístico: as mesmas partes (e.g., instância, ciclo, símbolo e
+    lado) geram sempre o mesmo id, então repetir o envio no mesmo ciclo não cria outra ordem.
+    """
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return CLIENT_ORDER_PREFIX + digest[:28]
+
+
+# Falhas em que a requisição pode ter chegado à Binance (timeout, conexão caída, erro 5xx)
+def is_unknown_status(error):
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError, BinanceRequestException)):
+        return True
+    if isinstance(error, BinanceAPIException):
+        return error.code in UNKNOWN_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+class OrderGateway:
+    """
+    Envio de ordens a mercado idempotente e sem bloquear quem chama.
+
+    Cada ordem leva um newClientOrderId determinístico. Se o envio expira ou a Binance
+    responde com status desconhecido, o resultado é resolvido consultando a ordem por
+    esse id (`origClientOrderId`), nunca reenviando. Ordens que continuam sem resposta
+    ficam pendentes e são resolvidas antes de qualquer nova ordem no mesmo símbolo e lado.
+    """
+
+    def __init__(self, client, max_workers=5, timeout=None, resolve_attempts=3, resolve_delay=1.0):
+        """
+        :param timeout: Segundos de espera pela resposta do envio (None = ORDER_TIMEOUT do .env ou 10).
+        :param resolve_attempts: Consultas feitas para descobrir o status após uma falha.
+        :param resolve_delay: Segundos entre as consultas.
+        """
+        self.client = client
+        self.timeout = timeout if timeout is not None else float(os.getenv("ORDER_TIMEOUT", "10"))
+        self.resolve_attempts = resolve_attempts
+        self.resolve_delay = resolve_delay
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix='ordens')
+        self._lock = threading.Lock()
+        self._futures = {}  # clientOrderId -> Future da ordem
+        self._pending = {}  # (símbolo, lado) -> clientOrderId com status ainda desconhecido
+
+    def submit(self, symbol, side, quantity, order_id, **params):
+        """
+        Envia uma ordem a mercado em segundo plano.
+
+        :param order_id: newClientOrderId (veja `client_order_id`). Um id já enviado devolve
+                         o mesmo Future, sem nova ordem.
+        :return: Future com a ordem da Binance, ou None se ela não foi executada.
+        """
+        with self._lock:
+            if len(self._futures) > 1000:
+                self._futures = {key: f for key, f in self._futures.items() if not f.done()}
+            future = self._futures.get(order_id)
+            if future is None:
+                future = self._executor.submit(self._place, symbol, side, quantity, order_id, params)
+                self._futures[order_id] = future
+        return future
+
+    # Envia e aguarda o resultado (a espera máxima já está limitada pelo timeout do envio e da resolução)
+    def execute(self, symbol, side, quantity, order_id, **params):
+        return self.submit(symbol, side, quantity, order_id, **params).result()
+
+    def _place(self, symbol, side, quantity, order_id, params):
+        # Uma ordem anterior do mesmo símbolo e lado com status desconhecido é resolvida antes de enviar
+        # outra; ela só substitui a nova se foi de fato executada (uma compra nunca vira resultado de venda)
+        key = (symbol, side)
+        with self._lock:
+            previous = self._pending.get(key)
+        if previous is not None and previous != order_id:
+            order = self.resolve(symbol, previous, side)
+            if order is not None and float(order.get('executedQty') or 0) > 0:
+                log_event(f"Ordem anterior de {symbol.replace('USDT', '')} ({previous}) já havia sido executada; "
+                          f"nova ordem não enviada.", fase='ordens', simbolo=symbol, client_order_id=previous)
+                return order
+            with self._lock:
+                unresolved = self._pending.get(key) == previous
+            if unresolved:
+                log_event(f"Ordem anterior de {symbol.replace('USDT', '')} ainda sem status; nova ordem não enviada.",
+                          fase='ordens', simbolo=symbol, client_order_id=previous)
+                return None
+
+        try:
+            return self.client.create_order(symbol=symbol, side=side, type='MARKET', quantity=quantity,
+                                            newClientOrderId=order_id, newOrderRespType='FULL',
+                                            requests_params={'timeout': self.timeout}, **params)
+        except Exception as e:
+            if not is_unknown_status(e):
+                raise
+            log_event(f"Status da ordem {order_id} de {symbol.replace('USDT', '')} desconhecido ({e}); "
+                      f"consultando pelo clientOrderId.", fase='ordens', simbolo=symbol, client_order_id=order_id)
+            with self._lock:
+                self._pending[key] = order_id
+            return self.resolve(symbol, order_id, side)
+
+    def resolve(self, symbol, order_id, side):
+        """
+        Descobre o que aconteceu com uma ordem consultando-a pelo clientOrderId.
+
+        :return: A ordem, se existe na Binance (executada ou não); None se não existe.
+                 Enquanto a consulta falhar, a ordem continua pendente.
+        """
+        for attempt in range(self.resolve_attempts):
+            if attempt:
+                time.sleep(self.resolve_delay)
+            try:
+                order = self.client.get_order(symbol=symbol, origClientOrderId=order_id)
+            except BinanceAPIException as e:
+                if e.code != ORDER_NOT_FOUND_CODE:
+                    continue
+                # A Binance pode levar um instante para registrar a ordem: só é confirmada inexistente na última consulta
+                if attempt < self.resolve_attempts - 1:
+                    continue
+                order = None
+            except Exception:
+                continue
+
+            with self._lock:
+                if self._pending.get((symbol, side)) == order_id:
+                    del self._pending[(symbol, side)]
+            log_event(f"Ordem {order_id} de {symbol.replace('USDT', '')} resolvida: "
+                      f"{order['status'] if order else 'não executada'}.", fase='ordens', simbolo=symbol,
+                      client_order_id=order_id, status=order['status'] if order else None)
+            return order
+
+        log_event(f"Não foi possível resolver a ordem {order_id} de {symbol.replace('USDT', '')}; "
+                  f"será consultada antes da próxima ordem do par.", fase='ordens', simbolo=symbol,
+                  client_order_id=order_id)
+        return None
+
+    # (símbolo, lado) das ordens de status ainda desconhecido
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
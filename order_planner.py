@@ -0,0 +1,52 @@
+import concurrent.futures
+from event_log import log_event
+
+
+def plan_buy_orders(candidates, balance, percentual, slots):
+    """
+    Calcula de uma vez as alocações de uma rodada de compras a partir de um único saldo.
+
+    Reproduz o comportamento do laço sequencial antigo, em que cada compra usava
+    `percentual` do saldo que sobrava após a compra anterior.
+
+    :param candidates: Ranking de criptos ({'symbol', 'volatility', ...}), do melhor para o pior.
+    :param balance: Saldo USDT livre no início da rodada.
+    :param percentual: Fração do saldo usada em cada compra (e.g., 0.1).
+    :param slots: Número de posições ainda disponíveis.
+    :return: Lista de ordens planejadas {'symbol', 'volatility', 'amount'}.
+    """
+    orders = []
+    remaining = balance
+    for crypto in candidates[:max(slots, 0)]:
+        amount = remaining * percentual
+        if amount <= 0:
+            break
+        orders.append({'symbol': crypto['symbol'], 'volatility': crypto['volatility'], 'amount': amount})
+        remaining -= amount
+    return orders
+
+
+def dispatch_orders(orders, execute, max_workers=5):
+    """
+    Envia as ordens planejadas em paralelo e coleta os resultados juntos.
+
+    O peso das requisições continua controlado pelo RateLimiter instalado no cliente;
+    `max_workers` limita quantas ordens ficam em voo ao mesmo tempo.
+
+    :param orders: Ordens de `plan_buy_orders`.
+    :param execute: Função (symbol, amount) -> ordem retornada pela Binance ou None.
+    :return: Lista de pares (ordem planejada, resultado), na ordem do planejamento.
+    """
+    if not orders:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(orders))) as executor:
+        futures = [executor.submit(execute, order['symbol'], order['amount']) for order in orders]
+        results = []
+        for order, future in zip(orders, futures):
+            try:
+                results.append((order, future.result()))
+            except Exception as e:
+                log_event(f"Erro ao enviar a ordem de {order['symbol'].replace('USDT', '')}: {e}",
+                          fase='compras', simbolo=order['symbol'])
+                results.append((order, None))
+    return results
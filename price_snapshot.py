@@ -0,0 +1,93 @@
+import time
+import threading
+
+
+class PriceSnapshot:
+    """
+    Tabela de preços de todos os pares, servida a partir de um único pedido
+    `get_all_tickers()` (ou do stream de miniTickers, se iniciado).
+
+    Todas as leituras de preço de um ciclo vêm da mesma tabela; ela só é
+    renovada quando fica mais velha que `max_age` segundos.
+    """
+
+    def __init__(self, client, max_age=5.0):
+        self.client = client
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._prices = {}
+        self._time = 0.0
+        self._stream = None
+
+    def _is_fresh(self, max_age):
+        return self._prices and time.time() - self._time < max_age
+
+    # Busca os preços de todos os pares em uma única requisição
+    def refresh(self):
+        tickers = self.client.get_all_tickers()
+        prices = {t['symbol']: float(t['price']) for t in tickers}
+        with self._lock:
+            self._prices = prices
+            self._time = time.time()
+        return prices
+
+    def prices(self, max_age=None):
+        """
+        Retorna o dicionário {símbolo: preço}, renovando-o se estiver velho.
+
+        :param max_age: Idade máxima aceita em segundos. Default é o `max_age` da instância.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            if self._is_fresh(max_age):
+                return self._prices
+        # Evita que várias threads renovem a tabela ao mesmo tempo
+        with self._refresh_lock:
+            with self._lock:
+                if self._is_fresh(max_age):
+                    return self._prices
+            return self.refresh()
+
+    def get_price(self, symbol, max_age=None):
+        """
+        :return: Preço atual do símbolo.
+        :raises KeyError: Se o par não existir na tabela.
+        """
+        prices = self.prices(max_age)
+        if symbol not in prices:
+            raise KeyError(f"par {symbol} não encontrado")
+        return prices[symbol]
+
+    # Atualiza a tabela a partir de mensagens do stream '!miniTicker@arr'
+    def update_from_stream(self, message):
+        if isinstance(message, dict) and message.get('e') == 'error':
+            print(f"Erro no stream de preços: {message.get('m')}")
+            return
+        events = message if isinstance(message, list) else [message]
+        with self._lock:
+            prices = dict(self._prices)
+            for event in events:
+                if 's' in event and 'c' in event:
+                    prices[event['s']] = float(event['c'])
+            self._prices = prices
+            # O stream só envia os pares que mudaram; a tabela continua completa pelo último refresh
+            if self._stream is not None:
+                self._time = time.time()
+
+    def start_stream(self):
+        """
+        Mantém a tabela atualizada pelo websocket de miniTickers da Binance, sem consumir peso REST.
+        """
+        from binance import ThreadedWebsocketManager
+
+        if not self._prices:
+            self.refresh()
+        self._stream = ThreadedWebsocketManager()
+        self._stream.start()
+        self._stream.start_miniticker_socket(callback=self.update_from_stream)
+
+    def stop_stream(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream = None
@@ -0,0 +1,140 @@
+import os
+import math
+import time
+
+# Modos de proteção das posições:
+# - 'cliente': stops e meta de lucro calculados pelo robô a cada análise de vendas (comportamento original);
+# - 'trailing': uma ordem na corretora com a meta de lucro ou o trailing stop (TRAILING_DELTA);
+# - 'oco': a mesma ordem como perna superior de uma OCO, com um stop loss fixo como perna inferior.
+PROTECTION_MODES = ('cliente', 'trailing', 'oco')
+DEFAULT_PROTECTION_MODE = 'cliente'
+
+# Stop loss fixo da perna inferior da OCO, em % abaixo do preço médio. É um parâmetro novo, só do
+# modo 'oco': a análise de vendas do robô não tem stop antes da ativação do trailing.
+DEFAULT_OCO_STOP_LOSS = 30.0
+
+# Prefixo do clientOrderId das ordens de proteção (identifica as ordens do robô no livro após reiniciar)
+CLIENT_ORDER_PREFIX = 'prot-'
+
+# Limites do trailingDelta (em BIPS) quando o par não informa o filtro TRAILING_DELTA
+MIN_TRAILING_DELTA = 10
+MAX_TRAILING_DELTA = 2000
+
+
+# Modo de proteção: 'protecao' da config, PROTECTION_MODE do .env ou o padrão
+def protection_mode(config):
+    mode = str((config or {}).get('protecao') or os.getenv("PROTECTION_MODE") or DEFAULT_PROTECTION_MODE)
+    mode = mode.strip().lower()
+    return mode if mode in PROTECTION_MODES else DEFAULT_PROTECTION_MODE
+
+
+# Stop loss da OCO: 'stop_oco' da config, PROTECTION_STOP_LOSS do .env ou o padrão
+def oco_stop_loss(config):
+    value = (config or {}).get('stop_oco') or os.getenv("PROTECTION_STOP_LOSS") or DEFAULT_OCO_STOP_LOSS
+    return float(str(value).replace(',', '.'))
+
+
+def _filter(symbol_info, filter_type):
+    return next((f for f in symbol_info.get('filters', []) if f['filterType'] == filter_type), {})
+
+
+# Casas decimais de um passo de preço ou quantidade (e.g., 0.001 -> 3)
+def _decimals(step):
+    return max(0, int(round(-math.log10(step)))) if step > 0 else 8
+
+
+# Arredonda para baixo no múltiplo do passo e formata como a Binance espera
+def format_step(value, step):
+    if step > 0:
+        value = math.floor(value / step + 1e-9) * step
+    return f"{value:.{_decimals(step)}f}"
+
+
+def trailing_delta(symbol_info, trailing_stop_percentage, activation_threshold, min_stop_loss_percentage):
+    """
+    trailingDelta (em BIPS) equivalente ao trailing stop do robô.
+
+    No robô o stop nunca fica abaixo do preço médio + `min_stop_loss_percentage`. A corretora
+    não tem esse piso, então o recuo é limitado para que, a partir do preço de ativação,
+    o stop já comece acima dele.
+    """
+    percentage = trailing_stop_percentage / 100
+    floor_limit = 1 - (1 + min_stop_loss_percentage / 100) / (1 + activation_threshold / 100)
+    if floor_limit > 0:
+        percentage = min(percentage, floor_limit)
+
+    delta_filter = _filter(symbol_info, 'TRAILING_DELTA')
+    low = int(delta_filter.get('minTrailingAboveDelta', MIN_TRAILING_DELTA))
+    high = int(delta_filter.get('maxTrailingAboveDelta', MAX_TRAILING_DELTA))
+    return max(low, min(high, int(percentage * 10_000)))
+
+
+def plan_protection(symbol, quantity, purchase_price, symbol_info, mode, profit_percentage,
+                    trailing_stop_percentage=30.0, activation_threshold=30.0, min_stop_loss_percentage=7.0,
+                    stop_loss_percentage=DEFAULT_OCO_STOP_LOSS, price=None, now=None):
+    """
+    Monta os parâmetros da ordem de proteção de uma posição, espelhando a análise de vendas
+    do robô (`lucro_venda`, ativação e recuo do trailing stop).
+
+    - Se a meta de lucro vem antes da ativação do trailing, ela é atingida primeiro e a
+      proteção é uma venda limitada no preço da meta;
+    - Senão, é uma venda TAKE_PROFIT com trailingDelta: o trailing começa quando o preço
+      chega à ativação e vende quando recua o percentual configurado a partir da máxima;
+    - Se o preço atual (`price`) já passou da ativação, um stopPrice na ativação dispararia
+      na hora (ou seria rejeitado), então a proteção é um STOP_LOSS só com trailingDelta,
+      que começa a acompanhar a máxima imediatamente (nos dois modos, sem perna inferior).
+
+    No modo 'oco' a ordem da meta ou do trailing vira a perna superior de uma OCO e a
+    inferior é um STOP_LOSS fixo no preço médio menos `stop_loss_percentage` (veja `oco_stop_loss`).
+
+    :return: {'tipo', 'metodo' ('create_order' ou 'create_oco_order'), 'params', 'meta', 'ativacao'}.
+    """
+    tick = float(_filter(symbol_info, 'PRICE_FILTER').get('tickSize', 0) or 0)
+    step = float(_filter(symbol_info, 'LOT_SIZE').get('stepSize', 0) or 0)
+    tag = f"{CLIENT_ORDER_PREFIX}{symbol}-{int(now or time.time())}"
+
+    target = purchase_price * (1 + profit_percentage / 100)
+    activation = purchase_price * (1 + activation_threshold / 100)
+    delta = trailing_delta(symbol_info, trailing_stop_percentage, activation_threshold, min_stop_loss_percentage)
+    if profit_percentage <= activation_threshold:
+        above = {'type': 'LIMIT_MAKER' if mode == 'oco' else 'LIMIT', 'price': format_step(target, tick)}
+        kind = 'meta'
+    elif price is not None and price >= activation:
+        above = {'type': 'STOP_LOSS', 'trailingDelta': delta}
+        kind = 'trailing-ativo'
+    else:
+        above = {'type': 'TAKE_PROFIT', 'stopPrice': format_step(activation, tick), 'trailingDelta': delta}
+        kind = 'trailing'
+
+    plan = {'tipo': kind, 'meta': target, 'ativacao': activation}
+    if mode != 'oco' or kind == 'trailing-ativo':
+        params = dict(above, symbol=symbol, side='SELL', quantity=format_step(quantity, step),
+                      newClientOrderId=tag)
+        if above['type'] == 'LIMIT':
+            params['timeInForce'] = 'GTC'
+        return dict(plan, metodo='create_order', params=params)
+
+    stop = purchase_price * (1 - stop_loss_percentage / 100)
+    params = {'symbol': symbol, 'side': 'SELL', 'quantity': format_step(quantity, step),
+              'listClientOrderId': tag, 'aboveClientOrderId': f"{tag}-a", 'belowClientOrderId': f"{tag}-b",
+              'belowType': 'STOP_LOSS', 'belowStopPrice': format_step(stop, tick)}
+    params.update({'above' + key[0].upper() + key[1:]: value for key, value in above.items()})
+    return dict(plan, tipo=f"oco-{kind}", metodo='create_oco_order', params=params, stop=stop)
+
+
+# Ids das ordens criadas (uma ordem simples ou as duas pernas de uma OCO)
+def placed_order_ids(response):
+    if 'orderReports' in response:
+        return [report['orderId'] for report in response['orderReports']]
+    if 'orders' in response:
+        return [order['orderId'] for order in response['orders']]
+    return [response['orderId']]
+
+
+# Agrupa por símbolo as ordens abertas que são proteções do robô
+def group_protective_orders(open_orders):
+    grouped = {}
+    for order in open_orders:
+        if order.get('side') == 'SELL' and str(order.get('clientOrderId', '')).startswith(CLIENT_ORDER_PREFIX):
+            grouped.setdefault(order['symbol'], []).append(order)
+    return grouped
@@ -0,0 +1,102 @@
+import time
+import threading
+from collections import deque
+
+
+# Peso das rotas REST usadas pelo robô (https://binance-docs.github.io/apidocs/spot/en/)
+# Chave: sufixo do caminho. Valor: (peso com símbolo, peso sem símbolo)
+ENDPOINT_WEIGHTS = {
+    'ticker/24hr': (2, 80),
+    'ticker/price': (2, 4),
+    'exchangeInfo': (20, 20),
+    'klines': (2, 2),
+    'account': (20, 20),
+    'allOrders': (20, 20),
+    'openOrders': (6, 80),
+    'myTrades': (20, 20),
+    'order': (4, 4),
+    'userDataStream': (2, 2),
+    'time': (1, 1),
+    'ping': (1, 1),
+}
+
+
+# Calcula o peso de uma requisição a partir da URL e dos parâmetros
+def endpoint_weight(method, uri, params=None):
+    path = uri.split('?')[0].rstrip('/')
+    has_symbol = bool(params) and 'symbol' in params
+    for suffix, (with_symbol, without_symbol) in ENDPOINT_WEIGHTS.items():
+        if path.endswith('/' + suffix):
+            if suffix == 'order' and method.lower() == 'post':
+                return 1
+            return with_symbol if has_symbol else without_symbol
+    return 1
+
+
+class RateLimiter:
+    """
+    Limitador do peso de requisições por minuto da Binance.
+
+    O limite da Binance é por IP, então uma única instância deve ser compartilhada
+    por todos os clientes (conta principal e subcontas) do mesmo processo.
+    """
+
+    def __init__(self, max_weight_per_minute=5000, window=60.0):
+        self.max_weight = max_weight_per_minute
+        self.window = window
+        self._lock = threading.Lock()
+        self._entries = deque()  # (instante, peso)
+        self._used = 0
+        self._server_used = 0
+        self._server_used_time = 0.0
+
+    def _expire(self, now):
+        while self._entries and now - self._entries[0][0] >= self.window:
+            self._used -= self._entries.popleft()[1]
+
+    # Bloqueia até haver peso disponível na janela e registra o consumo
+    def acquire(self, weight=1):
+        while True:
+            with self._lock:
+                now = time.time()
+                self._expire(now)
+                used = self._used
+                if now - self._server_used_time < self.window:
+                    used = max(used, self._server_used)
+                if used + weight <= self.max_weight or not self._entries:
+                    self._entries.append((now, weight))
+                    self._used += weight
+                    return
+                wait = self.window - (now - self._entries[0][0])
+            time.sleep(max(wait, 0.05))
+
+    # Sincroniza com o peso informado pelo servidor no cabeçalho X-MBX-USED-WEIGHT-1M
+    def observe_used_weight(self, used):
+        with self._lock:
+            self._server_used = used
+            self._server_used_time = time.time()
+
+    # Peso consumido na janela atual
+    def used_weight(self):
+        with self._lock:
+            self._expire(time.time())
+            return self._used
+
+    def install(self, client):
+        """
+        Faz todas as requisições REST do cliente python-binance passarem pelo limitador.
+        """
+        original_request = client._request
+
+        def _request(method, uri, signed, force_params=False, **kwargs):
+            self.acquire(endpoint_weight(method, uri, kwargs.get('data') or kwargs.get('params')))
+            try:
+                return original_request(method, uri, signed, force_params, **kwargs)
+            finally:
+                response = getattr(client, 'response', None)
+                used = response.headers.get('X-MBX-USED-WEIGHT-1M') if response is not None else None
+                if used:
+                    self.observe_used_weight(int(used))
+
+        client._request = _request
+        return client
@@ -1,46 +1,60 @@
-import requests
-import os
+import sys
+from datetime import datetime
 from decouple import config
+from binance.exceptions import BinanceAPIException
+from exchanges import BinanceExchange, MercadoBitcoinExchange, screen_markets
+from market_data import MarketData
+from strategies import get_strategy
+from transport import create_client
 
-# Carregar credenciais do arquivo .env
-API_TOKEN_ID = config('USERNAME')
-API_TOKEN_SECRET = config('PASSWORD')
-
-# URL base da API
-BASE_URL = "https://api.mercadobitcoin.net/api/v4"
-
-# Endpoint para autenticação (acessar a chave)
-auth_url = f"{BASE_URL}/authorize"
-auth_data = {
-    "login": API_TOKEN_ID,  # Mudamos de 'username' para 'login'
-    "password": API_TOKEN_SECRET
-}
-
-# Fazendo a autenticação
-response = requests.post(auth_url, data=auth_data)
-
-# Verificando o sucesso da autenticação
-if response.status_code == 200:
-    auth_token = response.json().get("access_token")
-    print("Autenticação bem-sucedida!")
-else:
-    print(f"Erro na autenticação: {response.status_code} - {response.text}")
-    exit()
-
-# Definir o cabeçalho de autorização
-headers = {
-    'Authorization': f'Bearer {auth_token}'
-}
-
-# Endpoint para consultar o preço do Bitcoin
-ticker_url = f"{BASE_URL}/ticker"
-
-# Consultando o preço do Bitcoin
-response = requests.get(ticker_url, headers=headers)
-
-# Verificando a resposta
-if response.status_code == 200:
-    data = response.json()
-    print("Preço do Bitcoin (BRL):", data['ticker']['last'])
-else:
-    print(f"Erro ao consultar o preço: {response.status_code} - {response.text}")
+# Consulta o preço do Bitcoin na Mercado Bitcoin. Com --triagem, faz também a triagem dos
+# mercados BRL (Mercado Bitcoin) e USDT (Binance, se houver API_KEY no .env) lado a lado,
+# pelo mesmo motor de triagem dos robôs da Binance.
+
+
+def create_exchange():
+    # Carregar credenciais do arquivo .env
+    return MercadoBitcoinExchange(config('USERNAME'), config('PASSWORD'))
+
+
+def screen_brl_and_usdt(exchange):
+    markets = [MarketData(exchange)]
+    if config('API_KEY', default=None):
+        markets.append(MarketData(BinanceExchange(create_client(config('API_KEY'), config('API_SECRET')))))
+
+    strategy = get_strategy(config('ESTRATEGIA', default='hora'))
+    settings = {'estrategia': strategy.name, 'limite_criptos': config('LIMITE_CRIPTOS', default='10')}
+    min_volume = {'BRL': float(config('VOLUME_MINIMO_BRL', default='100000')),
+                  'USDT': float(config('VOLUME_MINIMO', default='1000000'))}
+
+    results = screen_markets(markets, [(strategy, settings)], min_volume)
+    for name, [leaders] in results.items():
+        print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Top de Criptos Voláteis ({name}):")
+        for i, crypto in enumerate(leaders, start=1):
+            print(f"{i}. {crypto['symbol']} - Volatilidade: {crypto['volatility'] * 100:.2f}%")
+
+
+def main():
+    exchange = create_exchange()
+
+    # Fazendo a autenticação (o token fica guardado e é renovado antes de expirar)
+    try:
+        exchange.authorize()
+        print("Autenticação bem-sucedida!")
+    except BinanceAPIException as e:
+        print(f"Erro na autenticação: {e.status_code} - {e.message}")
+        exit()
+
+    # Consultando o preço do Bitcoin
+    try:
+        ticker = exchange.get_ticker(symbol='BTCBRL')
+        print("Preço do Bitcoin (BRL):", ticker['lastPrice'])
+    except BinanceAPIException as e:
+        print(f"Erro ao consultar o preço: {e.status_code} - {e.message}")
+
+    if '--triagem' in sys.argv:
+        screen_brl_and_usdt(exchange)
+
+
+if __name__ == "__main__":
+    main()
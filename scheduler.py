@@ -0,0 +1,110 @@
+import time
+import threading
+from event_log import log_event
+
+# Duração das velas da Binance em segundos (as velas fecham em múltiplos exatos desde a época, em UTC)
+INTERVAL_SECONDS = {
+    '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '8h': 28800, '12h': 43200,
+    '1d': 86400,
+}
+
+
+# Próximo fechamento de vela do intervalo depois de `now`, mais uma folga para a vela ficar disponível
+def next_candle_close(interval, now=None, delay=10.0):
+    seconds = INTERVAL_SECONDS[interval]
+    now = time.time() if now is None else now
+    return (int((now - delay) // seconds) + 1) * seconds + delay
+
+
+class Job:
+    """
+    Tarefa periódica do Scheduler.
+
+    :param interval: Segundos entre execuções (número ou função sem argumentos).
+    :param align: Função que recebe o instante atual e retorna o da próxima execução
+                  (e.g., o próximo fechamento de vela). Tem prioridade sobre `interval`.
+    """
+
+    def __init__(self, name, func, interval=None, align=None, run_immediately=True):
+        if interval is None and align is None:
+            raise ValueError(f"A tarefa {name} precisa de interval ou align.")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.align = align
+        self.next_run = time.time() if run_immediately else self._following(time.time())
+        self.running = False
+        self.runs = 0
+        self.overruns = 0  # Execuções puladas porque a anterior ainda não tinha terminado
+        self.last_duration = None
+
+    def _following(self, now):
+        if self.align is not None:
+            return self.align(now)
+        interval = self.interval() if callable(self.interval) else self.interval
+        return now + max(float(interval), 1.0)
+
+    # Agenda a próxima execução a partir do horário previsto, sem acumular atraso
+    def schedule_next(self, now):
+        following = self._following(self.next_run)
+        self.next_run = following if following > now else self._following(now)
+
+
+class Scheduler:
+    """
+    Executa tarefas periódicas independentes, cada uma na sua própria thread.
+
+    Uma tarefa lenta (e.g., a triagem de mercado) nunca atrasa as outras (e.g., o
+    monitoramento dos stops): se uma execução ainda não terminou quando chega a hora
+    da próxima, a nova é pulada e contada em `overruns`.
+    """
+
+    def __init__(self, tick=0.5):
+        self.tick = tick
+        self.jobs = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def add_job(self, name, func, interval=None, align=None, run_immediately=True):
+        job = Job(name, func, interval, align, run_immediately)
+        with self._lock:
+            self.jobs.append(job)
+        return job
+
+    def _execute(self, job):
+        start = time.time()
+        try:
+            job.func()
+        except Exception as e:
+            log_event(f"Erro na tarefa {job.name}: {e}", fase=job.name)
+        finally:
+            with self._lock:
+                job.running = False
+                job.runs += 1
+                job.last_duration = time.time() - start
+
+    # Dispara as tarefas vencidas; retorna o instante da próxima execução prevista
+    def run_pending(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for job in self.jobs:
+                if job.next_run > now:
+                    continue
+                if job.running:
+                    job.overruns += 1
+                    log_event(f"Tarefa {job.name} ainda em execução; execução de agora pulada.",
+                              fase=job.name, console=False, overruns=job.overruns)
+                else:
+                    job.running = True
+                    threading.Thread(target=self._execute, args=(job,), name=f"job-{job.name}", daemon=True).start()
+                job.schedule_next(now)
+            return min((job.next_run for job in self.jobs), default=now + self.tick)
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            next_run = self.run_pending()
+            self._stop.wait(min(max(next_run - time.time(), 0.0), self.tick))
+
+    def stop(self):
+        self._stop.set()
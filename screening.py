@@ -0,0 +1,121 @@
+import heapq
+import itertools
+import threading
+import numpy as np
+from volatility import PARKINSON_FACTOR
+
+# Etapas do pré-filtro, na ordem em que são aplicadas
+PREFILTER_STAGES = ('cotacao', 'volume', 'negociando', 'blacklist', 'carteira')
+
+
+def prefilter(tickers, min_volume, quote='USDT', trading_symbols=None, blacklist=(), held_assets=()):
+    """
+    Aplica de uma vez, como máscaras vetorizadas sobre o payload de `get_ticker()`,
+    os filtros que não dependem de velas: moeda de cotação, volume mínimo, status
+    TRADING, blacklist e ativos já em carteira. Só os sobreviventes seguem para a
+    busca de velas.
+
+    :param tickers: Tickers de 24h.
+    :param min_volume: Volume mínimo em moeda de cotação.
+    :param quote: Moeda de cotação dos pares analisados.
+    :param trading_symbols: Conjunto de símbolos com status TRADING (None = não filtra).
+    :param blacklist: Símbolos (e.g., 'BTCUSDT') ou ativos (e.g., 'BTC') a ignorar.
+    :param held_assets: Ativos já em carteira, e.g., {'BTC', 'ETH'}.
+    :return: (tickers sobreviventes, {etapa: quantidade que sobrou após a etapa}).
+    """
+    counts = {'total': len(tickers)}
+    if not tickers:
+        counts.update((stage, 0) for stage in PREFILTER_STAGES)
+        return [], counts
+
+    symbols = np.array([t['symbol'] for t in tickers], dtype=str)
+    volumes = np.array([t.get('quoteVolume') or 0 for t in tickers], dtype=float)
+
+    blacklist = [str(item).strip().upper() for item in blacklist if item]
+    masks = (
+        ('cotacao', np.char.endswith(symbols, quote)),
+        ('volume', volumes >= min_volume),
+        ('negociando', np.isin(symbols, list(trading_symbols)) if trading_symbols is not None else None),
+        ('blacklist', ~np.isin(symbols, blacklist + [item + quote for item in blacklist]) if blacklist else None),
+        ('carteira', ~np.isin(symbols, [asset + quote for asset in held_assets]) if held_assets else None),
+    )
+
+    keep = np.ones(len(tickers), dtype=bool)
+    for stage, mask in masks:
+        if mask is not None:
+            keep &= mask
+        counts[stage] = int(keep.sum())
+
+    return [tickers[i] for i in np.flatnonzero(keep)], counts
+
+
+# Resumo legível das contagens do pré-filtro para o log
+def describe_counts(counts):
+    labels = {'total': 'tickers', 'cotacao': 'na cotação', 'volume': 'com volume', 'negociando': 'negociando',
+              'blacklist': 'fora da blacklist', 'carteira': 'fora da carteira'}
+    return " -> ".join(f"{counts[key]} {label}" for key, label in labels.items() if key in counts)
+
+
+def parkinson_24h(tickers):
+    """
+    Volatilidade de Parkinson estimada com a máxima e a mínima de 24h de cada ticker,
+    de uma vez para todos os pares. Pares sem máxima/mínima válidas ficam com NaN.
+    """
+    highs = np.array([t.get('highPrice') or 0 for t in tickers], dtype=float)
+    lows = np.array([t.get('lowPrice') or 0 for t in tickers], dtype=float)
+    valid = (lows > 0) & (highs >= lows)
+    ratio = np.divide(highs, lows, out=np.ones_like(highs), where=valid)
+    return np.where(valid, np.sqrt(PARKINSON_FACTOR) * np.log(ratio), np.nan)
+
+
+def pre_rank(tickers, size):
+    """
+    Primeira etapa da triagem: mantém só os `size` pares mais voláteis pela estimativa
+    de Parkinson de 24h, sem nenhuma busca de velas.
+
+    :param size: Quantidade de pares mantidos (None ou 0 = mantém todos).
+    :return: Tickers mantidos, do mais para o menos volátil.
+    """
+    if not size or len(tickers) <= size:
+        return list(tickers)
+    scores = np.nan_to_num(parkinson_24h(tickers), nan=-np.inf)
+    top = np.argpartition(-scores, size - 1)[:size]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return [tickers[i] for i in top]
+
+
+class TopK:
+    """
+    Ranking parcial dos melhores candidatos, atualizado à medida que os resultados chegam.
+
+    Mantém um heap limitado aos `k` maiores valores de `key`; `leaders()` pode ser
+    consultado a qualquer momento (de qualquer thread) durante a triagem.
+    """
+
+    def __init__(self, k=None, key='volatility'):
+        """
+        :param k: Quantidade de candidatos mantidos (None ou 0 = todos).
+        """
+        self.k = k or None
+        self.key = key
+        self._heap = []  # (valor, ordem de chegada, candidato); o menor fica no topo
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def offer(self, candidate):
+        entry = (candidate[self.key], next(self._counter), candidate)
+        with self._lock:
+            if self.k is None or len(self._heap) < self.k:
+                heapq.heappush(self._heap, entry)
+            elif entry[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    # Candidatos atuais, do maior para o menor valor
+    def leaders(self):
+        with self._lock:
+            entries = list(self._heap)
+        return [candidate for _, _, candidate in sorted(entries, key=lambda e: (-e[0], e[1]))]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
@@ -1,4 +1,6 @@
+import threading
 import gspread
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
 
 # Escopos de acesso (leitura e escrita)
@@ -7,25 +9,76 @@ SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 # Arquivo da chave da conta de serviço JSON
 SERVICE_ACCOUNT_FILE = 'chave.json'  # atualize se seu arquivo tem outro nome
 
-# Autenticação e cliente gspread
-creds = Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=SCOPES
-)
-gc = gspread.authorize(creds)
-
 # Seu ID da planilha (deve ser passado para as funções)
 # Pode ser lido direto do main.py, aqui só usamos como parâmetro
 
+# Cliente gspread, worksheets abertas e mapas cabeçalho -> coluna, reaproveitados entre chamadas
+_gc = None
+_worksheets = {}
+_headers = {}
+_cache_lock = threading.Lock()
+
+def get_client():
+    """
+    Retorna o cliente gspread, autenticando apenas na primeira chamada.
+    """
+    global _gc
+    with _cache_lock:
+        if _gc is None:
+            creds = Credentials.from_service_account_file(
+                SERVICE_ACCOUNT_FILE, scopes=SCOPES
+            )
+            _gc = gspread.authorize(creds)
+        return _gc
+
+def get_worksheet(spreadsheet_id: str, worksheet_name: str = 'Sheet1'):
+    """
+    Retorna a worksheet, abrindo a planilha apenas na primeira chamada.
+    """
+    key = (spreadsheet_id, worksheet_name)
+    with _cache_lock:
+        worksheet = _worksheets.get(key)
+    if worksheet is None:
+        worksheet = get_client().open_by_key(spreadsheet_id).worksheet(worksheet_name)
+        with _cache_lock:
+            _worksheets[key] = worksheet
+    return worksheet
+
+def get_header_map(spreadsheet_id: str, worksheet_name: str = 'Sheet1', refresh: bool = False):
+    """
+    Retorna o mapa {cabeçalho: número da coluna} da linha 1, em cache entre chamadas.
+    """
+    key = (spreadsheet_id, worksheet_name)
+    with _cache_lock:
+        headers = None if refresh else _headers.get(key)
+    if headers is None:
+        row = get_worksheet(spreadsheet_id, worksheet_name).row_values(1)
+        headers = {}
+        for index, name in enumerate(row):
+            if name and name not in headers:  # Cabeçalho repetido: vale a primeira coluna
+                headers[name] = index + 1
+        with _cache_lock:
+            _headers[key] = headers
+    return headers
+
 def get_sheet_data(spreadsheet_id: str, worksheet_name: str = 'Sheet1'):
     """
     Retorna os dados da worksheet como lista de dicionários.
     Cada dicionário representa uma linha, com chaves pelos cabeçalhos.
     """
-    sh = gc.open_by_key(spreadsheet_id)
-    worksheet = sh.worksheet(worksheet_name)
+    worksheet = get_worksheet(spreadsheet_id, worksheet_name)
     records = worksheet.get_all_records()
     return records
 
+def get_column_values(spreadsheet_id: str, worksheet_name: str = 'Sheet1', col: int = 1, limit: int = None):
+    """
+    Retorna os valores preenchidos de uma coluna (por padrão a coluna A).
+    Se 'limit' for informado, retorna apenas os últimos 'limit' valores.
+    """
+    worksheet = get_worksheet(spreadsheet_id, worksheet_name)
+    values = [v for v in worksheet.col_values(col) if v]
+    return values[-limit:] if limit else values
+
 def update_sheet_data(spreadsheet_id: str, updates: list[dict], worksheet_name: str = 'Sheet1'):
     """
     Atualiza linhas na worksheet baseado no índice da linha.
@@ -40,22 +93,29 @@ def update_sheet_data(spreadsheet_id: str, updates: list[dict], worksheet_name:
         {'row': 2, 'values': {'Nome': 'Henrique', 'Idade': 40}},
         {'row': 5, 'values': {'Nome': 'Maria', 'Idade': 30}},
     ]
+
+    Todas as células são enviadas em uma única requisição (batch_update).
     """
-    sh = gc.open_by_key(spreadsheet_id)
-    worksheet = sh.worksheet(worksheet_name)
+    worksheet = get_worksheet(spreadsheet_id, worksheet_name)
+    headers = get_header_map(spreadsheet_id, worksheet_name)
 
-    # Pega os cabeçalhos da planilha para mapear colunas
-    headers = worksheet.row_values(1)
+    # Se alguma coluna não estiver no mapa, o cabeçalho pode ter mudado: relê uma vez
+    keys = {key for update in updates for key in update['values']}
+    if not keys.issubset(headers):
+        headers = get_header_map(spreadsheet_id, worksheet_name, refresh=True)
 
+    data = []
     for update in updates:
         row_number = update['row']
         values = update['values']
 
         for key, val in values.items():
             if key in headers:
-                col_number = headers.index(key) + 1
-                worksheet.update_cell(row_number, col_number, val)
+                data.append({'range': rowcol_to_a1(row_number, headers[key]), 'values': [[val]]})
             else:
                 raise ValueError(f"Coluna '{key}' não encontrada na planilha.")
 
+    if data:
+        worksheet.batch_update(data, value_input_option='USER_ENTERED')
+
     return True
@@ -0,0 +1,273 @@
+import os
+import time
+import numpy as np
+from event_log import log_event
+from screening import prefilter, describe_counts, pre_rank, TopK
+from volatility import estimate
+
+
+# Registro das estratégias, indexado pelo nome usado na coluna "estrategia" da planilha
+STRATEGIES = {}
+
+# Estratégia usada quando a planilha não informa uma estratégia conhecida
+DEFAULT_STRATEGY = 'hora'
+
+# Quantos candidatos por vaga (limite_criptos) passam do pré-ranking de 24h para a etapa das velas
+DEFAULT_PRE_RANK_MULTIPLIER = 3
+
+# Segundos que a etapa das velas pode levar antes de seguir com os candidatos já avaliados
+DEFAULT_SCREEN_DEADLINE = 60
+
+
+def register_strategy(cls):
+    """
+    Decorador que registra uma estratégia pelo nome e pelos apelidos.
+    """
+    instance = cls()
+    for name in (cls.name,) + tuple(cls.aliases):
+        STRATEGIES[name.strip().lower()] = instance
+    return cls
+
+
+def get_strategy(name):
+    """
+    Retorna a estratégia registrada para o nome informado na planilha.
+    Cai na estratégia padrão se o nome estiver vazio ou não for reconhecido.
+    """
+    key = (name or '').strip().lower()
+    if key not in STRATEGIES:
+        if key:
+            log_event(f"Estratégia '{name}' não reconhecida. Usando '{DEFAULT_STRATEGY}'.", fase='config')
+        key = DEFAULT_STRATEGY
+    return STRATEGIES[key]
+
+
+# Converte valores da planilha ("0,5", "10", None) para float
+def to_float(value, default=None):
+    if value is None or value == '':
+        return default
+    try:
+        return float(str(value).replace(',', '.'))
+    except ValueError:
+        return default
+
+
+# Multiplicador do pré-ranking: 'multiplicador_pre_rank' da config, PRE_RANK_MULTIPLIER do .env ou o padrão
+def pre_rank_multiplier(config):
+    default = to_float(os.getenv("PRE_RANK_MULTIPLIER"), DEFAULT_PRE_RANK_MULTIPLIER)
+    return to_float(config.get('multiplicador_pre_rank'), default)
+
+
+# Prazo da etapa das velas: 'prazo_triagem' da config, SCREEN_DEADLINE do .env ou o padrão (0 = sem prazo)
+def screen_deadline(strategy_configs):
+    default = to_float(os.getenv("SCREEN_DEADLINE"), DEFAULT_SCREEN_DEADLINE)
+    deadlines = [to_float(config.get('prazo_triagem'), default) for _, config in strategy_configs]
+    return max(deadlines, default=default)
+
+
+# Quantidade de pares levados à etapa das velas (0 = todos, se alguma config desativar o pré-ranking)
+def pre_rank_size(strategy_configs):
+    sizes = []
+    for strategy, config in strategy_configs:
+        multiplier = pre_rank_multiplier(config)
+        limit = to_float(config.get('limite_criptos'))
+        if not multiplier or not limit:
+            return 0
+        sizes.append(int(np.ceil(multiplier * limit)))
+    return max(sizes, default=0)
+
+
+# Une as necessidades de velas de várias estratégias: {intervalo: maior quantidade pedida}
+def merge_requirements(strategy_configs):
+    merged = {}
+    for strategy, config in strategy_configs:
+        for interval, limit in strategy.kline_requirements(config).items():
+            merged[interval] = max(merged.get(interval, 0), limit)
+    return merged
+
+
+# Extrai os preços de fechamento das velas da Binance
+def closes_from_klines(klines):
+    return np.array([float(kline[4]) for kline in klines], dtype=float)
+
+
+# Estimador de volatilidade: 'estimador_volatilidade' da config, VOLATILITY_ESTIMATOR do .env ou fechamento
+def estimator_name(config):
+    return config.get('estimador_volatilidade') or os.getenv("VOLATILITY_ESTIMATOR")
+
+
+# RSI simplificado (média dos ganhos sobre média das perdas)
+def rsi(closes):
+    if len(closes) < 2:
+        raise ValueError("Dados insuficientes para calcular o RSI.")
+    deltas = np.diff(closes)
+    gains = deltas[deltas > 0]
+    losses = deltas[deltas < 0]
+    gain = gains.mean() if gains.size else 0
+    loss = abs(losses.mean()) if losses.size else 0
+    rs = gain / loss if loss != 0 else 0
+    return 100 - (100 / (1 + rs))
+
+
+# True se o último fechamento estiver acima da média móvel simples
+def above_moving_average(closes):
+    if len(closes) < 2:
+        raise ValueError("Dados insuficientes para calcular a média móvel.")
+    return closes[-1] > closes.mean()
+
+
+class Strategy:
+    """
+    Estratégia de seleção de criptos.
+
+    Cada estratégia declara o intervalo das velas e quantas velas precisa;
+    o motor busca a união dessas necessidades uma única vez e entrega as velas
+    prontas para `evaluate`, que não faz chamadas de rede.
+    """
+
+    name = None
+    aliases = ()
+    interval = None
+    rsi_period = 14
+    sma_period = 20
+    require_trend = True  # Se True, exige preço acima da média e RSI < 70
+
+    # Quantidade de velas usada no cálculo da volatilidade
+    def volatility_window(self, config):
+        raise NotImplementedError
+
+    def kline_requirements(self, config):
+        """
+        :param config: Configuração lida da planilha.
+        :return: Dicionário {intervalo: quantidade de velas}.
+        """
+        lookback = self.volatility_window(config)
+        if self.require_trend:
+            lookback = max(lookback, self.rsi_period, self.sma_period)
+        return {self.interval: lookback}
+
+    def evaluate(self, symbol, ticker, klines, config):
+        """
+        Avalia um símbolo a partir das velas já obtidas.
+
+        :param symbol: Símbolo da criptomoeda, e.g., 'BTCUSDT'.
+        :param ticker: Ticker de 24h retornado por `get_ticker()`.
+        :param klines: Dicionário {intervalo: velas}.
+        :param config: Configuração lida da planilha.
+        :return: {'symbol', 'volatility', 'volume'} ou None se o ativo for descartado.
+        """
+        candles = klines.get(self.interval)
+        if not candles:
+            return None
+        closes = closes_from_klines(candles)
+
+        # Volatilidade pelo estimador escolhido, sobre as mesmas velas (sem busca extra)
+        volatility = estimate(candles[-self.volatility_window(config):], estimator_name(config))
+        if volatility is None:
+            return None
+
+        if self.require_trend:
+            if not above_moving_average(closes[-self.sma_period:]) or rsi(closes[-self.rsi_period:]) >= 70:
+                return None
+
+        return {'symbol': symbol, 'volatility': volatility, 'volume': float(ticker['quoteVolume'])}
+
+
+@register_strategy
+class HourStrategy(Strategy):
+    """
+    Volatilidade em velas de 1h sobre `horas_volatilidade` (antigo botbinance-hour-v2.py).
+    Nesta variante a média móvel e o RSI nunca descartaram candidatos, então não são exigidos.
+    """
+
+    name = 'hora'
+    aliases = ('hour', '1h', 'horaria', 'horária')
+    interval = '1h'
+    require_trend = False
+
+    def volatility_window(self, config):
+        return int(to_float(config.get('horas_volatilidade'), 24))
+
+
+@register_strategy
+class DayStrategy(Strategy):
+    """
+    Volatilidade em velas de 1d sobre `dias_volatilidade`, com filtro de média móvel
+    e RSI (antigo botbinance-day.py).
+    """
+
+    name = 'dia'
+    aliases = ('day', '1d', 'diaria', 'diária')
+    interval = '1d'
+
+    def volatility_window(self, config):
+        return int(to_float(config.get('dias_volatilidade'), 30))
+
+
+def screen(strategy_configs, tickers, market_data, min_volume, wallet_assets, quote='USDT', blacklist=(),
+           top_k=None, rankers=None, held_reserve=0):
+    """
+    Executa uma ou mais estratégias sobre os mesmos dados de mercado.
+
+    Duas etapas: um pré-ranking barato pela volatilidade de Parkinson de 24h (sobre o
+    próprio payload dos tickers) escolhe os pares que seguem para a análise das velas.
+    As velas desses pares são buscadas uma única vez para a união das necessidades
+    das estratégias, e cada símbolo é avaliado assim que suas velas chegam. Se o
+    prazo da triagem terminar, as buscas restantes (as de menor volatilidade de 24h)
+    são canceladas e o ranking segue com o que já foi avaliado.
+
+    :param strategy_configs: Lista de pares (estratégia, config).
+    :param tickers: Tickers de 24h.
+    :param market_data: Instância de MarketData.
+    :param min_volume: Volume mínimo em moeda de cotação.
+    :param wallet_assets: Ativos já em carteira {ativo: saldo}.
+    :param quote: Moeda de cotação dos pares analisados.
+    :param blacklist: Símbolos ou ativos da blacklist da planilha.
+    :param top_k: Candidatos mantidos por estratégia (None = limite_criptos de cada config, 0 = todos).
+    :param rankers: Lista de TopK (uma por estratégia) para acompanhar os líderes durante a triagem.
+    :param held_reserve: Vagas extras no pré-ranking para ativos que cada conta descarta depois por já
+                         possuí-los (triagem compartilhada entre contas, com `wallet_assets` vazio).
+    :return: Lista de resultados por estratégia, na mesma ordem de `strategy_configs`.
+    """
+    try:
+        trading_symbols = market_data.trading_symbols()
+    except Exception as e:
+        log_event(f"Erro ao obter os pares em negociação: {e}. Seguindo sem o filtro de status.", fase='triagem')
+        trading_symbols = None
+
+    # Filtros baratos primeiro, sobre todos os tickers de uma vez; só os sobreviventes buscam velas
+    held_assets = {asset for asset, amount in wallet_assets.items() if amount >= 0.1}
+    survivors, counts = prefilter(tickers, min_volume, quote, trading_symbols, blacklist, held_assets)
+    log_event(f"Pré-filtro: {describe_counts(counts)}", fase='triagem', **counts)
+
+    # Pré-ranking pela volatilidade de Parkinson de 24h: só os mais voláteis buscam velas
+    size = pre_rank_size(strategy_configs)
+    if size:
+        size += held_reserve
+    ranked = pre_rank(survivors, size)
+    if len(ranked) < len(survivors):
+        log_event(f"Pré-ranking de 24h: {len(survivors)} -> {len(ranked)} pares para a análise de velas.",
+                  fase='triagem', antes=len(survivors), depois=len(ranked))
+    eligible = {ticker['symbol']: ticker for ticker in ranked}
+
+    if rankers is None:
+        rankers = [TopK(int(to_float(config.get('limite_criptos'), 0)) if top_k is None else top_k)
+                   for _, config in strategy_configs]
+
+    requirements = merge_requirements(strategy_configs)
+    seconds = screen_deadline(strategy_configs)
+    deadline = time.time() + seconds if seconds else None
+
+    # Cada símbolo entra no ranking assim que suas velas chegam
+    for symbol, symbol_klines in market_data.iter_klines(list(eligible), requirements, deadline):
+        ticker = eligible[symbol]
+        for (strategy, config), ranker in zip(strategy_configs, rankers):
+            try:
+                result = strategy.evaluate(symbol, ticker, symbol_klines, config)
+            except Exception as e:
+                log_event(f"Erro ao processar o ticker {symbol}: {e}", fase='triagem', simbolo=symbol)
+                continue
+            if result is not None:
+                ranker.offer(result)
+
+    return [ranker.leaders() for ranker in rankers]
@@ -0,0 +1,51 @@
+import os
+import sys
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+# Os módulos do robô ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MOCK_SYMBOLS", "20")
+
+
+class MockServerAdapter(BaseAdapter):
+    """
+    Entrega as requisições do python-binance ao mock_binance_server em processo (sem uvicorn).
+    """
+
+    def __init__(self, app):
+        super().__init__()
+        from fastapi.testclient import TestClient
+        self.test_client = TestClient(app)
+
+    def send(self, request, **kwargs):
+        reply = self.test_client.request(request.method, request.url, content=request.body,
+                                         headers=dict(request.headers))
+        response = requests.Response()
+        response.status_code = reply.status_code
+        response._content = reply.content
+        response.headers = requests.structures.CaseInsensitiveDict(reply.headers)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def mock_server():
+    import mock_binance_server
+    mock_binance_server.account = mock_binance_server.MockAccount(mock_binance_server.market)
+    mock_binance_server.UNKNOWN_RATE = 0
+    return mock_binance_server
+
+
+@pytest.fixture
+def mock_client(mock_server):
+    from binance.client import Client
+    client = Client('chave', 'segredo', ping=False)
+    client.API_URL = 'http://testserver/api'
+    client.session.mount('http://', MockServerAdapter(mock_server.app))
+    return client
@@ -0,0 +1,49 @@
+import pytest
+from trader import Trader
+from user_stream import AccountState
+
+
+class AccountClient:
+    """
+    Cliente com uma conta fixa: ETH inteiro bloqueado numa ordem de proteção e BTC livre.
+    """
+
+    def get_account(self):
+        return {'balances': [{'asset': 'USDT', 'free': '100.0', 'locked': '0.0'},
+                             {'asset': 'ETH', 'free': '0.0', 'locked': '0.5'},
+                             {'asset': 'BTC', 'free': '0.2', 'locked': '0.0'}]}
+
+
+class Acesso:
+    def get_blacklist_from_spreadsheet(self):
+        return []
+
+
+@pytest.fixture
+def trader():
+    return Trader(AccountClient(), Acesso(), None, {'protecao': 'trailing', 'modo_teste': False})
+
+
+CANDIDATES = [{'symbol': symbol, 'volume': 1e9, 'volatility': 0.1}
+              for symbol in ('ETHUSDT', 'BTCUSDT', 'SOLUSDT', 'ADAUSDT')]
+
+
+def test_locked_position_is_held(trader):
+    assert trader.get_wallet_assets(min_balance=0.1) == {'BTC': 0.2}
+    assert trader.get_held_assets() == {'ETH': 0.5, 'BTC': 0.2}
+    assert [c['symbol'] for c in trader.select_candidates(CANDIDATES, 5, 0)] == ['SOLUSDT', 'ADAUSDT']
+
+
+def test_registered_protection_is_held(trader):
+    # Proteção recém-criada, antes de o saldo bloqueado aparecer na conta
+    trader.protective_orders['SOLUSDT'] = {'ordens': [1], 'quantidade': 3.0, 'preco_medio': 10.0,
+                                           'tipo': 'trailing', 'criada': 0.0}
+    assert trader.get_held_assets()['SOL'] == 3.0
+    assert [c['symbol'] for c in trader.select_candidates(CANDIDATES, 5, 0)] == ['ADAUSDT']
+
+
+def test_locked_position_is_held_with_user_stream(trader):
+    trader.account_state = AccountState()
+    trader.account_state.seed_balances(AccountClient().get_account())
+    assert trader.get_wallet_assets(min_balance=0.1) == {'BTC': 0.2}
+    assert trader.get_held_assets() == {'ETH': 0.5, 'BTC': 0.2}
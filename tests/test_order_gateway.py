@@ -0,0 +1,70 @@
+import pytest
+import requests
+from order_gateway import OrderGateway, client_order_id
+
+
+@pytest.fixture
+def symbol(mock_server):
+    market = mock_server.market
+    return next(s for i, s in enumerate(market.symbols) if market.status[i] == 'TRADING')
+
+
+@pytest.fixture
+def gateway(mock_client):
+    gateway = OrderGateway(mock_client, resolve_attempts=2, resolve_delay=0.0)
+    yield gateway
+    gateway.shutdown()
+
+
+# Faz as consultas de ordem falharem na rede, deixando a ordem enviada com status desconhecido
+def unreachable_order_lookup(monkeypatch, client):
+    def get_order(**params):
+        raise requests.exceptions.ConnectionError("sem conexão")
+    monkeypatch.setattr(client, 'get_order', get_order)
+
+
+def test_pending_buy_is_not_returned_as_a_sell(monkeypatch, mock_server, mock_client, gateway, symbol):
+    mock_server.UNKNOWN_RATE = 1
+    unreachable_order_lookup(monkeypatch, mock_client)
+    buy_id = client_order_id('teste', 'c1', symbol, 'BUY')
+    assert gateway.execute(symbol, 'BUY', 0.01, buy_id) is None
+    assert gateway.pending() == {(symbol, 'BUY'): buy_id}
+
+    mock_server.UNKNOWN_RATE = 0
+    monkeypatch.undo()
+    sell = gateway.execute(symbol, 'SELL', 0.01, client_order_id('teste', 'c2', symbol, 'SELL'))
+
+    assert sell['side'] == 'SELL' and sell['status'] == 'FILLED'
+    assert [order['side'] for order in mock_server.account.orders[symbol]] == ['BUY', 'SELL']
+
+
+def test_previous_order_executed_replaces_the_new_one(monkeypatch, mock_server, mock_client, gateway, symbol):
+    mock_server.UNKNOWN_RATE = 1
+    unreachable_order_lookup(monkeypatch, mock_client)
+    first_id = client_order_id('teste', 'c1', symbol, 'BUY')
+    gateway.execute(symbol, 'BUY', 0.01, first_id)
+
+    mock_server.UNKNOWN_RATE = 0
+    monkeypatch.undo()
+    order = gateway.execute(symbol, 'BUY', 0.01, client_order_id('teste', 'c2', symbol, 'BUY'))
+
+    assert order['clientOrderId'] == first_id
+    assert len(mock_server.account.orders[symbol]) == 1
+    assert gateway.pending() == {}
+
+
+def test_previous_order_not_executed_lets_the_new_one_through(monkeypatch, mock_server, mock_client, gateway, symbol):
+    # O envio cai antes de chegar à corretora: a ordem anterior não existe
+    def create_order(**params):
+        raise requests.exceptions.Timeout("timeout")
+    monkeypatch.setattr(mock_client, 'create_order', create_order)
+    unreachable_order_lookup(monkeypatch, mock_client)
+    first_id = client_order_id('teste', 'c1', symbol, 'BUY')
+    assert gateway.execute(symbol, 'BUY', 0.01, first_id) is None
+
+    monkeypatch.undo()
+    second_id = client_order_id('teste', 'c2', symbol, 'BUY')
+    order = gateway.execute(symbol, 'BUY', 0.01, second_id)
+
+    assert order['clientOrderId'] == second_id and order['status'] == 'FILLED'
+    assert gateway.pending() == {}
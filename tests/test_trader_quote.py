@@ -0,0 +1,98 @@
+import pytest
+import trader as trader_module
+from exchanges import Exchange
+from market_data import MarketData
+from trader import Trader
+
+
+class BRLExchange(Exchange):
+    """
+    Corretora cotada em BRL (como a Mercado Bitcoin), em memória: ordens a mercado executadas no preço atual.
+    """
+
+    name = 'teste'
+    quote = 'BRL'
+
+    def __init__(self, price=100.0):
+        self.price = price
+        self.balances = {'BRL': 1000.0}
+        self.orders = []
+
+    def get_ticker(self, symbol=None):
+        return [{'symbol': 'BTCBRL', 'lastPrice': str(self.price), 'highPrice': str(self.price),
+                 'lowPrice': str(self.price), 'volume': '1000', 'quoteVolume': '100000'}]
+
+    def get_all_tickers(self):
+        return [{'symbol': 'BTCBRL', 'price': str(self.price)}]
+
+    def get_exchange_info(self):
+        return {'symbols': [{'symbol': 'BTCBRL', 'status': 'TRADING', 'baseAsset': 'BTC', 'quoteAsset': 'BRL',
+                             'filters': [{'filterType': 'PRICE_FILTER', 'tickSize': '0.01'},
+                                         {'filterType': 'LOT_SIZE', 'minQty': '0.001', 'stepSize': '0.001'}]}]}
+
+    def get_klines(self, symbol, interval, limit=500):
+        return []
+
+    def get_account(self):
+        return {'balances': [{'asset': asset, 'free': str(amount), 'locked': '0'}
+                             for asset, amount in self.balances.items()]}
+
+    def get_all_orders(self, symbol, limit=500, fromId=None):
+        return [order for order in self.orders if order['symbol'] == symbol and order['orderId'] >= (fromId or 0)]
+
+    def get_open_orders(self, symbol=None):
+        return []
+
+    def get_order(self, symbol, orderId=None, origClientOrderId=None):
+        return next(order for order in self.orders
+                    if order['orderId'] == orderId or order['clientOrderId'] == origClientOrderId)
+
+    def create_order(self, symbol, side, type, quantity=None, **params):
+        quantity = float(quantity)
+        sign = 1 if side == 'BUY' else -1
+        self.balances['BTC'] = self.balances.get('BTC', 0.0) + sign * quantity
+        self.balances['BRL'] -= sign * quantity * self.price
+        order = {'symbol': symbol, 'orderId': len(self.orders) + 1, 'clientOrderId': params.get('newClientOrderId'),
+                 'side': side, 'type': type, 'status': 'FILLED', 'executedQty': f"{quantity:.8f}",
+                 'cummulativeQuoteQty': f"{quantity * self.price:.8f}",
+                 'fills': [{'price': str(self.price), 'qty': str(quantity), 'commission': '0',
+                            'commissionAsset': 'BRL'}]}
+        self.orders.append(order)
+        return order
+
+
+class Acesso:
+    def get_blacklist_from_spreadsheet(self):
+        return []
+
+
+@pytest.fixture
+def exchange(monkeypatch):
+    monkeypatch.setattr(trader_module, 'send_email', lambda subject, body: None)
+    return BRLExchange()
+
+
+@pytest.fixture
+def trader(exchange):
+    trader = Trader(exchange, Acesso(), MarketData(exchange, price_max_age=0),
+                    {'modo_teste': False, 'lucro_venda': '5', 'protecao': 'cliente'})
+    trader.cycle_id = 'ciclo'
+    return trader
+
+
+def test_symbols_follow_the_exchange_quote(trader):
+    assert trader.quote == 'BRL'
+    assert trader.pair('BTC') == 'BTCBRL' and trader.base_asset('BTCBRL') == 'BTC'
+
+
+def test_buy_and_sell_through_a_brl_exchange(exchange, trader):
+    [(order, result)] = trader.buy_batch([{'symbol': 'BTCBRL', 'volatility': 0.1, 'volume': 1e5}], 0.001, 1)
+    assert result['side'] == 'BUY' and result['symbol'] == 'BTCBRL'
+    assert exchange.balances['BRL'] < 1000.0
+    assert set(trader.get_wallet_assets()) == {'BTC'}
+
+    exchange.price = 110.0
+    trader.monitor_positions_from_wallet()
+
+    assert [order['side'] for order in exchange.orders] == ['BUY', 'SELL']
+    assert exchange.balances['BTC'] == pytest.approx(0.0)
@@ -0,0 +1,941 @@
+import math
+import time
+import threading
+import concurrent.futures
+import numpy as np
+from datetime import datetime
+from binance.exceptions import BinanceAPIException
+from send_email import send_email
+from dashboard_state import publish_positions
+from event_log import log_event, new_cycle_id
+from order_planner import plan_buy_orders, dispatch_orders
+from order_gateway import OrderGateway, client_order_id
+from protective_orders import (protection_mode, oco_stop_loss, plan_protection, placed_order_ids,
+                               group_protective_orders)
+from strategies import get_strategy, screen
+
+# Status de ordens que ainda podem mudar e precisam ser consultadas de novo
+OPEN_ORDER_STATUSES = ('NEW', 'PARTIALLY_FILLED', 'PENDING_NEW')
+
+
+class Trader:
+    """
+    Uma instância do robô: uma conta (ou subconta) Binance, uma linha de configuração
+    da planilha e o estado do trailing stop das suas posições.
+
+    Várias instâncias podem rodar no mesmo processo compartilhando o mesmo
+    `MarketData` (e o mesmo limitador de peso instalado nos clientes).
+    """
+
+    def __init__(self, client, acesso, market_data, config=None, name=None, store=None):
+        self.client = client
+        self.acesso = acesso
+        self.market_data = market_data
+        self.store = store  # LocalStore para posições e histórico de trades, se usado
+        self.config = config
+        self.name = name
+        self.quote = getattr(client, 'quote', None) or 'USDT'  # Moeda de cotação da corretora (Exchange.quote)
+
+        self.last_prices = {}  # Dicionário para armazenar o maior preço de cada ativo (não o anterior)
+        self.stop_loss_data = {}  # Dicionário para armazenar o stop loss calculado
+        self.trailing_activated = {}  # Dicionário para armazenar o status de ativação do trailing stop
+        self.order_history = {}  # Histórico de ordens por símbolo, indexado pelo orderId
+        self.account_state = None  # AccountState alimentado pelo user data stream, se iniciado
+        self.order_gateway = OrderGateway(client)  # Ordens a mercado com clientOrderId e resolução de timeouts
+        self.protective_orders = {}  # Ordens de proteção na corretora por símbolo (modos 'trailing' e 'oco')
+        self._orders_lock = threading.Lock()
+        self._protection_lock = threading.Lock()
+        self._local = threading.local()  # Ciclo atual de cada tarefa (monitoramento e triagem rodam em paralelo)
+
+    # Identificador do ciclo atual desta thread, gravado nos eventos do log
+    @property
+    def cycle_id(self):
+        return getattr(self._local, 'cycle_id', None)
+
+    @cycle_id.setter
+    def cycle_id(self, value):
+        self._local.cycle_id = value
+
+    # Envolve uma tarefa enviada a um executor para que ela rode no ciclo de quem a enviou
+    def in_cycle(self, task):
+        cycle = self.cycle_id
+
+        def run(*args, **kwargs):
+            self.cycle_id = cycle
+            try:
+                return task(*args, **kwargs)
+            finally:
+                self.cycle_id = None
+
+        return run
+
+    # Ativo de um par desta corretora, e.g., 'BTCUSDT' -> 'BTC' (ou 'BTCBRL' -> 'BTC' na Mercado Bitcoin)
+    def base_asset(self, symbol):
+        return symbol[:-len(self.quote)] if symbol.endswith(self.quote) else symbol
+
+    # Par de um ativo na moeda de cotação desta corretora
+    def pair(self, asset):
+        return f"{asset}{self.quote}"
+
+    # Registra um evento desta instância no log estruturado (só enfileira; a gravação é em segundo plano)
+    def log(self, message, fase=None, simbolo=None, planilha=False, **valores):
+        log_event(message, fase=fase, simbolo=simbolo, ciclo=self.cycle_id, instancia=self.name,
+                  planilha=planilha, acesso=self.acesso, **valores)
+
+    # Função para obter o saldo
+    def get_balance(self, asset):
+        # Com o user data stream ativo, o saldo já está em memória
+        if self.account_state is not None and self.account_state.ready:
+            return self.account_state.free(asset)
+        try:
+            # Obter informações de saldo para o ativo especificado
+            balance = self.client.get_asset_balance(asset=asset)
+
+            # Garantir que os dados retornados estão completos
+            if not balance:
+                raise ValueError(f"Nenhuma informação de saldo retornada para o ativo {asset}.")
+
+            free_balance = float(balance['free'])
+            locked_balance = float(balance['locked'])
+
+            # Log detalhado
+           # print(f"Dados retornados pela API para {asset}: {balance}")
+            #print(f"Saldo livre: {free_balance:.8f}, Saldo bloqueado: {locked_balance:.8f}")
+
+            return free_balance
+        except BinanceAPIException as e:
+            self.log(f"Erro ao obter saldo para {asset} via API: {e}")
+            return 0.0
+        except ValueError as ve:
+            self.log(ve)
+            return 0.0
+        except Exception as e:
+            self.log(f"Erro inesperado ao obter saldo para {asset}: {e}")
+            return 0.0
+
+
+    # Moedas de cotação: saldo para compras, não posições
+    def _cash_assets(self):
+        return {"USDT", "BRL", self.quote}
+
+    # Função para obter todos os ativos na carteira com saldo livre
+    def get_wallet_assets(self, min_balance=0.0, include_locked=False):
+        """
+        Retorna um dicionário com os ativos na carteira e seus saldos livres.
+        Exclui a moeda de cotação da corretora (e USDT e BRL, que nunca são posições).
+
+        :param include_locked: Soma também o saldo bloqueado (e.g., em ordens de proteção no livro).
+        """
+        if self.account_state is not None and self.account_state.ready:
+            return self.account_state.wallet(min_balance, exclude=self._cash_assets(), include_locked=include_locked)
+        try:
+            balances = self.client.get_account()['balances']
+            wallet = {}
+            for balance in balances:
+                asset = balance['asset']
+                amount = float(balance['free']) + (float(balance['locked']) if include_locked else 0.0)
+                if asset not in self._cash_assets() and amount > min_balance:
+                    wallet[asset] = amount
+            return wallet
+        except BinanceAPIException as e:
+            self.log(f"Erro ao obter ativos da carteira: {e}")
+            return {}
+
+    # Ativos que a conta já possui, para a triagem não comprá-los de novo: saldo livre ou bloqueado
+    # (as ordens de proteção dos modos 'trailing' e 'oco' bloqueiam a posição inteira) e proteções registradas
+    def get_held_assets(self, min_balance=0.1):
+        held = self.get_wallet_assets(min_balance=min_balance, include_locked=True)
+        with self._protection_lock:
+            protected = list(self.protective_orders.items())
+        for symbol, info in protected:
+            asset = self.base_asset(symbol)
+            held[asset] = max(held.get(asset, 0.0), info['quantidade'], min_balance)
+        return held
+
+    # Calcula as Bandas de Bollinger
+    def calculate_bollinger_bands(self, symbol, interval='1h', hours=24):
+        """
+        Calcula as Bandas de Bollinger para um ativo com base no intervalo desejado.
+
+        :param symbol: Símbolo da criptomoeda, e.g., 'BTCUSDT'.
+        :param interval: Intervalo das velas (e.g., '1h', '4h'). Default é '1h'.
+        :param hours: Número de horas para análise. Default é 24.
+        :return: Preço atual, banda inferior, banda superior.
+        """
+        # Converte horas para o formato correto para klines
+        start_time = f"{hours} hours ago UTC"
+
+        # Obter os dados de candles
+        klines = self.client.get_historical_klines(symbol, interval, start_time)
+
+        # Extrair preços de fechamento
+        closes = [float(kline[4]) for kline in klines]
+
+        # Garantir que haja dados suficientes para o cálculo
+        if len(closes) < 2:
+            raise ValueError("Dados insuficientes para calcular as Bandas de Bollinger.")
+
+        # Calcular média móvel simples (SMA) e desvio padrão
+        sma = sum(closes) / len(closes)
+        std_dev = np.std(closes)
+
+        # Calcular bandas superior e inferior
+        upper_band = sma + (2 * std_dev)
+        lower_band = sma - (2 * std_dev)
+
+        # Retorna o preço atual, a banda inferior e a banda superior
+        return closes[-1], lower_band, upper_band
+
+    # Obter as criptos mais voláteis segundo a estratégia escolhida na planilha
+    def get_top_volatile_cryptos(self, limit, min_volume, strategy=None):
+        try:
+            strategy = strategy or get_strategy(self.config.get('estrategia'))
+
+            # Obter todos os tickers da Binance (em cache no núcleo de dados de mercado)
+            tickers = self.market_data.get_tickers()
+            wallet_assets = self.get_held_assets()  # Ativos já em carteira, inclusive os protegidos na corretora
+
+            # As velas são buscadas uma única vez para o que a estratégia declara precisar
+            blacklist = self.acesso.get_blacklist_from_spreadsheet()
+            [volatility_data] = screen([(strategy, self.config)], tickers, self.market_data, min_volume, wallet_assets,
+                                       quote=self.quote, blacklist=blacklist)
+            return volatility_data[:limit]
+
+        except Exception as e:
+            self.log(f"Erro ao obter criptos mais voláteis: {e}")
+            return []
+
+    # Definindo a função get_order_history
+    def get_order_history(self, symbol, limit=100, from_id=None):
+        try:
+            orders = []
+            while True:
+                params = {'symbol': symbol, 'limit': limit}
+                if from_id:
+                    params['fromId'] = from_id
+
+                response = self.client.get_all_orders(**params)
+
+                if not response:
+                    break
+
+                orders.extend(response)
+                from_id = response[-1]['orderId']
+
+                if len(response) < limit:
+                    break
+
+            return orders
+
+        except BinanceAPIException as e:
+            self.log(f"Erro ao recuperar o histórico de ordens para {symbol}: {e}")
+            return []   
+
+    # Histórico de ordens em cache: cada consulta busca apenas as ordens novas ou ainda abertas
+    def get_cached_order_history(self, symbol):
+        with self._orders_lock:
+            cached = dict(self.order_history.get(symbol, {}))
+
+        from_id = None
+        if cached:
+            pending = [order_id for order_id, order in cached.items() if order['status'] in OPEN_ORDER_STATUSES]
+            from_id = min(pending) if pending else max(cached)
+
+        for order in self.get_order_history(symbol, from_id=from_id):
+            cached[order['orderId']] = order
+
+        with self._orders_lock:
+            self.order_history[symbol] = cached
+        return [cached[order_id] for order_id in sorted(cached)]
+
+    # Obter o valor mínimo de notional diretamente da API
+    def get_min_notional(self, symbol):
+        try:
+            info = self.market_data.get_symbol_info(symbol)
+            for f in info['filters']:
+                if f['filterType'] == 'MIN_NOTIONAL':
+                    return float(f['minNotional'])
+            return 0.0
+        except BinanceAPIException as e:
+            self.log(f"Erro ao obter o mínimo notional para {symbol}: {e}")
+            return 0.0
+
+    # Função para ajustar a quantidade pelo stepSize
+    def adjust_quantity(self, symbol, quantity):
+        try:
+            # Obtém as informações do símbolo
+            symbol_info = self.market_data.get_symbol_info(symbol)
+
+            # Encontra o filtro LOT_SIZE
+            lot_size_filter = next(f for f in symbol_info['filters'] if f['filterType'] == 'LOT_SIZE')
+
+            # Obtém o stepSize (precisão)
+            step_size = float(lot_size_filter['stepSize'])
+
+            # Calcula o número de casas decimais permitido pelo stepSize
+            decimals = int(-math.log10(step_size))
+
+            # Ajusta a quantidade para o múltiplo válido e formata com a precisão correta
+            adjusted_quantity = math.floor(quantity / step_size) * step_size
+            adjusted_quantity = round(adjusted_quantity, decimals)
+
+            return adjusted_quantity
+        except Exception as e:
+            self.log(f"Erro ao ajustar quantidade para {symbol}: {e}")
+            return quantity 
+
+    # newClientOrderId da ordem de um ciclo: o mesmo ciclo nunca envia duas ordens iguais. Sem ciclo o id
+    # deixaria de ser determinístico (e a ordem, idempotente), então a ordem não é montada.
+    def client_order_id(self, symbol, side, cycle_id):
+        if not cycle_id:
+            raise ValueError(f"Ordem de {self.base_asset(symbol)} fora de um ciclo: sem id de ciclo, "
+                             f"o clientOrderId não seria determinístico.")
+        return client_order_id(self.name or 'principal', cycle_id, symbol, side)
+
+    # Ordem existente e com alguma quantidade executada
+    @staticmethod
+    def _executed(order):
+        return bool(order) and float(order.get('executedQty') or 0) > 0
+
+    # Preço da execução: o do primeiro fill ou, numa ordem consultada depois (sem fills), o preço médio
+    @staticmethod
+    def _fill_price(order):
+        if order.get('fills'):
+            return float(order['fills'][0]['price'])
+        return float(order['cummulativeQuoteQty']) / float(order['executedQty'])
+
+    # Função para realizar a compra
+    def buy_crypto(self, symbol, quantity, notify=True, cycle_id=None):
+        """
+        :param cycle_id: Ciclo da compra, que compõe o clientOrderId. Quem chama de outra thread
+                         (e.g., `buy_batch`) deve informá-lo; por padrão é o ciclo da thread atual.
+        """
+        cycle_id = cycle_id or self.cycle_id
+        try:
+            if self.config['modo_teste'] == True:
+                message = f"[TEST MODE] Compra simulada: {self.base_asset(symbol)} - Quantidade: {quantity:.6f}"
+                if notify:
+                    send_email("Compra Simulada", message)
+                self.log(message, fase='compras', simbolo=symbol, quantidade=quantity, teste=True)
+                return {"status": "TEST", "symbol": symbol, "quantity": quantity}
+
+            # Ajusta a quantidade conforme a precisão exigida
+            quantity = self.adjust_quantity(symbol, quantity)
+
+            # Obter as informações do símbolo
+            info = self.market_data.get_symbol_info(symbol)
+            lot_size_filter = next(f for f in info['filters'] if f['filterType'] == 'LOT_SIZE')
+            min_qty = float(lot_size_filter['minQty'])
+
+            # Verificação inicial da quantidade ajustada contra a mínima permitida
+            #if quantity < min_qty:
+             #   print(f"Erro: Quantidade ajustada ({quantity}) é menor que o mínimo permitido ({min_qty}) para {self.base_asset(symbol)}.")
+              #  return None
+
+            # Obter o valor mínimo de notional, se presente
+            filters = info['filters']
+            min_notional = None
+            for f in filters:
+                if f['filterType'] == 'MIN_NOTIONAL':
+                    min_notional = float(f['minNotional'])
+                    break
+
+            # Calcula o valor total da compra
+            price = self.market_data.get_price(symbol)
+            total_value = price * quantity
+
+            # Logs adicionais para depuração
+            self.log(f"Verificação de compra para {self.base_asset(symbol)}")
+            self.log(f"- Quantidade ajustada para compra: {quantity:.6f}")
+            self.log(f"- Quantidade mínima permitida: {min_qty:.6f}")
+            self.log(f"- Preço atual do ativo: {price:.6f} {self.quote}")
+            self.log(f"- Valor total da compra: {total_value:.6f} {self.quote}")
+            self.log(f"- Valor minimo para compra em {self.quote}: {min_notional}{self.quote}")
+            if min_notional:
+                self.log(f"Valor mínimo permitido (MIN_NOTIONAL): {min_notional:.6f} {self.quote}")
+            else:
+                self.log(f"Valor mínimo permitido (MIN_NOTIONAL) não encontrado para {symbol}.")
+
+            # Verifica se o valor total é suficiente
+            if min_notional and total_value < min_notional:
+                self.log(f"Erro: Valor total da compra ({total_value:.6f} {self.quote}) é menor que o mínimo permitido ({min_notional:.6f} {self.quote}).")
+                return None
+
+            # Realiza a compra (um timeout é resolvido pelo clientOrderId, sem reenviar)
+            order = self.order_gateway.execute(symbol, 'BUY', quantity,
+                                               self.client_order_id(symbol, 'BUY', cycle_id))
+            if not self._executed(order):
+                self.log(f"Compra de {self.base_asset(symbol)} não executada.", fase='compras', simbolo=symbol)
+                return None
+
+            executed_qty = float(order['executedQty'])
+            price = self._fill_price(order)
+            total_purchase_value = executed_qty * price
+            self._record_trade(symbol, 'BUY', executed_qty, price, order)
+
+            # Com a proteção na corretora, a posição fica protegida logo após a execução
+            if protection_mode(self.config) != 'cliente':
+                average_price = float(order.get('cummulativeQuoteQty') or 0) / executed_qty if executed_qty else price
+                self.place_protection(symbol, self.adjust_quantity(symbol, self._net_quantity(order)), average_price)
+
+            # Em rodadas em lote o resumo é enviado uma única vez por buy_batch
+            if not notify:
+                self.log(f"Compra executada: {self.base_asset(symbol)} - Quantidade: {executed_qty:.6f}",
+                         fase='compras', simbolo=symbol, quantidade=executed_qty, preco=price)
+                return order
+
+            wallet = self.get_wallet_assets()
+
+            if self.base_asset(symbol) in wallet:
+                wallet[self.base_asset(symbol)] += executed_qty
+            else:
+                wallet[self.base_asset(symbol)] = executed_qty
+            wallet[self.quote] = wallet.get(self.quote, 0) - total_purchase_value
+
+            message = (f"====== Compra realizada! ===========\n"
+                       f"Cripto: {self.base_asset(symbol)}\n"
+                       f"Qtde da ordem executada: {executed_qty:.6f}\n"
+                       f"Saldo total {self.base_asset(symbol)} em carteira: {wallet.get(self.base_asset(symbol), 0):.6f}\n"
+                       f"Saldo {self.quote} disponível em carteira: {wallet[self.quote]:.2f}\n")
+            send_email("Compra Realizada", message)
+            self.log(message, fase='compras', simbolo=symbol, quantidade=executed_qty, preco=price)
+            return order
+        except BinanceAPIException as e:
+            message = f"Erro ao realizar a compra de {self.base_asset(symbol)}: {e}"
+            self.log(message, fase='compras', simbolo=symbol)
+            return None
+
+
+    # Compra uma rodada de criptos com as alocações calculadas a partir de um único saldo
+    def buy_batch(self, top_cryptos, percentual, slots):
+        balance = self.get_balance(self.quote)
+        orders = plan_buy_orders(top_cryptos, balance, percentual, slots)
+        if len(orders) < len(top_cryptos):
+            self.log(f"Limite de posições simultâneas atingido. Comprando apenas {len(orders)} cripto(s).")
+
+        for order in orders:
+            self.log(f"Comprando {self.base_asset(order['symbol'])} - Volatilidade: {order['volatility']:.4f}",
+                     fase='compras', simbolo=order['symbol'], volatilidade=order['volatility'], valor=order['amount'])
+
+        # O ciclo é lido uma única vez aqui e vai explícito para o clientOrderId de cada ordem
+        cycle = self.cycle_id
+        buy = self.in_cycle(lambda symbol, amount: self.buy_crypto(symbol, amount, notify=False, cycle_id=cycle))
+        results = dispatch_orders(orders, buy)
+        filled = [(order, result) for order, result in results if result]
+        if not filled:
+            return results
+
+        lines = []
+        spent = 0.0
+        for order, result in filled:
+            if result.get('status') == 'TEST':
+                lines.append(f"[TEST MODE] {self.base_asset(order['symbol'])} - Quantidade: {result['quantity']:.6f}")
+                continue
+            executed_qty = float(result['executedQty'])
+            spent += float(result.get('cummulativeQuoteQty') or 0)
+            lines.append(f"{self.base_asset(order['symbol'])} - Qtde da ordem executada: {executed_qty:.6f}")
+
+        subject = "Compra Simulada" if self.config['modo_teste'] == True else "Compra Realizada"
+        message = (f"====== Compras realizadas! ===========\n"
+                   + "\n".join(lines) + "\n"
+                   + f"Saldo {self.quote} disponível em carteira: {balance - spent:.2f}\n")
+        send_email(subject, message)
+        self.log(message, fase='compras', gasto=spent, saldo=balance - spent)
+        return results
+
+    # Função para realizar a venda
+    def sell_crypto(self, symbol, quantity):
+        try:
+            if self.config['modo_teste'] == True:
+                message = f"[TEST MODE] Venda simulada: {self.base_asset(symbol)} - Quantidade: {quantity:.6f}"
+                send_email("Venda Simulada", message)
+                self.log(message, fase='vendas', simbolo=symbol, quantidade=quantity, teste=True)
+                return {"status": "TEST", "symbol": symbol, "quantity": quantity}
+
+            # Ajusta a quantidade conforme a precisão exigida
+            quantity = self.adjust_quantity(symbol, quantity)
+
+            # Obter as informações do símbolo
+            info = self.market_data.get_symbol_info(symbol)
+            lot_size_filter = next(f for f in info['filters'] if f['filterType'] == 'LOT_SIZE')
+            min_qty = float(lot_size_filter['minQty'])
+
+            if quantity < min_qty:
+                message = f"Erro: Quantidade ajustada ({quantity}) é menor que o mínimo permitido ({min_qty}) para {self.base_asset(symbol)}."
+                self.log(message)
+                return None
+
+            # Obter o valor mínimo de notional, se presente
+            filters = info['filters']
+            min_notional = None
+            for f in filters:
+                if f['filterType'] == 'MIN_NOTIONAL':
+                    min_notional = float(f['minNotional'])
+                    break
+
+            # Se o filtro MIN_NOTIONAL não for encontrado, o código continua sem impedir a venda
+            #if min_notional is None:
+             #   print(f'Filtro "MIN_NOTIONAL" não encontrado para o símbolo {symbol}')
+
+            # Verificar o valor total da venda
+            price = self.market_data.get_price(symbol)
+            total_value = price * quantity
+
+            if min_notional and total_value < min_notional:
+                message = (f"Erro: Valor total da venda ({total_value:.2f} {self.quote}) é menor que o mínimo permitido ({min_notional:.2f} {self.quote}) para {self.base_asset(symbol)}.")
+               # send_email("Erro na Venda", message)
+                self.log(message)
+                return None
+
+            # Realiza a venda (um timeout é resolvido pelo clientOrderId, sem reenviar)
+            order = self.order_gateway.execute(symbol, 'SELL', quantity,
+                                               self.client_order_id(symbol, 'SELL', self.cycle_id))
+            if not self._executed(order):
+                self.log(f"Venda de {self.base_asset(symbol)} não executada.", fase='vendas', simbolo=symbol)
+                return None
+
+            executed_qty = float(order['executedQty'])
+            price = self._fill_price(order)
+            total_sale_value = executed_qty * price
+            self._record_trade(symbol, 'SELL', executed_qty, price, order)
+
+            wallet = self.get_wallet_assets()
+
+            if self.base_asset(symbol) in wallet:
+                wallet[self.base_asset(symbol)] -= executed_qty
+            else:
+                wallet[self.base_asset(symbol)] = 0
+            wallet[self.quote] = wallet.get(self.quote, 0) + total_sale_value
+
+            message = (f"====== Venda realizada! ===========\n"
+                       f"Cripto: {self.base_asset(symbol)}\n"
+                       f"Qtde da ordem executada: {executed_qty:.6f}\n"
+                       f"Saldo total {self.base_asset(symbol)} em carteira: {wallet.get(self.base_asset(symbol), 0):.6f}\n"
+                       f"Saldo {self.quote} disponível em carteira: {wallet[self.quote]:.2f}\n")
+            send_email("Venda Realizada", message)
+            self.log(message, fase='vendas', simbolo=symbol, quantidade=executed_qty, preco=price)
+            return order
+        except BinanceAPIException as e:
+            message = f"Erro ao realizar a venda de {self.base_asset(symbol)}: {e}"
+           # send_email("Erro na Venda", message)
+            self.log(message, fase='vendas', simbolo=symbol)
+            return None
+
+
+
+    # Publica as posições para o painel e as guarda no armazenamento local
+    def _save_positions(self, positions):
+        publish_positions(positions, self.name or 'principal')
+        if self.store is not None:
+            self.store.save_positions(self.name or 'principal', positions)
+
+    # Registra uma ordem executada no histórico local de trades
+    def _record_trade(self, symbol, side, quantity, price, order):
+        if self.store is None:
+            return
+        try:
+            self.store.record_trade(self.name or 'principal', symbol, side, quantity, price,
+                                    float(order.get('cummulativeQuoteQty') or quantity * price), order.get('orderId'))
+        except Exception as e:
+            self.log(f"Erro ao registrar o trade de {symbol}: {e}")
+
+    # Reúne os dados de uma posição (histórico de ordens e quantidade ajustada) sem tomar decisões
+    def _gather_position(self, asset, amount, prices):
+        symbol = self.pair(asset)
+        position = {'asset': asset, 'symbol': symbol, 'amount': amount, 'error': None}
+
+        price = prices.get(symbol)
+        if price is None:
+            position['error'] = f"Erro ao obter preço de {asset}: par {symbol} não encontrado."
+            return position
+        position['price'] = price
+
+        # Com o user data stream ativo, o histórico só é lido na primeira vez; depois as execuções atualizam o livro
+        if self.account_state is not None and self.account_state.has_ledger(symbol):
+            average_price = self.account_state.average_price(symbol)
+            position['purchase_price'] = average_price if average_price else price
+            position['adjusted_quantity'] = min(self.adjust_quantity(symbol, amount), amount)
+            return position
+
+        try:
+            order_history = self.get_cached_order_history(symbol)
+        except Exception as e:
+            position['error'] = f"Erro ao recuperar histórico de ordens para {asset}: {e}"
+            return position
+
+        if not order_history:
+            position['error'] = f"Nenhum histórico de ordens encontrado para {asset}. Ignorando."
+            return position
+
+        if self.account_state is not None:
+            self.account_state.seed_ledger(symbol, order_history)
+
+        total_spent = 0.0
+        total_qty = 0.0
+        for order in order_history:
+            if order['side'] == 'BUY' and order['status'] == 'FILLED':
+                total_spent += float(order['cummulativeQuoteQty'])
+                total_qty += float(order['executedQty'])
+
+        position['purchase_price'] = total_spent / total_qty if total_qty > 0 else price # Calculo do preço médio
+
+        # Ajusta a quantidade antes de tentar vender, limitada ao saldo disponível
+        position['adjusted_quantity'] = min(self.adjust_quantity(symbol, amount), amount)
+        return position
+
+    def monitor_positions_from_wallet(self, trailing_stop_percentage=30.0, activation_threshold=30.0, min_stop_loss_percentage=7.0):
+        """
+        Monitora as posições na carteira e realiza vendas baseadas em trailing stop simplificado.
+
+        Os dados de todas as posições são coletados primeiro (um único snapshot de preços e
+        históricos de ordens em paralelo) e só depois as decisões de venda são tomadas,
+        todas sobre o mesmo instante de mercado.
+        """
+        try:
+            wallet_assets = self.get_wallet_assets(min_balance=0.1)
+
+            if not wallet_assets:
+                self.log("Nenhum ativo encontrado na carteira Spot com saldo suficiente. Encerrando análise.")
+                self._save_positions([])
+                return
+
+            # Um único snapshot traz o preço de todos os pares
+            prices = self.market_data.get_prices()
+
+            gather = self.in_cycle(lambda item: self._gather_position(item[0], item[1], prices))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(wallet_assets), 10)) as executor:
+                positions = list(executor.map(gather, wallet_assets.items()))
+
+            published = []
+            for position in positions:
+                asset = position['asset']
+                symbol = position['symbol']
+                self.log(f"Analisando ativo {asset}:", fase='vendas', simbolo=symbol)
+
+                if position['error']:
+                    self.log(position['error'], fase='vendas', simbolo=symbol)
+                    continue
+
+                amount = position['amount']
+                price = position['price']
+                purchase_price = position['purchase_price']
+                adjusted_quantity = position['adjusted_quantity']
+
+                pnl_percent = ((price - purchase_price) / purchase_price) * 100 # Calculo do PNL
+                published.append({'ativo': asset, 'quantidade': round(amount, 6), 'preco': price,
+                                  'preco_medio': round(purchase_price, 8), 'pnl_percent': round(pnl_percent, 2)})
+
+                self.log(f"- Quantidade: {amount:.6f}")
+                self.log(f"- Preço atual: {price:.2f} {self.quote}")
+                self.log(f"- Preço de compra médio: {purchase_price:.2f} {self.quote}")
+                self.log(f"- PNL: {pnl_percent:.2f}%", fase='vendas', simbolo=symbol, quantidade=amount, preco=price,
+                         preco_medio=purchase_price, pnl_percent=pnl_percent)
+                self.log(f"- Quantidade ajustada para venda: {adjusted_quantity:.6f}")
+                last_price2 = self.last_prices.get(symbol, 0)
+                self.log(f"- Maior preço até o momento: {last_price2} {self.quote}")
+
+                if pnl_percent >= float(self.config['lucro_venda'].replace(',', '.')):
+                    # Venda normal se atingir a meta de lucro
+                    self.log(f"Lucro de {pnl_percent:.2f}% atingido para {asset}. Vendendo {asset}.",
+                             fase='vendas', simbolo=symbol, pnl_percent=pnl_percent)
+                    self.sell_crypto(symbol, adjusted_quantity)
+
+                # Atualiza o last_price independentemente do PNL
+                last_price2 = self.last_prices.get(symbol, 0)
+                if price > last_price2:
+                    self.last_prices[symbol] = price
+                    self.log(f"- Atualizado last_price para: {price:.2f} {self.quote}")
+
+                # Verifica se o PNL atingiu o limite para ativação do trailing stop
+                if pnl_percent >= activation_threshold and not self.trailing_activated.get(symbol, False):
+                    self.trailing_activated[symbol] = True
+                    self.log("  - Trailing stop ativado!")
+
+                if self.trailing_activated.get(symbol, False):
+                    # Calcula o stop loss com base no maior preço identificado
+                    stop_loss = self.last_prices[symbol] * (1 - trailing_stop_percentage / 100)
+
+                    # Verifica se o stop loss não pode ser inferior ao preço médio de compra + 7%
+                    if stop_loss < purchase_price + ((purchase_price * 7)/100) :
+                        stop_loss = purchase_price * (1 + min_stop_loss_percentage / 100)  # Ajustando para 7% acima do preço médio
+                        self.log(f"  - Stop loss ajustado para: {stop_loss:.2f} {self.quote} devido à limitação mínima de 7% acima do preço médio de compra.")
+
+                    self.stop_loss_data[symbol] = stop_loss
+                    self.log(f"- Stop loss atualizado para: {stop_loss:.2f} {self.quote}")
+
+                else:
+                    self.log("- PNL não atingiu o limite para ativação do trailing stop.")
+
+                # Verifica se a cotação atual atingiu o stop loss e desativa o trailing stop
+                if self.trailing_activated.get(symbol, False):
+                    if price <= self.stop_loss_data.get(symbol, float('inf')):
+                        self.log(f"  - Stop loss executado para o ativo {asset}, vendendo ativo!",
+                                 fase='vendas', simbolo=symbol, stop_loss=self.stop_loss_data[symbol])
+                        self.sell_crypto(symbol, adjusted_quantity)
+                        self.trailing_activated[symbol] = False  # Desativa o trailing stop
+
+            # Atualiza as posições exibidas no painel
+            self._save_positions(published)
+
+        except BinanceAPIException as e:
+            self.log(f"Erro ao monitorar as posições da carteira: {e}")
+        except Exception as e:
+            self.log(f"Erro inesperado ao monitorar a carteira: {e}")
+
+
+    # Quantidade recebida numa compra, descontada a comissão paga no próprio ativo
+    def _net_quantity(self, order):
+        asset = self.base_asset(order['symbol'])
+        commission = sum(float(fill.get('commission') or 0) for fill in order.get('fills', [])
+                         if fill.get('commissionAsset') == asset)
+        return float(order['executedQty']) - commission
+
+    # Cria na corretora a ordem de proteção de uma posição (modos 'trailing' e 'oco'); com o preço atual,
+    # uma posição que já passou da ativação recebe o trailing imediato
+    def place_protection(self, symbol, quantity, purchase_price, price=None):
+        asset = self.base_asset(symbol)
+        if self.config['modo_teste'] == True:
+            self.log(f"[TEST MODE] Proteção simulada na corretora para {asset} - Quantidade: {quantity:.6f}",
+                     fase='protecao', simbolo=symbol, quantidade=quantity, teste=True)
+            return {"status": "TEST", "symbol": symbol, "quantity": quantity}
+        try:
+            plan = plan_protection(symbol, quantity, purchase_price, self.market_data.get_symbol_info(symbol),
+                                   protection_mode(self.config), float(str(self.config['lucro_venda']).replace(',', '.')),
+                                   stop_loss_percentage=oco_stop_loss(self.config), price=price)
+            response = getattr(self.client, plan['metodo'])(**plan['params'])
+        except BinanceAPIException as e:
+            self.log(f"Erro ao criar a ordem de proteção de {asset}: {e}", fase='protecao', simbolo=symbol)
+            return None
+
+        with self._protection_lock:
+            self.protective_orders[symbol] = {'ordens': placed_order_ids(response), 'quantidade': quantity,
+                                              'preco_medio': purchase_price, 'tipo': plan['tipo'], 'criada': time.time()}
+        self.log(f"Proteção ({plan['tipo']}) criada na corretora para {asset}: meta {plan['meta']:.6f} {self.quote}, "
+                 f"ativação do trailing {plan['ativacao']:.6f} {self.quote}.", fase='protecao', simbolo=symbol,
+                 tipo=plan['tipo'], quantidade=quantity, preco_medio=purchase_price, meta=plan['meta'],
+                 ativacao=plan['ativacao'], stop=plan.get('stop'))
+        return response
+
+    # Uma proteção saiu do livro: registra as vendas executadas (ou só avisa, se foi cancelada ou expirou)
+    def _settle_protection(self, symbol, info):
+        asset = self.base_asset(symbol)
+        filled = []
+        for order_id in info['ordens']:
+            try:
+                order = self.client.get_order(symbol=symbol, orderId=order_id)
+            except BinanceAPIException as e:
+                self.log(f"Erro ao consultar a ordem de proteção {order_id} de {asset}: {e}", fase='protecao',
+                         simbolo=symbol)
+                continue
+            if float(order.get('executedQty') or 0) > 0:
+                filled.append(order)
+
+        if not filled:
+            self.log(f"A ordem de proteção de {asset} saiu do livro sem execução; será recriada se houver saldo.",
+                     fase='protecao', simbolo=symbol, tipo=info['tipo'])
+            return
+
+        for order in filled:
+            executed_qty = float(order['executedQty'])
+            total_sale_value = float(order['cummulativeQuoteQty'])
+            price = total_sale_value / executed_qty
+            self._record_trade(symbol, 'SELL', executed_qty, price, order)
+
+            message = (f"====== Venda realizada! ===========\n"
+                       f"Cripto: {asset}\n"
+                       f"Qtde da ordem executada: {executed_qty:.6f}\n"
+                       f"Valor da venda: {total_sale_value:.2f} {self.quote}\n"
+                       f"Ordem de proteção: {info['tipo']}\n")
+            send_email("Venda Realizada", message)
+            self.log(message, fase='vendas', simbolo=symbol, quantidade=executed_qty, preco=price,
+                     protecao=info['tipo'])
+
+    def reconcile_protection(self):
+        """
+        Análise de vendas quando os stops estão na corretora: apenas confere o status das
+        ordens de proteção, sem calcular stops nem consultar históricos a cada passada.
+
+        - Ordens do robô abertas no livro e ainda desconhecidas (e.g., após reiniciar) são adotadas;
+        - Proteções que saíram do livro são liquidadas (venda registrada e avisada);
+        - Posições com saldo livre e sem proteção (compradas antes do modo ou cuja proteção
+          falhou) recebem uma, ou são vendidas se já passaram da meta de lucro.
+        """
+        snapshot_time = time.time()
+        try:
+            open_orders = group_protective_orders(self.client.get_open_orders())
+        except BinanceAPIException as e:
+            self.log(f"Erro ao consultar as ordens de proteção abertas: {e}", fase='protecao')
+            return
+
+        with self._protection_lock:
+            for symbol, orders in open_orders.items():
+                if symbol not in self.protective_orders:
+                    self.protective_orders[symbol] = {'ordens': [order['orderId'] for order in orders],
+                                                      'quantidade': float(orders[0]['origQty']), 'preco_medio': None,
+                                                      'tipo': orders[0]['type'], 'criada': snapshot_time}
+            # Proteções criadas depois da consulta ainda podem não aparecer no livro
+            settled = {symbol: self.protective_orders.pop(symbol) for symbol, info in list(self.protective_orders.items())
+                       if symbol not in open_orders and info['criada'] < snapshot_time}
+
+        for symbol, info in settled.items():
+            self._settle_protection(symbol, info)
+
+        prices = self.market_data.get_prices()
+        for asset, amount in self.get_wallet_assets(min_balance=0.1).items():
+            symbol = self.pair(asset)
+            if symbol in self.protective_orders:
+                continue
+            position = self._gather_position(asset, amount, prices)
+            if position['error']:
+                self.log(position['error'], fase='protecao', simbolo=symbol)
+                continue
+            profit_percentage = float(str(self.config['lucro_venda']).replace(',', '.'))
+            if position['price'] >= position['purchase_price'] * (1 + profit_percentage / 100):
+                self.log(f"{asset} já passou da meta de lucro sem proteção. Vendendo {asset}.", fase='vendas',
+                         simbolo=symbol)
+                self.sell_crypto(symbol, position['adjusted_quantity'])
+                continue
+            self.place_protection(symbol, position['adjusted_quantity'], position['purchase_price'],
+                                  position['price'])
+
+        # Posições protegidas exibidas no painel (o preço médio das adotadas é lido uma única vez)
+        published = []
+        with self._protection_lock:
+            protected = list(self.protective_orders.items())
+        for symbol, info in protected:
+            price = prices.get(symbol)
+            if price is None:
+                continue
+            if info['preco_medio'] is None:
+                info['preco_medio'] = self._gather_position(self.base_asset(symbol), info['quantidade'],
+                                                            prices).get('purchase_price')
+            purchase_price = info['preco_medio'] or price
+            published.append({'ativo': self.base_asset(symbol), 'quantidade': round(info['quantidade'], 6),
+                              'preco': price, 'preco_medio': round(purchase_price, 8),
+                              'pnl_percent': round((price - purchase_price) / purchase_price * 100, 2),
+                              'protecao': info['tipo']})
+        self._save_positions(published)
+
+    # Função para verificar número de posições em aberto na carteira
+    def get_wallet_positions(self):
+        """
+        Retorna uma lista de posições (ativos com saldo > 0) na conta SPOT.
+        """
+        if self.account_state is not None and self.account_state.ready:
+            return self.account_state.positions()
+        try:
+            # Obter todos os ativos na carteira
+            account_info = self.client.get_account()
+            wallet_positions = []
+
+            for balance in account_info['balances']:
+                asset = balance['asset']
+                free_amount = float(balance['free'])
+                locked_amount = float(balance['locked'])
+
+                # Considera uma posição apenas se houver saldo livre ou bloqueado
+                if free_amount > 0 or locked_amount > 0:
+                    wallet_positions.append(asset)
+
+            return wallet_positions
+        except Exception as e:
+            self.log(f"Erro ao obter posições da carteira: {e}")
+            return []
+
+    # Filtra um ranking compartilhado pelo volume desta instância e pelos ativos que esta conta já possui
+    def select_candidates(self, candidates, limit, min_volume):
+        wallet_assets = self.get_held_assets()
+        blacklist = {item.strip().upper() for item in self.acesso.get_blacklist_from_spreadsheet()}
+        selected = [c for c in candidates
+                    if c['volume'] >= min_volume and wallet_assets.get(self.base_asset(c['symbol']), 0) < 0.1
+                    and c['symbol'] not in blacklist and self.base_asset(c['symbol']) not in blacklist]
+        return selected[:limit]
+
+    # Análise de vendas: trailing stop e meta de lucro das posições em carteira
+    def run_monitor(self, planilha=False):
+        self.cycle_id = new_cycle_id()
+        data_hora_atual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.log(f"{data_hora_atual} - Iniciando análise de vendas...", fase='vendas', planilha=planilha)
+        if protection_mode(self.config) == 'cliente':
+            self.monitor_positions_from_wallet()
+            return
+        try:
+            self.reconcile_protection()
+        except Exception as e:
+            self.log(f"Erro inesperado ao conferir as ordens de proteção: {e}", fase='protecao')
+
+    def run_cycle(self, candidates=None):
+        """
+        Executa um ciclo completo em sequência: análise de vendas, seleção das criptos e compras.
+
+        :param candidates: Ranking já calculado por uma triagem compartilhada entre instâncias.
+                           Se None, a própria instância faz a triagem.
+        """
+        self.run_monitor(planilha=True)
+        self.run_screening(candidates)
+
+    def run_screening(self, candidates=None):
+        """
+        Triagem de mercado e compras, sem a análise de vendas (que roda na sua própria tarefa).
+
+        :param candidates: Ranking já calculado por uma triagem compartilhada entre instâncias.
+                           Se None, a própria instância faz a triagem.
+        """
+        config = self.config
+
+        # Atualizar os parâmetros com base na configuração atual
+        PERCENTUAL_SALDO_COMPRA = float(config['saldo_a_usar'].replace(',', '.'))  # Garantir que seja um número decimal
+        MIN_VOLUME = float(config['volume_minimo'])  # Garantir que seja um número decimal
+        LIMITE_TOP_VOLATIL = int(config['limite_criptos'])  # Se for inteiro, converte para int
+        ESTRATEGIA = get_strategy(config['estrategia'])  # Estratégia escolhida na planilha
+        JANELA_VOLATILIDADE = ESTRATEGIA.volatility_window(config)  # Velas usadas no cálculo da volatilidade
+        LIMIT_POSITION = int(config['limite_posicao'])  # Garantir que seja um número decimal
+        PERCENTUAL_LUCRO = float(config['lucro_venda'])  # Garantir que seja um número decimal
+        TEST_MODE = config['modo_teste']  # Caso a planilha retorne 'True' como string, converte para booleano
+
+        self.cycle_id = new_cycle_id()
+
+        self.log(f"Estratégia: {ESTRATEGIA.name}" + (f" ({self.name})" if self.name else ""),
+                 fase='config', planilha=True, estrategia=ESTRATEGIA.name)
+        self.log(f"Periodo de análise de volatilidade: {JANELA_VOLATILIDADE} velas de {ESTRATEGIA.interval}",
+                 fase='config', planilha=True, janela=JANELA_VOLATILIDADE, intervalo=ESTRATEGIA.interval)
+        self.log(f"Volume mínimo a considerar na análise: {MIN_VOLUME}",
+                 fase='config', planilha=True, volume_minimo=MIN_VOLUME)
+        self.log(f"% de saldo {self.quote} à utilizar em cada compra: {PERCENTUAL_SALDO_COMPRA * 100}%",
+                 fase='config', planilha=True, saldo_a_usar=PERCENTUAL_SALDO_COMPRA)
+        self.log(f"Meta % de lucro definida: {PERCENTUAL_LUCRO}%",
+                 fase='config', planilha=True, lucro_venda=PERCENTUAL_LUCRO)
+        self.log("Modo teste: Ativado" if TEST_MODE else "Modo teste: DESATIVADO!",
+                 fase='config', planilha=True, modo_teste=bool(TEST_MODE))
+
+        data_hora_atual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.log(f"{data_hora_atual} - Iniciando análise de mercado e compras, por favor aguarde...",
+                 fase='triagem', planilha=True)
+
+        # Obter criptos mais voláteis
+        if candidates is None:
+            top_cryptos = self.get_top_volatile_cryptos(
+                limit=LIMITE_TOP_VOLATIL,
+                min_volume=MIN_VOLUME,
+                strategy=ESTRATEGIA
+            )
+        else:
+            top_cryptos = self.select_candidates(candidates, LIMITE_TOP_VOLATIL, MIN_VOLUME)
+
+        self.log("Top de Criptos Voláteis:", fase='triagem', planilha=True)
+        for i, crypto in enumerate(top_cryptos, start=1):
+            symbol_without_usdt = self.base_asset(crypto['symbol'])  # Remove o sufixo da moeda de cotação
+            volatility_percentage = crypto['volatility'] * 100  # Converte a volatilidade para porcentagem
+            data_hora_atual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.log(f"{data_hora_atual} - {i}. {symbol_without_usdt} - Volatilidade: {volatility_percentage:.2f}%",
+                     fase='triagem', simbolo=crypto['symbol'], planilha=True, posicao=i,
+                     volatilidade=crypto['volatility'], volume=crypto['volume'])
+
+        # Obter o número de posições atuais na carteira
+        current_positions = len(self.get_wallet_positions())
+
+        if current_positions >= LIMIT_POSITION:
+            self.log(f"Limite de {LIMIT_POSITION} posições simultâneas atingido. Nenhuma nova compra será realizada.")
+        else:
+            # Comprar as criptos mais voláteis até atingir o limite de posições, todas de uma vez
+            self.buy_batch(top_cryptos, PERCENTUAL_SALDO_COMPRA, LIMIT_POSITION - current_positions)
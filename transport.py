@@ -0,0 +1,126 @@
+import os
+import threading
+from requests.adapters import HTTPAdapter
+from binance.client import Client
+
+# Quantidade padrão de threads de busca (e de conexões HTTP) por cliente
+DEFAULT_POOL_SIZE = 16
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    Adaptador HTTP com pool de conexões dimensionado para o número de threads e
+    métricas de saturação: quantas requisições chegaram com todas as conexões
+    ocupadas e quantas conexões novas precisaram ser abertas.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, pool_block=True, **kwargs):
+        self.pool_size = pool_size
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated = 0  # Requisições que encontraram o pool todo ocupado
+        # pool_block=True: a thread excedente espera uma conexão livre em vez de abrir uma descartável
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=pool_block, **kwargs)
+
+    def send(self, request, **kwargs):
+        with self._stats_lock:
+            self.requests += 1
+            if self.in_flight >= self.pool_size:
+                self.saturated += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+
+    # Conexões TCP abertas desde o início (com keep-alive, deve ficar perto do tamanho do pool)
+    def connections_opened(self):
+        pools = self.poolmanager.pools
+        return sum(getattr(pools.get(key), 'num_connections', 0) for key in pools.keys())
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'requisicoes': self.requests,
+                'em_andamento': self.in_flight,
+                'pico': self.peak_in_flight,
+                'saturadas': self.saturated,
+                'conexoes_abertas': self.connections_opened(),
+                'tamanho_pool': self.pool_size,
+            }
+
+
+def configure_client(client, pool_size=DEFAULT_POOL_SIZE, base_url=None):
+    """
+    Ajusta a sessão HTTP de um cliente python-binance já criado.
+
+    :param pool_size: Conexões mantidas abertas; use o mesmo número de threads que fazem requisições.
+    :param base_url: URL base alternativa (e.g., 'http://127.0.0.1:8000' para um servidor simulado).
+    :return: O adaptador instalado (para consultar as métricas com `stats()`).
+    """
+    adapter = PooledAdapter(pool_size)
+    session = client.session
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+    if base_url:
+        client.API_URL = base_url.rstrip('/') + '/api'
+    client.transport = adapter
+    return adapter
+
+
+def create_client(api_key, api_secret, pool_size=None, base_url=None, cassette=None):
+    """
+    Cria um cliente da Binance com a sessão configurada por `configure_client`.
+
+    Sem argumentos, o tamanho do pool e a URL base vêm de HTTP_POOL_SIZE e
+    BINANCE_BASE_URL no .env.
+
+    :param cassette: Cassette para gravar ou reproduzir as respostas REST (opcional).
+    """
+    pool_size = pool_size or int(os.getenv("HTTP_POOL_SIZE", DEFAULT_POOL_SIZE))
+    base_url = base_url or os.getenv("BINANCE_BASE_URL")
+
+    # O ping do construtor iria para a URL padrão; é feito depois de ajustar a sessão
+    client = Client(api_key, api_secret, ping=False)
+    configure_client(client, pool_size, base_url)
+    if cassette is not None:
+        cassette.install_client(client)
+    client.ping()
+    return client
+
+
+# Métricas do pool HTTP de um cliente criado por create_client (vazio se não houver)
+def transport_stats(client):
+    adapter = getattr(client, 'transport', None)
+    return adapter.stats() if adapter is not None else {}
+
+
+class LazyClient:
+    """
+    Cliente da Binance criado (e o ping feito) só no primeiro uso, para que importar
+    um módulo nunca acesse a rede.
+    """
+
+    def __init__(self, api_key, api_secret, factory=None, **kwargs):
+        self._api_key = api_key
+        self._api_secret = api_secret
+        self._factory = factory or create_client
+        self._kwargs = kwargs
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._factory(self._api_key, self._api_secret, **self._kwargs)
+            return self._client
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.get_client(), name)
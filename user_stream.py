@@ -0,0 +1,215 @@
+import json
+import time
+import asyncio
+import logging
+import threading
+from event_log import log_event
+
+
+class AccountState:
+    """
+    Saldos e livro de compras da conta mantidos em memória a partir dos eventos
+    do user data stream da Binance (outboundAccountPosition, executionReport e
+    balanceUpdate), para que o robô não precise consultar a própria conta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.balances = {}  # ativo -> {'free', 'locked'}
+        self.ledger = {}  # símbolo -> {'qty', 'spent'} das compras executadas
+        self.orders = {}  # clientOrderId -> último executionReport
+        self.ready = False
+        self.listeners = []  # funções chamadas a cada executionReport
+
+    # Carrega os saldos iniciais a partir de get_account()
+    def seed_balances(self, account):
+        with self._lock:
+            self.balances = {b['asset']: {'free': float(b['free']), 'locked': float(b['locked'])}
+                             for b in account['balances']}
+            self.ready = True
+
+    # Carrega o livro de compras de um símbolo a partir do histórico de ordens (uma única vez)
+    def seed_ledger(self, symbol, orders):
+        qty = 0.0
+        spent = 0.0
+        for order in orders:
+            if order['side'] == 'BUY' and order['status'] == 'FILLED':
+                spent += float(order['cummulativeQuoteQty'])
+                qty += float(order['executedQty'])
+        with self._lock:
+            self.ledger.setdefault(symbol, {'qty': qty, 'spent': spent})
+
+    def handle_event(self, event):
+        """
+        Aplica um evento do user data stream ao estado local.
+        """
+        event_type = event.get('e')
+        with self._lock:
+            if event_type == 'outboundAccountPosition':
+                for b in event['B']:
+                    self.balances[b['a']] = {'free': float(b['f']), 'locked': float(b['l'])}
+
+            elif event_type == 'balanceUpdate':
+                balance = self.balances.setdefault(event['a'], {'free': 0.0, 'locked': 0.0})
+                balance['free'] += float(event['d'])
+
+            elif event_type == 'executionReport':
+                self.orders[event['c']] = event
+                # Só as execuções entram no livro; a parcela em moeda de cotação vem em 'Y'
+                if event['x'] == 'TRADE' and event['S'] == 'BUY' and event['s'] in self.ledger:
+                    entry = self.ledger[event['s']]
+                    entry['qty'] += float(event['l'])
+                    entry['spent'] += float(event['Y'])
+
+            listeners = list(self.listeners) if event_type == 'executionReport' else []
+
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                log_event(f"Erro ao processar executionReport de {event.get('s')}: {e}", fase='stream',
+                          simbolo=event.get('s'), nivel=logging.ERROR)
+
+    # Saldo livre de um ativo
+    def free(self, asset):
+        with self._lock:
+            return self.balances.get(asset, {}).get('free', 0.0)
+
+    # Mesmo formato de get_wallet_assets: {ativo: saldo livre (ou livre + bloqueado, com include_locked)}
+    def wallet(self, min_balance=0.0, exclude=("USDT", "BRL"), include_locked=False):
+        with self._lock:
+            wallet = {asset: b['free'] + (b['locked'] if include_locked else 0.0)
+                      for asset, b in self.balances.items() if asset not in exclude}
+        return {asset: amount for asset, amount in wallet.items() if amount > min_balance}
+
+    # Ativos com saldo livre ou bloqueado
+    def positions(self):
+        with self._lock:
+            return [asset for asset, b in self.balances.items() if b['free'] > 0 or b['locked'] > 0]
+
+    # Preço médio de compra do símbolo, ou None se o livro ainda não foi carregado
+    def average_price(self, symbol):
+        with self._lock:
+            entry = self.ledger.get(symbol)
+            if entry is None or entry['qty'] <= 0:
+                return None
+            return entry['spent'] / entry['qty']
+
+    def has_ledger(self, symbol):
+        with self._lock:
+            return symbol in self.ledger
+
+
+class UserDataStream:
+    """
+    Ouve o user data stream da Binance e repassa os eventos para um AccountState.
+
+    Cria o listenKey, renova-o periodicamente (a Binance o expira após 60 minutos
+    sem keepalive) e reconecta, ressincronizando os saldos, se a conexão cair.
+    """
+
+    WS_URL = 'wss://stream.binance.com:9443/ws/'
+
+    def __init__(self, client, state, keepalive_interval=30 * 60, ws_url=None):
+        self.client = client
+        self.state = state
+        self.keepalive_interval = keepalive_interval
+        self.ws_url = ws_url or self.WS_URL
+        self.listen_key = None
+        self._stop = threading.Event()
+        self._reconnect = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self.listen_key = self.client.stream_get_listen_key()
+        self.state.seed_balances(self.client.get_account())
+        for target in (self._keepalive_loop, self._run):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.client.stream_close(self.listen_key)
+        except Exception as e:
+            log_event(f"Erro ao encerrar o listenKey: {e}", fase='stream', nivel=logging.WARNING)
+
+    # Renova o listenKey; se ele tiver expirado, cria outro e força a reconexão
+    def _keepalive_loop(self):
+        while not self._stop.wait(self.keepalive_interval):
+            try:
+                self.client.stream_keepalive(self.listen_key)
+            except Exception as e:
+                log_event(f"Erro no keepalive do listenKey: {e}. Criando um novo.", fase='stream', nivel=logging.WARNING)
+                self._renew()
+
+    def _renew(self):
+        try:
+            self.listen_key = self.client.stream_get_listen_key()
+            self.state.seed_balances(self.client.get_account())
+        except Exception as e:
+            log_event(f"Erro ao renovar o listenKey: {e}", fase='stream', nivel=logging.ERROR)
+        self._reconnect.set()
+
+    def _run(self):
+        asyncio.run(self._consume())
+
+    async def _consume(self):
+        import websockets
+
+        while not self._stop.is_set():
+            self._reconnect.clear()
+            try:
+                async with websockets.connect(self.ws_url + self.listen_key) as ws:
+                    while not self._stop.is_set() and not self._reconnect.is_set():
+                        try:
+                            raw = await asyncio.wait_for(ws.recv(), timeout=1)
+                        except asyncio.TimeoutError:
+                            continue
+                        event = json.loads(raw)
+                        if event.get('e') == 'listenKeyExpired':
+                            self._renew()
+                            break
+                        self.state.handle_event(event)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                log_event(f"Conexão do user data stream perdida: {e}. Reconectando...", fase='stream',
+                          nivel=logging.WARNING)
+                await asyncio.sleep(5)
+                self._renew()
+
+
+class ReplayUserStream:
+    """
+    Substituto local do UserDataStream: entrega eventos gravados ao AccountState
+    sem acessar a rede. Útil para testes e para reproduzir um pregão.
+    """
+
+    def __init__(self, state, events=None, path=None, account=None):
+        """
+        :param events: Lista de eventos no formato do user data stream.
+        :param path: Arquivo JSONL com um evento por linha (alternativa a `events`).
+        :param account: Resposta de get_account() usada como saldo inicial.
+        """
+        self.state = state
+        self.events = list(events or [])
+        if path:
+            with open(path, encoding='utf-8') as f:
+                self.events.extend(json.loads(line) for line in f if line.strip())
+        self.account = account or {'balances': []}
+
+    def start(self, delay=0.0):
+        self.state.seed_balances(self.account)
+        for event in self.events:
+            self.push(event)
+            if delay:
+                time.sleep(delay)
+
+    # Entrega um evento avulso, como se tivesse chegado pelo websocket
+    def push(self, event):
+        self.state.handle_event(event)
+
+    def stop(self):
+        pass
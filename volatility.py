@@ -0,0 +1,103 @@
+import numpy as np
+
+# Fator de Parkinson: variância = ln(máxima/mínima)² / (4 ln 2)
+PARKINSON_FACTOR = 1.0 / (4.0 * np.log(2.0))
+
+# Estimador usado quando a config não informa um estimador conhecido
+DEFAULT_ESTIMATOR = 'fechamento'
+
+
+# Extrai abertura, máxima, mínima e fechamento das velas da Binance como arrays
+def ohlc_from_klines(klines):
+    data = np.array([kline[1:5] for kline in klines], dtype=float).reshape(-1, 4)
+    return data[:, 0], data[:, 1], data[:, 2], data[:, 3]
+
+
+# Desvio padrão dos retornos entre fechamentos (o cálculo original do robô)
+def close_to_close(opens, highs, lows, closes):
+    if len(closes) < 2:
+        return None
+    returns = np.diff(closes) / closes[:-1]
+    return float(np.std(returns))
+
+
+# Parkinson: usa apenas a amplitude (máxima/mínima) de cada vela
+def parkinson(opens, highs, lows, closes):
+    if len(highs) < 1:
+        return None
+    hl = np.log(highs / lows)
+    return float(np.sqrt(PARKINSON_FACTOR * np.mean(hl ** 2)))
+
+
+# Garman-Klass: amplitude mais o movimento de abertura a fechamento
+def garman_klass(opens, highs, lows, closes):
+    if len(closes) < 1:
+        return None
+    hl = np.log(highs / lows)
+    co = np.log(closes / opens)
+    variance = np.mean(0.5 * hl ** 2 - (2.0 * np.log(2.0) - 1.0) * co ** 2)
+    return float(np.sqrt(max(variance, 0.0)))
+
+
+# Rogers-Satchell: não é enviesado por tendência (drift) no período
+def _rogers_satchell_variance(opens, highs, lows, closes):
+    ho = np.log(highs / opens)
+    hc = np.log(highs / closes)
+    lo = np.log(lows / opens)
+    lc = np.log(lows / closes)
+    return float(np.mean(hc * ho + lc * lo))
+
+
+def rogers_satchell(opens, highs, lows, closes):
+    if len(closes) < 1:
+        return None
+    return float(np.sqrt(max(_rogers_satchell_variance(opens, highs, lows, closes), 0.0)))
+
+
+# Yang-Zhang: combina o salto entre velas (fechamento -> abertura), o corpo e Rogers-Satchell
+def yang_zhang(opens, highs, lows, closes):
+    n = len(closes)
+    if n < 3:
+        return None
+    overnight = np.log(opens[1:] / closes[:-1])
+    body = np.log(closes[1:] / opens[1:])
+    k = 0.34 / (1.34 + n / (n - 2))
+    variance = (np.var(overnight, ddof=1) + k * np.var(body, ddof=1)
+                + (1 - k) * _rogers_satchell_variance(opens[1:], highs[1:], lows[1:], closes[1:]))
+    return float(np.sqrt(max(variance, 0.0)))
+
+
+# Estimadores disponíveis, pelo nome usado na config ('estimador_volatilidade')
+ESTIMATORS = {
+    'fechamento': close_to_close,
+    'close': close_to_close,
+    'parkinson': parkinson,
+    'garman_klass': garman_klass,
+    'garman-klass': garman_klass,
+    'rogers_satchell': rogers_satchell,
+    'rogers-satchell': rogers_satchell,
+    'yang_zhang': yang_zhang,
+    'yang-zhang': yang_zhang,
+}
+
+
+def get_estimator(name):
+    """
+    Retorna o estimador de volatilidade pelo nome. Cai no padrão (fechamento a
+    fechamento) se o nome estiver vazio ou não for reconhecido.
+    """
+    key = (name or '').strip().lower().replace(' ', '_')
+    return ESTIMATORS.get(key, ESTIMATORS[DEFAULT_ESTIMATOR])
+
+
+def estimate(klines, name=None):
+    """
+    Volatilidade por vela calculada sobre as velas já obtidas.
+
+    :param klines: Velas da Binance (abertura, máxima, mínima e fechamento nas colunas 1 a 4).
+    :param name: Nome do estimador (e.g., 'parkinson', 'yang_zhang').
+    :return: Volatilidade ou None se não houver velas suficientes.
+    """
+    if not klines:
+        return None
+    return get_estimator(name)(*ohlc_from_klines(klines))